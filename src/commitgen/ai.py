@@ -1,59 +1,660 @@
-from openai import OpenAI
-from commitgen.config import ensure_api_key
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from commitgen import cache, compaction, digests, metrics, providers, ranking, resilience, routing
+from commitgen.config import ensure_api_key, get_float_setting, get_int_setting, get_setting
+from commitgen.constants import (
+    CHUNK_THRESHOLD_TOKENS,
+    CHUNK_TOKENS,
+    CHUNK_WORKERS,
+    DEFAULT_MODEL,
+    DIGEST_MAX_FILES,
+    REQUEST_TIMEOUT_SECONDS,
+    TOKEN_BUDGET,
+)
+from commitgen.diffparse import chunk_diff, split_file_diffs
+from commitgen.heuristics import generate_heuristic_message
+from commitgen.providers import Session
 
+_client = None
+_client_lock = threading.Lock()
 
-def generate_commit_message(diff_text, context):
+_provider = None
+_provider_lock = threading.Lock()
+
+
+def get_client():
+    """
+    Return the process-wide OpenAI client, creating it on first use.
+
+    Reusing one client keeps its HTTP connection pool alive, so every call
+    after the first in a session skips connection and TLS setup.
+    """
+    global _client
+
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                # Imported here: openai takes several hundred milliseconds to
+                # import, which commands that never call the API should not pay.
+                from openai import OpenAI
+
+                _client = OpenAI(
+                    api_key=ensure_api_key(),
+                    base_url=os.getenv("OPENAI_BASE_URL") or None,
+                    timeout=get_float_setting("COMMITGEN_TIMEOUT", REQUEST_TIMEOUT_SECONDS),
+                    # Retried by commitgen.resilience, which also bounds each attempt.
+                    max_retries=0,
+                )
+
+    return _client
+
+
+def create_async_client():
+    """
+    Build an asyncio client with the same settings as get_client. Async
+    clients are bound to an event loop, so callers own and close them.
+    """
+    from openai import AsyncOpenAI
+
+    return AsyncOpenAI(
+        api_key=ensure_api_key(),
+        base_url=os.getenv("OPENAI_BASE_URL") or None,
+        timeout=get_float_setting("COMMITGEN_TIMEOUT", REQUEST_TIMEOUT_SECONDS),
+        # Retries are left to the caller so it can apply its own backoff.
+        max_retries=0,
+    )
+
+
+def set_client(client):
+    """
+    Replace the shared client, e.g. with one pointed at a local stand-in server.
+    """
+    global _client
+
+    with _client_lock:
+        _client = client
+
+
+def reset_client():
+    """
+    Drop the shared client and provider so the next call builds fresh ones.
+    """
+    set_client(None)
+    set_provider(None)
+
+
+def create_provider(name: str = None) -> providers.Provider:
+    """
+    Build the provider named by COMMITGEN_PROVIDER ("openai", "compatible"
+    or "stub") with the model from COMMITGEN_MODEL.
+    """
+    name = (name or get_setting("COMMITGEN_PROVIDER", "openai")).lower()
+    model = get_setting("COMMITGEN_MODEL", DEFAULT_MODEL)
+
+    if name == "openai":
+        return providers.OpenAIProvider(model, get_client)
+
+    if name == "compatible":
+        base_url = get_setting("COMMITGEN_BASE_URL") or get_setting("OPENAI_BASE_URL")
+        if not base_url:
+            raise ValueError("COMMITGEN_BASE_URL must be set for the compatible provider")
+
+        return providers.CompatibleProvider(
+            model,
+            base_url,
+            api_key=get_setting("COMMITGEN_API_KEY") or get_setting("OPENAI_API_KEY"),
+            timeout=get_float_setting("COMMITGEN_TIMEOUT", REQUEST_TIMEOUT_SECONDS),
+        )
+
+    if name == "stub":
+        return providers.StubProvider(response=get_setting("COMMITGEN_STUB_RESPONSE"))
+
+    raise ValueError(f"Unknown provider {name!r}, expected one of {', '.join(providers.PROVIDER_NAMES)}")
+
+
+def get_provider() -> providers.Provider:
+    """
+    Return the process-wide provider, creating it from config on first use.
+    """
+    global _provider
+
+    if _provider is None:
+        with _provider_lock:
+            if _provider is None:
+                _provider = create_provider()
+
+    return _provider
+
+
+def set_provider(provider):
+    """
+    Replace the shared provider, e.g. with a StubProvider in tests.
+    """
+    global _provider
+
+    with _provider_lock:
+        _provider = provider
+
+
+COMMIT_RULES = (
+    "Rules:\n"
+    "- Use Conventional Commits format\n"
+    "- for each change type, use appropriate prefix ([FEAT], [FIX], [DOCS], [STYLE], [REFACTOR], [PERF], [TEST], [CI], [CHORE])\n"
+    "- Be concise\n"
+    "- If multiple change types are present, include both in the message\n"
+    "- Use present tense\n"
+    "- Do not include explanations\n"
+    "- If no changes detected, respond with '[CHORE]: no changes detected'\n"
+    "- Adding lines or stylistic changes or whitespace changes is considered a [CHORE]\n"
+    "- If presented additional context use it to generate a more specific message\n"
+    "- Cap message at 100 characters per change or feat\n"
+    "- Use imperative present tense (e.g. \"add\", \"fix\", \"update\", not \"added\" or \"fixed\")\n"
+    "- MOST IMPORTANT DO NOT SKIP THIS STEP Make sure to output using this template if more than one change type detected example -> '[FEAT]: add user login feature',\n '[FIX]: resolve crash on startup',\n '[DOCS]: update README with setup instructions'\n"
+)
+
+
+def generate_commit_message(diff_text, context, use_cache=True, session=None, blobs=None):
     """
     Function that generates a commit message based on the provided diff text and context.
     If no context is provided, it generates a commit message based solely off the diff.
+    Identical requests are answered from the on-disk response cache unless `use_cache` is False.
+    A `session` records the conversation so later refinements need not resend the diff.
+    `blobs` maps paths to their (old, new) blob hashes and keys the per-file summary index.
+    The model is picked per diff by the routing policy (see commitgen.routing).
+    """
+    try:
+        return _generate(diff_text, context, use_cache, session, blobs)
+    except resilience.BackendUnavailable:
+        # Not cached: the next run should try the model again.
+        return _fallback_commit_message(diff_text, context)
+
+
+def _generate(diff_text, context, use_cache=True, session=None, blobs=None, retries=None):
+    # generate_commit_message without the local fallback: raises
+    # BackendUnavailable when the model cannot be reached.
+    if not diff_text or diff_text.isspace():
+        return "chore: no changes detected"
+
+    started = time.perf_counter()
+    provider, decision = route(diff_text)
+
+    if provider is None:
+        message = generate_heuristic_message(diff_text, context)
+        routing.record(decision, (time.perf_counter() - started) * 1000)
+        return message
+
+    cache_key = cache.make_key(diff_text, context, provider.cache_id) if use_cache else None
+    if cache_key:
+        with metrics.span("cache.lookup"):
+            cached = cache.get(cache_key)
+        if cached:
+            return cached
+
+    prompt = _prepare_prompt(diff_text, context, use_cache, blobs, provider)
+    message = _request(prompt, session, provider, retries)
+
+    if decision is not None:
+        routing.record(decision, (time.perf_counter() - started) * 1000)
+
+    if cache_key:
+        cache.put(cache_key, message)
+
+    return message
+
+
+def generate_candidates(diff_text, context, n, use_cache=True, blobs=None) -> list:
+    """
+    Generate up to `n` alternative messages for one diff with a single round
+    of latency: the prompt is built once and the samples are requested
+    concurrently (or in one request where the provider supports it). The
+    candidates are ranked locally and returned best first; a cached message
+    counts as one of them.
+    """
+    if not diff_text or diff_text.isspace():
+        return [ranking.Candidate("chore: no changes detected")]
+
+    provider, decision = route(diff_text)
+
+    if provider is None:
+        return ranking.rank([ranking.Candidate(generate_heuristic_message(diff_text, context))], diff_text)
+
+    cache_key = cache.make_key(diff_text, context, provider.cache_id) if use_cache else None
+    candidates = []
+    cached = None
+
+    if cache_key:
+        with metrics.span("cache.lookup"):
+            cached = cache.get(cache_key)
+        if cached:
+            candidates.append(ranking.Candidate(cached))
+
+    wanted = n - len(candidates)
+    if wanted > 0:
+        started = time.perf_counter()
+        try:
+            prompt = _prepare_prompt(diff_text, context, use_cache, blobs, provider)
+            samples = _sample(prompt, wanted, provider)
+        except resilience.BackendUnavailable:
+            return candidates or [ranking.Candidate(_fallback_commit_message(diff_text, context))]
+
+        candidates += [ranking.Candidate(text, session=session) for text, session in samples]
+
+        if decision is not None:
+            routing.record(decision, (time.perf_counter() - started) * 1000)
+
+    ranked = ranking.rank(candidates, diff_text)
+
+    if cache_key and ranked and not cached:
+        cache.put(cache_key, ranked[0].message)
+
+    return ranked
+
+
+async def agenerate_commit_message(client, diff_text, context, use_cache=True, retries=None):
     """
-    if not diff_text.strip():
+    Async variant of generate_commit_message for use with create_async_client,
+    with the same deadline, retries and circuit breaker. There is no local
+    fallback: BackendUnavailable is raised so callers decide what a failed
+    request means for them. `retries` overrides COMMITGEN_MAX_RETRIES.
+    Providers without an async client (`client` is None) run the blocking
+    call on a worker thread instead.
+    """
+    if not diff_text or diff_text.isspace():
         return "chore: no changes detected"
 
-    prompt = _build_prompt(diff_text, context)
+    if client is None:
+        import asyncio
+
+        return await asyncio.to_thread(_generate, diff_text, context, use_cache, retries=retries)
+
+    started = time.perf_counter()
+    provider, decision = route(diff_text)
 
+    if provider is None:
+        routing.record(decision, (time.perf_counter() - started) * 1000)
+        return generate_heuristic_message(diff_text, context)
 
-    api_key = ensure_api_key()
-    client = OpenAI(api_key=api_key)
+    cache_key = cache.make_key(diff_text, context, provider.cache_id) if use_cache else None
+    if cache_key:
+        cached = cache.get(cache_key)
+        if cached:
+            return cached
 
-    response = client.responses.create( model="gpt-5-nano", input=prompt, store=True, )
+    if needs_chunking(diff_text) or uses_file_digests(diff_text):
+        import asyncio
+
+        prompt = await asyncio.to_thread(_prepare_prompt, diff_text, context, use_cache, None, provider)
+    else:
+        prompt = _build_prompt(diff_text, context)
+
+    response = await resilience.acall(
+        lambda: client.responses.create(model=provider.model, input=prompt, store=True), provider, retries
+    )
+
+    if decision is not None:
+        routing.record(decision, (time.perf_counter() - started) * 1000)
+
+    if cache_key:
+        cache.put(cache_key, response.output_text)
 
     return response.output_text
 
 
+def stream_commit_message(diff_text, context, use_cache=True, session=None, blobs=None):
+    """
+    Streaming variant of generate_commit_message that yields the message in
+    chunks as the model produces them. The response is only cached once the
+    stream has completed, so an interrupted stream leaves nothing behind.
+    """
+    if not diff_text or diff_text.isspace():
+        yield "chore: no changes detected"
+        return
+
+    started = time.perf_counter()
+    provider, decision = route(diff_text)
+
+    if provider is None:
+        routing.record(decision, (time.perf_counter() - started) * 1000)
+        yield generate_heuristic_message(diff_text, context)
+        return
+
+    cache_key = cache.make_key(diff_text, context, provider.cache_id) if use_cache else None
+    if cache_key:
+        with metrics.span("cache.lookup"):
+            cached = cache.get(cache_key)
+        if cached:
+            yield cached
+            return
+
+    parts = []
+    try:
+        for chunk in _stream_response(_prepare_prompt(diff_text, context, use_cache, blobs, provider), session, provider):
+            parts.append(chunk)
+            yield chunk
+    except resilience.BackendUnavailable:
+        # Raised before the first chunk, so nothing has been shown yet.
+        yield _fallback_commit_message(diff_text, context)
+        return
+
+    if decision is not None:
+        routing.record(decision, (time.perf_counter() - started) * 1000)
+
+    if cache_key:
+        cache.put(cache_key, "".join(parts))
+
+
+def route(diff_text: str) -> tuple:
+    """
+    Pick the provider for a diff according to the routing policy. Returns
+    the provider (None for the local heuristic tier) and the decision, which
+    is None when COMMITGEN_ROUTING is "off".
+    """
+    provider = get_provider()
+
+    if get_setting("COMMITGEN_ROUTING", "on").lower() == "off":
+        return provider, None
+
+    with metrics.span("route"):
+        decision = routing.choose(diff_text, provider)
+
+    metrics.record("route_tier", decision.tier)
+
+    if decision.tier == "local":
+        return None, decision
+
+    if decision.model != provider.model:
+        provider = provider.with_model(decision.model)
+
+    return provider, decision
+
+
+def needs_chunking(diff_text: str) -> bool:
+    """
+    Whether a diff is too large for one request and should go through
+    summarize_chunks instead.
+    """
+    threshold = get_int_setting("COMMITGEN_CHUNK_THRESHOLD", CHUNK_THRESHOLD_TOKENS)
+    return compaction.estimate_tokens(diff_text) > threshold
+
+
+def summarize_chunks(diff_text: str, chunk_tokens: int = None, workers: int = None, provider=None) -> list:
+    """
+    Map step for very large diffs: split the diff by file and hunk group and
+    summarize each chunk in parallel with a bounded worker pool. Summaries
+    are returned in diff order.
+    """
+    if chunk_tokens is None:
+        chunk_tokens = get_int_setting("COMMITGEN_CHUNK_TOKENS", CHUNK_TOKENS)
+    if workers is None:
+        workers = get_int_setting("COMMITGEN_CHUNK_WORKERS", CHUNK_WORKERS)
+
+    chunks = chunk_diff(diff_text, chunk_tokens * compaction.CHARS_PER_TOKEN)
+
+    def summarize(chunk):
+        return _request(_build_chunk_prompt(chunk), provider=provider).strip()
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        return list(pool.map(summarize, chunks))
+
+
+def uses_file_digests(diff_text: str) -> bool:
+    """
+    Whether a diff is too large for one prompt, and spread over enough
+    files, that it is worth summarizing per file through the digest index.
+    Anything within the token budget goes out as a single request.
+    """
+    if get_setting("COMMITGEN_FILE_DIGESTS", "auto").lower() == "off":
+        return False
+
+    threshold = get_int_setting("COMMITGEN_DIGEST_THRESHOLD", get_int_setting("COMMITGEN_TOKEN_BUDGET", TOKEN_BUDGET))
+    if compaction.estimate_tokens(diff_text) <= threshold:
+        return False
+
+    files = diff_text.count("\ndiff --git ") + diff_text.startswith("diff --git ")
+    return 1 < files <= get_int_setting("COMMITGEN_DIGEST_MAX_FILES", DIGEST_MAX_FILES)
+
+
+def summarize_files(diff_text: str, use_cache: bool = True, blobs: dict = None, workers: int = None,
+                    provider=None) -> list:
+    """
+    Map step keyed per file: summaries of files whose blob pair was seen
+    before come from the digest index, and only the remaining files are
+    summarized, in parallel. Returns one "path + summary" entry per file,
+    in diff order.
+    """
+    if workers is None:
+        workers = get_int_setting("COMMITGEN_CHUNK_WORKERS", CHUNK_WORKERS)
+
+    provider = provider or get_provider()
+    model = provider.cache_id
+    index = digests.load() if use_cache else {}
+    summaries = []
+    missing = []
+    # Entries used by this run, hits included, so they stay the most recent.
+    touched = {}
+
+    for file_diff in split_file_diffs(diff_text):
+        if file_diff.summary:
+            # Already reduced to one line by compaction; nothing to ask the model.
+            summaries.append(file_diff.summary.strip())
+            continue
+
+        text = file_diff.text()
+        key = digests.make_key(file_diff.path, (blobs or {}).get(file_diff.path), text, model)
+
+        if key in index:
+            summary = index[key]["summary"]
+            touched[key] = digests.entry(summary)
+            summaries.append(f"{file_diff.path}:\n{summary}")
+        else:
+            missing.append((len(summaries), key, file_diff.path, text))
+            summaries.append(None)
+
+    metrics.record("digest_hits", len(touched), accumulate=True)
+    metrics.record("digest_misses", len(missing), accumulate=True)
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        results = pool.map(lambda item: _summarize_file(item[3], provider), missing)
+
+        for (position, key, path, _), summary in zip(missing, results):
+            summaries[position] = f"{path}:\n{summary}"
+            touched[key] = digests.entry(summary)
+
+    if touched:
+        digests.save(touched)
+
+    return summaries
+
+
+def _summarize_file(text: str, provider=None) -> str:
+    chunk_chars = get_int_setting("COMMITGEN_CHUNK_TOKENS", CHUNK_TOKENS) * compaction.CHARS_PER_TOKEN
+    return "\n".join(
+        _request(_build_chunk_prompt(piece), provider=provider).strip() for piece in chunk_diff(text, chunk_chars)
+    )
+
+
+def _prepare_prompt(diff_text: str, context: str, use_cache: bool = True, blobs: dict = None, provider=None) -> str:
+    with metrics.span("prompt.build"):
+        if uses_file_digests(diff_text):
+            return _build_reduce_prompt(summarize_files(diff_text, use_cache, blobs, provider=provider), context)
+
+        if needs_chunking(diff_text):
+            return _build_reduce_prompt(summarize_chunks(diff_text, provider=provider), context)
+
+        return _build_prompt(diff_text, context)
+
+
+def _request(prompt: str, session: Session = None, provider=None, retries=None) -> str:
+    """
+    Send one blocking request through the provider and return its text,
+    recording prompt size and latency. Without streaming the first token
+    arrives with the whole response, so time to first token equals the
+    request latency.
+    """
+    provider = provider or get_provider()
+    metrics.record("prompt_tokens", compaction.estimate_tokens(prompt), accumulate=True)
+    started = time.perf_counter()
+
+    def attempt():
+        # Each attempt continues from its own copy of the session, so an
+        # abandoned or hedged attempt never touches the caller's.
+        trial = Session(session.state) if session is not None else None
+        return provider.complete(prompt, trial), trial
+
+    with metrics.span("model.request"):
+        message, trial = resilience.call(attempt, provider, retries)
+
+    if session is not None:
+        session.state = trial.state
+
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    metrics.record("ttft_ms", round(elapsed_ms, 2))
+    metrics.record("model_latency_ms", round(elapsed_ms, 2), accumulate=True)
+
+    return message
+
+
+def _sample(prompt: str, n: int, provider=None) -> list:
+    """
+    Request `n` samples for one prompt through the provider. The prompt is
+    only counted once: that is what the samples share.
+    """
+    metrics.record("prompt_tokens", compaction.estimate_tokens(prompt), accumulate=True)
+    started = time.perf_counter()
+
+    provider = provider or get_provider()
+
+    with metrics.span("model.request"):
+        samples = resilience.call(lambda: provider.sample(prompt, n), provider)
+
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    metrics.record("ttft_ms", round(elapsed_ms, 2))
+    metrics.record("model_latency_ms", round(elapsed_ms, 2), accumulate=True)
+
+    return samples
+
+
+def _stream_response(prompt: str, session: Session = None, provider=None):
+    provider = provider or get_provider()
+    metrics.record("prompt_tokens", compaction.estimate_tokens(prompt), accumulate=True)
+    started = time.perf_counter()
+    first_token = True
+    trials = []
+
+    def open_stream():
+        trials.append(Session(session.state) if session is not None else None)
+        return provider.stream(prompt, trials[-1])
+
+    chunks = resilience.stream(open_stream, provider)
+
+    try:
+        for chunk in chunks:
+            if first_token:
+                metrics.record("ttft_ms", round((time.perf_counter() - started) * 1000, 2))
+                first_token = False
+            yield chunk
+
+        if session is not None and trials:
+            session.state = trials[-1].state
+    finally:
+        # Closing the provider's generator releases its HTTP response, also
+        # when the consumer stops early (e.g. Ctrl-C).
+        chunks.close()
+
+        elapsed = time.perf_counter() - started
+        metrics.record("model_latency_ms", round(elapsed * 1000, 2), accumulate=True)
+        metrics.add_span("model.stream", elapsed)
+
+
 def _build_prompt(diff_text: str, context: str) -> str:
-    prompt = (
+    # Collect the pieces and join once: repeated concatenation would copy a
+    # large diff several times over.
+    parts = [
         "You are an expert software engineer.\n"
         "Generate a Conventional Commit message based on the following git diff.\n\n"
-        f"GIT DIFF:\n{diff_text}\n\n"
+        "GIT DIFF:\n",
+        diff_text,
+        "\n\n",
+    ]
+
+    if context:
+        parts.append(f"ADDITIONAL CONTEXT:\n{context}\n\n")
+
+    parts.append(COMMIT_RULES)
+
+    return "".join(parts)
+
+
+def _build_chunk_prompt(chunk: str) -> str:
+    return (
+        "You are an expert software engineer.\n"
+        "The following is one part of a larger git diff.\n"
+        "Summarize what changed in this part as a short bullet list.\n"
+        "Start each bullet with its change type ([FEAT], [FIX], [DOCS], [STYLE], [REFACTOR], [PERF], [TEST], [CI], [CHORE]).\n"
+        "Do not include explanations.\n\n"
+        f"GIT DIFF PART:\n{chunk}\n"
+    )
+
+
+def _build_reduce_prompt(summaries: list, context: str) -> str:
+    parts = "\n\n".join(f"PART {i}:\n{summary}" for i, summary in enumerate(summaries, 1))
+
+    prompt = (
+        "You are an expert software engineer.\n"
+        "The git diff was too large to send at once, so each part of it was summarized.\n"
+        "Generate a single Conventional Commit message covering all of the summarized changes below.\n\n"
+        f"CHANGE SUMMARIES:\n{parts}\n\n"
     )
 
     if context:
         prompt += f"ADDITIONAL CONTEXT:\n{context}\n\n"
 
-    prompt += (
-        "Rules:\n"
-        "- Use Conventional Commits format\n"
-        "- for each change type, use appropriate prefix ([FEAT], [FIX], [DOCS], [STYLE], [REFACTOR], [PERF], [TEST], [CI], [CHORE])\n"
-        "- Be concise\n"
-        "- If multiple change types are present, include both in the message\n"
-        "- Use present tense\n"
-        "- Do not include explanations\n"
-        "- If no changes detected, respond with '[CHORE]: no changes detected'\n"
-        "- Adding lines or stylistic changes or whitespace changes is considered a [CHORE]\n"
-        "- If presented additional context use it to generate a more specific message\n"
-        "- Cap message at 100 characters per change or feat\n"
-        "- Use imperative present tense (e.g. \"add\", \"fix\", \"update\", not \"added\" or \"fixed\")\n"
-        "- MOST IMPORTANT DO NOT SKIP THIS STEP Make sure to output using this template if more than one change type detected example -> '[FEAT]: add user login feature',\n '[FIX]: resolve crash on startup',\n '[DOCS]: update README with setup instructions'\n"
-    )
+    prompt += COMMIT_RULES
 
     return prompt
 
-def refine_commit_message(existing_message: str, context: str) -> str:
-    api_key = ensure_api_key()
-    client = OpenAI(api_key=api_key)
+def refine_commit_message(existing_message: str, context: str, session: Session = None) -> str:
+    """
+    Refine a message with extra context. With an active session only the
+    context is sent, as a follow-up to the stored conversation that already
+    holds the diff; otherwise the existing message is sent on its own.
+    """
+    try:
+        return _request(_refine_prompt(existing_message, context, session), session)
+    except resilience.BackendUnavailable:
+        # Nothing to refine with locally: keep the message as it is.
+        return existing_message
 
-    prompt = (
+
+def stream_refine_commit_message(existing_message: str, context: str, session: Session = None):
+    """
+    Streaming variant of refine_commit_message.
+    """
+    try:
+        yield from _stream_response(_refine_prompt(existing_message, context, session), session)
+    except resilience.BackendUnavailable:
+        yield existing_message
+
+
+def _refine_prompt(existing_message: str, context: str, session: Session = None) -> str:
+    if session is not None and session.active:
+        return _build_followup_prompt(context)
+
+    return _build_refine_prompt(existing_message, context)
+
+
+def _build_followup_prompt(context: str) -> str:
+    return (
+        "Revise the commit message you just wrote for this diff using the context below.\n"
+        "Follow the same rules and output only the revised message.\n\n"
+        f"ADDITIONAL CONTEXT:\n{context}\n"
+    )
+
+
+def _build_refine_prompt(existing_message: str, context: str) -> str:
+    return (
         "You are refining an existing Conventional Commit message.\n\n"
         f"EXISTING MESSAGE:\n{existing_message}\n\n"
         f"USER CONTEXT:\n{context}\n\n"
@@ -65,21 +666,8 @@ def refine_commit_message(existing_message: str, context: str) -> str:
         "- Keep output concise\n"
     )
 
-    response = client.responses.create(
-        model="gpt-5-nano",
-        input=prompt,
-        store=True,
-    )
-
-    return response.output_text
-
 def _fallback_commit_message(diff_text: str, context: str) -> str:
-    if not diff_text.strip():
-        return "chore: no changes detected"
-
-    base = "[FEAT]: update to codebase"
-
-    if context:
-        return f"{base}\n\nContext: {context}"
-
-    return base
+    """
+    Local message used when the model is unavailable or returns nothing.
+    """
+    return generate_heuristic_message(diff_text, context)
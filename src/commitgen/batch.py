@@ -0,0 +1,123 @@
+import asyncio
+import glob
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+import commitgen.git_utils as git_utils
+from commitgen import ai, compaction
+from commitgen.config import get_int_setting
+from commitgen.constants import BATCH_CONCURRENCY, BATCH_MAX_RETRIES
+
+
+@dataclass
+class BatchResult:
+    """
+    Outcome of running the commit pipeline against one repository.
+    """
+
+    path: str
+    status: str
+    message: str = ""
+    latency: float = 0.0
+    error: str = ""
+
+    @property
+    def ok(self) -> bool:
+        return self.status in ("committed", "pushed", "skipped")
+
+
+def expand_paths(patterns: list) -> list:
+    """
+    Expand glob patterns into a de-duplicated list of directories.
+    """
+    paths = []
+
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+        paths.extend(match for match in matches if Path(match).is_dir())
+
+    return list(dict.fromkeys(paths))
+
+
+def run_batch(paths: list, push: bool = False, concurrency: int = None, use_cache: bool = True) -> list:
+    """
+    Generate and commit a message in every repository in `paths`. Model
+    requests run concurrently, so wall time follows the slowest repo rather
+    than the sum of all of them.
+    """
+    if concurrency is None:
+        concurrency = get_int_setting("COMMITGEN_BATCH_CONCURRENCY", BATCH_CONCURRENCY)
+
+    return asyncio.run(_run_batch(paths, push, max(1, concurrency), use_cache))
+
+
+def create_client():
+    """
+    The asyncio client for concurrent generation, or None for providers that
+    have none and run their blocking calls on worker threads instead (see
+    agenerate_commit_message).
+    """
+    return ai.create_async_client() if ai.get_provider().name == "openai" else None
+
+
+async def _run_batch(paths, push, concurrency, use_cache):
+    client = create_client()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    try:
+        return await asyncio.gather(
+            *(_process_repo(client, semaphore, path, push, use_cache) for path in paths)
+        )
+    finally:
+        if client is not None:
+            await client.close()
+
+
+async def _process_repo(client, semaphore, path, push, use_cache) -> BatchResult:
+    started = time.perf_counter()
+
+    try:
+        snapshot = await asyncio.to_thread(git_utils.take_snapshot, cwd=path)
+
+        if not snapshot.is_repo:
+            return BatchResult(path, "skipped", error="not a git repository")
+
+        diff_text = snapshot.diff
+        if not snapshot.has_staged_changes:
+            await asyncio.to_thread(git_utils.stage_all_changes, cwd=path)
+            diff_text = await asyncio.to_thread(git_utils.read_staged_diff, cwd=path)
+
+        if not diff_text or diff_text.isspace():
+            return BatchResult(path, "skipped", error="no changes")
+
+        diff_text = compaction.compact_diff(diff_text).text
+
+        async with semaphore:
+            message = await generate_with_backoff(client, diff_text, use_cache)
+
+        if not message.strip():
+            message = ai._fallback_commit_message(diff_text, "")
+
+        await asyncio.to_thread(git_utils.commit_changes, message, cwd=path)
+        status = "committed"
+
+        if push:
+            pushed = await asyncio.to_thread(git_utils.push_changes, cwd=path)
+            status = "pushed" if pushed else "push failed"
+
+        return BatchResult(path, status, message=message, latency=time.perf_counter() - started)
+    except Exception as exc:
+        return BatchResult(path, "failed", latency=time.perf_counter() - started, error=str(exc))
+
+
+async def generate_with_backoff(client, diff_text, use_cache) -> str:
+    """
+    Generate a message with COMMITGEN_BATCH_MAX_RETRIES retries: a batch
+    sends many requests at once, so it waits out rate limits for longer
+    than a single commit would. Raises BackendUnavailable once they are
+    spent, so the repository is reported as failed rather than committed
+    with a local message.
+    """
+    retries = get_int_setting("COMMITGEN_BATCH_MAX_RETRIES", BATCH_MAX_RETRIES)
+    return await ai.agenerate_commit_message(client, diff_text, "", use_cache=use_cache, retries=retries)
@@ -0,0 +1,166 @@
+import hashlib
+import json
+import os
+import time
+
+from commitgen.config import CONFIG_DIR, get_int_setting
+from commitgen.constants import CACHE_MAX_BYTES, CACHE_TTL_SECONDS, PROMPT_VERSION
+
+CACHE_DIR = CONFIG_DIR / "cache"
+STATS_FILE_NAME = "stats.json"
+
+
+def make_key(diff_text: str, context: str, model: str) -> str:
+    """
+    Build a content-addressed cache key for a generation request.
+    """
+    digest = hashlib.sha256()
+    for part in (PROMPT_VERSION, model, context.strip(), _normalize_diff(diff_text)):
+        digest.update(part.encode("utf-8", errors="replace"))
+        digest.update(b"\0")
+
+    return digest.hexdigest()
+
+
+def get(key: str):
+    """
+    Return the cached message for `key`, or None on a miss or expired entry.
+    """
+    path = CACHE_DIR / f"{key}.json"
+
+    try:
+        entry = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        _bump_stat("misses")
+        return None
+
+    if time.time() - entry.get("created", 0) > _ttl_seconds():
+        path.unlink(missing_ok=True)
+        _bump_stat("misses")
+        return None
+
+    # Touch the entry so size-based eviction drops least recently used first.
+    os.utime(path, None)
+    _bump_stat("hits")
+
+    return entry.get("message")
+
+
+def put(key: str, message: str):
+    """
+    Store a generated message and evict old entries if the cache is too large.
+    """
+    if not message or not message.strip():
+        return
+
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+
+    entry = {"message": message, "created": time.time()}
+    (CACHE_DIR / f"{key}.json").write_text(json.dumps(entry), encoding="utf-8")
+
+    evict()
+
+
+def evict() -> int:
+    """
+    Remove expired entries, then the least recently used ones until the
+    cache fits its size budget. Returns the number of entries removed.
+    """
+    entries = _entries()
+    now = time.time()
+    ttl = _ttl_seconds()
+    removed = 0
+
+    alive = []
+    for path, stat in entries:
+        if now - stat.st_mtime > ttl:
+            path.unlink(missing_ok=True)
+            removed += 1
+        else:
+            alive.append((path, stat))
+
+    total = sum(stat.st_size for _, stat in alive)
+    max_bytes = _max_bytes()
+
+    for path, stat in sorted(alive, key=lambda item: item[1].st_mtime):
+        if total <= max_bytes:
+            break
+        path.unlink(missing_ok=True)
+        total -= stat.st_size
+        removed += 1
+
+    return removed
+
+
+def stats() -> dict:
+    """
+    Return hit/miss counters along with the current size of the cache.
+    """
+    counters = _read_stats()
+    entries = _entries()
+
+    return {
+        "hits": counters.get("hits", 0),
+        "misses": counters.get("misses", 0),
+        "entries": len(entries),
+        "bytes": sum(stat.st_size for _, stat in entries),
+    }
+
+
+def clear():
+    """
+    Delete every cached response and reset the counters.
+    """
+    for path, _ in _entries():
+        path.unlink(missing_ok=True)
+
+    (CACHE_DIR / STATS_FILE_NAME).unlink(missing_ok=True)
+
+
+def _normalize_diff(diff_text: str) -> str:
+    # Line endings and trailing whitespace do not change what the model sees
+    # as the meaning of a diff, so they should not produce a new key.
+    lines = diff_text.replace("\r\n", "\n").split("\n")
+    return "\n".join(line.rstrip() for line in lines).strip()
+
+
+def _entries():
+    if not CACHE_DIR.exists():
+        return []
+
+    entries = []
+    for path in CACHE_DIR.glob("*.json"):
+        if path.name == STATS_FILE_NAME:
+            continue
+        try:
+            entries.append((path, path.stat()))
+        except OSError:
+            continue
+
+    return entries
+
+
+def _read_stats() -> dict:
+    try:
+        return json.loads((CACHE_DIR / STATS_FILE_NAME).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
+def _bump_stat(name: str):
+    counters = _read_stats()
+    counters[name] = counters.get(name, 0) + 1
+
+    try:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        (CACHE_DIR / STATS_FILE_NAME).write_text(json.dumps(counters), encoding="utf-8")
+    except OSError:
+        pass
+
+
+def _max_bytes() -> int:
+    return get_int_setting("COMMITGEN_CACHE_MAX_BYTES", CACHE_MAX_BYTES)
+
+
+def _ttl_seconds() -> int:
+    return get_int_setting("COMMITGEN_CACHE_TTL", CACHE_TTL_SECONDS)
@@ -1,74 +1,210 @@
+import time
 import typer
-from rich.console import Console
-from rich.panel import Panel
-from rich.table import Table
 import commitgen.git_utils as git_utils
-from commitgen import ai
-from commitgen.config import CONFIG_DIR, CONFIG_FILE
+from commitgen import cache, compaction, digests, heuristics, metrics, prefetch
+from commitgen.config import CONFIG_DIR, CONFIG_FILE, get_setting
+
+# Rich, the model client (ai), the daemon and the push queue are imported
+# by the commands that use them, so commands that need none of them, like
+# the background `hook run` and `push run` workers, never load them.
 
 app = typer.Typer(help="CommitGen – AI-powered Conventional Commit generator")
-console = Console()
+daemon_app = typer.Typer(help="Run a background daemon that keeps the model client and config warm")
+app.add_typer(daemon_app, name="daemon")
+hook_app = typer.Typer(help="Prepare messages in the background for plain `git commit`")
+app.add_typer(hook_app, name="hook")
+push_app = typer.Typer(help="Inspect pushes running in the background")
+app.add_typer(push_app, name="push")
+
+
+_console_instance = None
+
+
+def _console():
+    """
+    Rich's Console, created when something is first printed.
+    """
+    global _console_instance
+
+    if _console_instance is None:
+        from rich.console import Console
+
+        _console_instance = Console()
+
+    return _console_instance
+
+
+def _panel(*args, **kwargs):
+    from rich.panel import Panel
+
+    return Panel(*args, **kwargs)
 
 
 @app.command()
 def commit(push: bool = typer.Option(False, "--push", "-p", help="Push the commit after committing"),
-           auto: bool = typer.Option(False, "--auto", "-a", help="Automatically commit with generated message and push")):
+           auto: bool = typer.Option(False, "--auto", "-a", help="Automatically commit with generated message and push"),
+           no_cache: bool = typer.Option(False, "--no-cache", help="Always request a fresh message instead of reusing a cached one"),
+           stream: bool = typer.Option(False, "--stream", "-s", help="Show the suggestion as it is being generated"),
+           offline: bool = typer.Option(False, "--offline", help="Generate the message locally from the diff, without calling the API"),
+           profile: bool = typer.Option(False, "--profile", help="Print a per-stage timing breakdown when done"),
+           metrics_file: str = typer.Option(None, "--metrics-file", help="Append this run's timings as a JSON line to this file"),
+           no_daemon: bool = typer.Option(False, "--no-daemon", help="Run in-process even if a commitgen daemon is running"),
+           candidates: int = typer.Option(1, "--candidates", "-n", min=1, help="Generate this many messages at once and pick one from a ranked table"),
+           background_push: bool = typer.Option(False, "--background-push", help="Return once committed and push in a background worker (COMMITGEN_PUSH_MODE=background)")):
     """
     Generate a Conventional Commit message from staged changes.
     """
+    from commitgen import pushqueue, resilience
+
+    _report_pushes()
+
+    if metrics_file is None:
+        metrics_file = get_setting("COMMITGEN_METRICS_FILE")
+
+    recorder = metrics.start() if profile or metrics_file else None
+    exit_code = 0
+
+    try:
+        _run_commit(push, auto, no_cache, stream, offline, use_daemon=not no_daemon, candidates=candidates,
+                    background_push=background_push or pushqueue.background_enabled())
+    except typer.Exit as exc:
+        exit_code = exc.exit_code
+        raise
+    except resilience.RequestRejected as exc:
+        exit_code = 1
+        _print_rejected(exc)
+        raise typer.Exit(code=1)
+    except BaseException:
+        exit_code = 1
+        raise
+    finally:
+        if recorder is not None:
+            metrics.stop()
+            if profile:
+                _print_profile(recorder)
+            if metrics_file:
+                metrics.append_jsonl(metrics_file, recorder, command="commit", exit_code=exit_code)
+
+
+def _run_commit(push: bool, auto: bool, no_cache: bool, stream: bool, offline: bool, use_daemon: bool = True,
+                candidates: int = 1, background_push: bool = False):
+    """
+    The interactive (or --auto) commit flow behind the commit command.
+    """
+    from commitgen import ai, daemon
 
     current_context = ""
     message = None
     diff_text = None
+    diff_bytes = 0
+    compacted = False
+    speculative = False
+    # Blob hash pairs of the staged files, which key the per-file summaries.
+    blobs = None
+    # Conversation state of the message shown, so refinements can be sent
+    # as follow-ups instead of resending the diff.
+    session = ai.Session()
 
-    if not git_utils.verify_repo():
-        console.print(Panel("[bold red]You are not inside a Git repository[/bold red]", title="Error", border_style="red"))
+    snapshot = git_utils.take_snapshot()
+
+    if not snapshot.is_repo:
+        _console().print(_panel("[bold red]You are not inside a Git repository[/bold red]", title="Error", border_style="red"))
         raise typer.Exit(code=1)
 
+    # Model calls go to a running daemon when there is one, and run
+    # in-process otherwise; both expose the same functions.
+    engine = (daemon.connect() if use_daemon and not offline else None) or ai
+
+    def generate(diff_text, session, blobs=None):
+        # With --candidates the result is a ranked list, resolved by _choose.
+        if candidates > 1:
+            return engine.generate_candidates(diff_text, current_context, candidates, use_cache=not no_cache, blobs=blobs)
+        return engine.generate_commit_message(diff_text, current_context, use_cache=not no_cache,
+                                              session=session, blobs=blobs)
+
+    # Requests run on a background thread so generation overlaps with the
+    # staging prompt and the rest of the flow. Candidates are shown together
+    # once all have arrived, so they are never streamed.
+    prefetcher = prefetch.Prefetcher()
+    stream = stream and candidates == 1
+    prefetch_enabled = not offline and not stream
+
+    if snapshot.has_staged_changes and snapshot.diff and not snapshot.diff.isspace():
+        diff_text = _compact_diff(snapshot.diff, snapshot.diff_bytes)
+        compacted = True
+        blobs = snapshot.blobs
+
+        if prefetch_enabled:
+            prefetcher.start(generate, diff_text, session, blobs=blobs)
+
     if auto:
         # --- Ensure staged changes ---
-        if not git_utils.has_staged_changes():
+        if not snapshot.has_staged_changes:
             git_utils.stage_all_changes()
+            diff_text, diff_bytes = _read_staged_diff()
 
-        diff_text = git_utils.get_staged_diff()
-        if not diff_text.strip():
-            console.print("[red]No changes detected[/red]")
+        if not diff_text or diff_text.isspace():
+            _console().print("[red]No changes detected[/red]")
             raise typer.Exit(code=1)
 
-        message = ai.generate_commit_message(diff_text, current_context)
+        if not compacted:
+            diff_text = _compact_diff(diff_text, diff_bytes)
+            blobs = _staged_blobs(diff_text)
+
+        if offline:
+            message = heuristics.generate_heuristic_message(diff_text, current_context)
+        elif prefetcher.pending:
+            message = _wait_for(prefetcher)
+        else:
+            message = generate(diff_text, session, blobs=blobs)
+        if isinstance(message, list):
+            # Nobody to ask: take the best ranked candidate.
+            message = message[0].message if message else ""
         if not message.strip():
             message = ai._fallback_commit_message(diff_text, current_context)
 
         git_utils.commit_changes(message)
-        console.print(Panel("[green]✅ Auto commit successful![/green]", title="Success", border_style="green"))
+        _console().print(_panel("[green]✅ Auto commit successful![/green]", title="Success", border_style="green"))
 
         if push or True:
-            git_utils.push_changes()
-            console.print(Panel("[green]✅ Auto push complete![/green]", title="Success", border_style="green"))
+            _push(background_push, done="✅ Auto push complete!")
 
         raise typer.Exit()
 
 
-    if not git_utils.has_staged_changes():
-        console.print(Panel("[yellow]No staged changes detected.[/yellow]", title="Info", border_style="yellow"))
+    if snapshot.has_staged_changes:
+        if not compacted:
+            diff_text, diff_bytes = snapshot.diff, snapshot.diff_bytes
+    else:
+        _console().print(_panel("[yellow]No staged changes detected.[/yellow]", title="Info", border_style="yellow"))
+
+        # Guess that everything will be staged and start generating for
+        # that diff while the user is still reading the prompt.
+        if prefetch_enabled and snapshot.modified_files:
+            prefetcher.start(_speculate_stage_all, generate)
+            speculative = True
 
-        choice = typer.prompt(
+        choice = _prompt(
             "(a) stage all, (s) select files, (q) quit"
         ).lower()
 
+        if choice != 'a' and speculative:
+            prefetcher.cancel()
+            speculative = False
+
         if choice == 'a':
             git_utils.stage_all_changes()
         elif choice == 's':
-            files = git_utils.get_modified_files()
+            files = snapshot.modified_files
 
             if not files:
-                console.print("[red]No files to stage[/red]")
+                _console().print("[red]No files to stage[/red]")
                 raise typer.Exit(code=1)
 
             for i, f in enumerate(files, 1):
-                console.print(f"[{i}] {f}")
+                _console().print(f"[{i}] {f}")
 
-            selection = typer.prompt(
+            selection = _prompt(
                 "Select files (comma-separated numbers)"
             )
 
@@ -77,40 +213,76 @@ def commit(push: bool = typer.Option(False, "--push", "-p", help="Push the commi
                 for i in indexes:
                     git_utils.stage_file(files[i - 1])
 
-                console.print(
-                    Panel(
+                _console().print(
+                    _panel(
                         "[green]Selected files staged successfully[/green]",
                         title="Success",
                         border_style="green",
                     )
                 )
             except ValueError:
-                console.print("[red]Invalid selection[/red]")
+                _console().print("[red]Invalid selection[/red]")
                 raise typer.Exit(code=1)
 
         else:
             raise typer.Exit(code=1)
 
-    while True:
-        if diff_text is None:
-            diff_text = git_utils.get_staged_diff()
+    if diff_text is None:
+        diff_text, diff_bytes = _read_staged_diff()
 
-            if not diff_text.strip():
-                console.print(
-                    Panel(
-                        "[bold red]Unable to retrieve staged changes[/bold red]",
-                        title="Error",
-                        border_style="red",
-                    )
-                )
-                raise typer.Exit(code=1)
+    if not diff_text or diff_text.isspace():
+        prefetcher.cancel()
+        _console().print(
+            _panel(
+                "[bold red]Unable to retrieve staged changes[/bold red]",
+                title="Error",
+                border_style="red",
+            )
+        )
+        raise typer.Exit(code=1)
 
+    if not compacted:
+        diff_text = _compact_diff(diff_text, diff_bytes)
+        blobs = _staged_blobs(diff_text)
+
+    if speculative:
+        try:
+            guess = _wait_for(prefetcher)
+        except Exception:
+            guess = None
+
+        # Only keep the speculative message if it was generated for exactly
+        # the diff that ended up staged.
+        if guess is not None and guess[0] == diff_text:
+            _, message, session = guess
+            if isinstance(message, list):
+                message, session = _choose(message)
+
+    while True:
         if message is None:
-            message = ai.generate_commit_message(diff_text, current_context)
+            if offline:
+                message = heuristics.generate_heuristic_message(diff_text, current_context)
+            elif stream:
+                message = _stream_panel(
+                    engine.stream_commit_message(diff_text, current_context, use_cache=not no_cache,
+                                                 session=session, blobs=blobs),
+                    "💡 Suggested Commit Message",
+                )
+
+                if message is None:
+                    _console().print(_panel("[yellow]Generation cancelled by user[/yellow]", title="Aborted", border_style="yellow"))
+                    raise typer.Exit(code=1)
+            elif prefetcher.pending:
+                message = _wait_for(prefetcher)
+            else:
+                message = generate(diff_text, session, blobs=blobs)
+
+            if isinstance(message, list):
+                message, session = _choose(message)
 
             if not message.strip() or not message:
-                console.print(
-                    Panel(
+                _console().print(
+                    _panel(
                         "[bold red]Failed to generate commit message. using fallback[/bold red]",
                         title="Error",
                         border_style="red",
@@ -119,31 +291,59 @@ def commit(push: bool = typer.Option(False, "--push", "-p", help="Push the commi
                 message = ai._fallback_commit_message(diff_text, current_context)
 
         # --- Suggested Commit Message ---
-        console.print(Panel(message, title="💡 Suggested Commit Message", border_style="cyan"))
+        _console().print(_panel(message, title="💡 Suggested Commit Message", border_style="cyan"))
 
-        choice = typer.prompt("(a) accept, (r) regenerate with context, (i) inline edit, (e) extended inline edit in custom editor, or (q)uit?")
+        choice = _prompt("(a) accept, (r) regenerate with context, (i) inline edit, (e) extended inline edit in custom editor, or (q)uit?")
 
         if choice.lower() == 'a':
             git_utils.commit_changes(message)
-            console.print(Panel("[green]✅ Commit successful![/green]", title="Success", border_style="green"))
+            _console().print(_panel("[green]✅ Commit successful![/green]", title="Success", border_style="green"))
             break
 
         elif choice.lower() == 'r':
-            extra_context = typer.prompt("Add context to refine this message").strip()
+            extra_context = _prompt("Add context to refine this message").strip()
 
             if not extra_context:
                 continue
 
-            message = ai.refine_commit_message(message, extra_context)
+            # Continue from the current conversation without touching it, so a
+            # cancelled or superseded refinement leaves it as it was.
+            refined_session = ai.Session(state=session.state)
+
+            if offline:
+                message = heuristics.generate_heuristic_message(diff_text, extra_context)
+            elif stream:
+                refined = _stream_panel(
+                    engine.stream_refine_commit_message(message, extra_context, session=refined_session),
+                    "💡 Refined Commit Message",
+                )
+
+                if refined is None:
+                    _console().print(
+                        _panel(
+                            "[yellow]Refinement cancelled. Keeping previous message.[/yellow]",
+                            title="Info",
+                            border_style="yellow",
+                        )
+                    )
+                    continue
+
+                message = refined
+                session = refined_session
+            else:
+                # Supersedes any request that is still in flight.
+                prefetcher.start(engine.refine_commit_message, message, extra_context, session=refined_session)
+                message = _wait_for(prefetcher)
+                session = refined_session
 
         elif choice.lower() == 'i':
-            edited = typer.prompt(
+            edited = _prompt(
                 "Edited commit message",
             ).strip()
 
             if not edited:
-                console.print(
-                    Panel(
+                _console().print(
+                    _panel(
                         "[red]Commit message cannot be empty.[/red]",
                         title="Error",
                         border_style="red",
@@ -151,9 +351,12 @@ def commit(push: bool = typer.Option(False, "--push", "-p", help="Push the commi
                 )
                 continue
             message = edited
+            # The model's last reply no longer matches the message; refine
+            # from the edited text instead.
+            session = ai.Session()
 
         elif choice.lower() == 'e':
-            console.print(
+            _console().print(
                 "[dim]Tip: Save the file before closing the editor to apply changes. Press Ctrl+S to save![/dim]"
             )
 
@@ -161,8 +364,8 @@ def commit(push: bool = typer.Option(False, "--push", "-p", help="Push the commi
 
             # User closed editor without saving
             if edited_message is None:
-                console.print(
-                    Panel(
+                _console().print(
+                    _panel(
                         "[yellow]Editor closed without saving. Keeping previous message.[/yellow]",
                         title="Info",
                         border_style="yellow",
@@ -175,8 +378,8 @@ def commit(push: bool = typer.Option(False, "--push", "-p", help="Push the commi
             ).strip()
 
             if not edited_message:
-                console.print(
-                Panel(
+                _console().print(
+                _panel(
                         "[red]Commit message cannot be empty.[/red]",
                         title="Error",
                         border_style="red",
@@ -185,39 +388,286 @@ def commit(push: bool = typer.Option(False, "--push", "-p", help="Push the commi
                 continue
 
             message = edited_message
+            session = ai.Session()
 
-            console.print(Panel(message, title="✏️ Edited Message", border_style="green"))
+            _console().print(_panel(message, title="✏️ Edited Message", border_style="green"))
 
-            if typer.confirm("Accept this edited message?"):
+            if _confirm("Accept this edited message?"):
                 git_utils.commit_changes(message)
-                console.print(
-                    Panel("[green]✅ Commit successful![/green]", title="Success", border_style="green")
+                _console().print(
+                    _panel("[green]✅ Commit successful![/green]", title="Success", border_style="green")
                 )
                 break
 
 
         elif choice.lower() == 'q':
-            console.print(Panel("[yellow]Commit aborted by user[/yellow]", title="Aborted", border_style="yellow"))
+            _console().print(_panel("[yellow]Commit aborted by user[/yellow]", title="Aborted", border_style="yellow"))
             raise typer.Exit(code=1)
 
     if push:
-        console.print(Panel("[cyan]Pushing changes...[/cyan]", title="Info", border_style="cyan"))
-        git_utils.push_changes()
-        console.print(Panel("[green]✅ Push complete![/green]", title="Success", border_style="green"))
+        _push(background_push)
     else:
-        push_choice = typer.prompt("Do you want to push the commit now? (y/n)").lower()
+        push_choice = _prompt("Do you want to push the commit now? (y/n)").lower()
         if push_choice == 'y':
-            console.print(Panel("[cyan]Pushing changes...[/cyan]", title="Info", border_style="cyan"))
-            git_utils.push_changes()
-            console.print(Panel("[green]✅ Push complete![/green]", title="Success", border_style="green"))
+            _push(background_push)
         else:
-            console.print(Panel("[yellow]Remember to push your commit later![/yellow]", title="Reminder", border_style="yellow"))
+            _console().print(_panel("[yellow]Remember to push your commit later![/yellow]", title="Reminder", border_style="yellow"))
+
+
+def _push(background: bool, done: str = "✅ Push complete!"):
+    """
+    Push the current branch, or queue it for the background worker and
+    return at once. Failed foreground pushes are reported, not ignored.
+    """
+    from commitgen import pushqueue
+
+    if background:
+        job = pushqueue.enqueue()
+        if job is not None:
+            _console().print(
+                _panel(
+                    f"[cyan]Pushing {job.branch} in the background. The result is shown the next time you commit.[/cyan]",
+                    title="Info",
+                    border_style="cyan",
+                )
+            )
+            return
+
+    _console().print(_panel("[cyan]Pushing changes...[/cyan]", title="Info", border_style="cyan"))
+    if git_utils.push_changes():
+        _console().print(_panel(f"[green]{done}[/green]", title="Success", border_style="green"))
+    else:
+        _console().print(_panel("[bold red]Push failed. Run `git push` to see why.[/bold red]", title="Error", border_style="red"))
+
+
+def _report_pushes():
+    """
+    Tell the user how background pushes finished since the last run. Only
+    commands that commit call this, so scripted read-only commands never
+    print push results.
+    """
+    from commitgen import pushqueue
+
+    for entry in pushqueue.unseen():
+        where = f"{entry['branch']} ({entry['commit'][:7]}) in {entry['repo']}"
+
+        if entry.get("status") == "pushed":
+            _console().print(f"[dim]Background push of {where} succeeded[/dim]")
+        else:
+            _console().print(
+                _panel(
+                    f"[bold red]Background push of {where} failed after {entry.get('attempts', 0)} attempt(s):[/bold red]\n"
+                    f"{entry.get('error', '')}",
+                    title="Push failed",
+                    border_style="red",
+                )
+            )
+
+
+def _stream_panel(chunks, title: str):
+    """
+    Render streamed chunks into a live panel. Returns the full text, or None
+    if the user pressed Ctrl-C before the stream finished.
+    """
+    from rich.live import Live
+
+    text = ""
+
+    try:
+        # Transient so the caller's final panel replaces the live one.
+        with Live(_panel(text, title=title, border_style="cyan"), console=_console(), transient=True) as live:
+            for chunk in chunks:
+                text += chunk
+                live.update(_panel(text, title=title, border_style="cyan"))
+    except KeyboardInterrupt:
+        chunks.close()
+        return None
+
+    return text
+
+
+def _speculate_stage_all(generate):
+    """
+    Generate a message for the diff that staging everything would produce.
+    Returns the compacted diff, the message and its session so the caller
+    can check that it still matches what was actually staged.
+    """
+    from commitgen import ai
+
+    diff_text = git_utils.preview_stage_all_diff()
+
+    if not diff_text or diff_text.isspace():
+        return None
+
+    diff_text = compaction.compact_diff(diff_text).text
+
+    session = ai.Session()
+
+    return diff_text, generate(diff_text, session), session
+
+
+def _choose(candidates: list):
+    """
+    Show ranked candidates in a table and let the user pick one with a
+    single keystroke (Enter takes the best ranked). Returns the chosen
+    message and the session to refine it in.
+    """
+    from commitgen import ai
+
+    from rich.table import Table
+
+    if not candidates:
+        return "", ai.Session()
+
+    if len(candidates) > 1:
+        table = Table(title="💡 Suggested Commit Messages", show_lines=True)
+        table.add_column("#", justify="right", style="cyan")
+        table.add_column("Score", justify="right")
+        table.add_column("Message")
+        table.add_column("Notes", style="dim")
+
+        for i, candidate in enumerate(candidates, 1):
+            table.add_row(str(i), f"{candidate.score:.0%}", candidate.message.strip(), "; ".join(candidate.issues))
+
+        _console().print(table)
+
+    chosen = candidates[0]
+    choices = {str(i): candidate for i, candidate in enumerate(candidates[:9], 1)}
+
+    while len(candidates) > 1:
+        _console().print(f"Choose a message [1-{len(choices)}, Enter for 1]: ", end="")
+        with metrics.span("user.wait"):
+            key = typer.getchar()
+        _console().print(key.strip())
+
+        if key in ("\r", "\n"):
+            break
+        if key in choices:
+            chosen = choices[key]
+            break
+
+    return chosen.message, chosen.session or ai.Session()
+
+
+def _prompt(*args, **kwargs):
+    with metrics.span("user.wait"):
+        return typer.prompt(*args, **kwargs)
+
+
+def _confirm(*args, **kwargs):
+    with metrics.span("user.wait"):
+        return typer.confirm(*args, **kwargs)
+
+
+def _print_rejected(exc):
+    """
+    Report a request the model refused, e.g. for a bad API key, without a
+    traceback: retrying or falling back would only hide the problem.
+    """
+    from rich.markup import escape
+
+    _console().print(_panel(
+        f"[bold red]{escape(str(exc.__cause__ or exc))}[/bold red]\n"
+        "Check COMMITGEN_PROVIDER, the model and the API key, or run with --offline.",
+        title="Request rejected", border_style="red",
+    ))
+
+
+def _wait_for(prefetcher):
+    """
+    Collect the prefetched result. The span measures only the time the user
+    was actually left waiting, not the whole request.
+    """
+    with metrics.span("model.wait"):
+        return prefetcher.result()
+
+
+def _print_profile(recorder):
+    """
+    Print the per-stage timing breakdown collected for --profile.
+    """
+    from rich.table import Table
+
+    report = recorder.as_dict()
+
+    table = Table(title=f"Profile ({report['wall_ms']:.0f} ms wall time)")
+    table.add_column("Stage", style="cyan")
+    table.add_column("Calls", justify="right")
+    table.add_column("Total", justify="right")
+    table.add_column("Share", justify="right")
+
+    for name, stage in sorted(report["stages"].items(), key=lambda item: -item[1]["total_ms"]):
+        share = stage["total_ms"] / report["wall_ms"] if report["wall_ms"] else 0
+        table.add_row(name, str(stage["count"]), f"{stage['total_ms']:.1f} ms", f"{share:.0%}")
+
+    _console().print(table)
+
+    details = [
+        ("Diff bytes", "diff_bytes", "{:,}"),
+        ("Prompt tokens (est.)", "prompt_tokens", "{:,}"),
+        ("Time to first token", "ttft_ms", "{:.0f} ms"),
+        ("Model latency", "model_latency_ms", "{:.0f} ms"),
+        ("File summaries reused", "digest_hits", "{:,}"),
+        ("Routed to", "route_tier", "{}"),
+        ("Retries", "retries", "{:,}"),
+        ("Hedged requests", "hedged", "{:,}"),
+    ]
+    lines = [f"{label}: {fmt.format(report[key])}" for label, key, fmt in details if key in report]
+
+    if lines:
+        _console().print("[dim]" + " · ".join(lines) + "[/dim]")
+
+
+def _read_staged_diff():
+    """
+    Read the staged diff through the streaming reader, returning the text
+    and the number of raw bytes git produced.
+    """
+    stats = {}
+    diff_text = git_utils.read_staged_diff(stats=stats)
+
+    return diff_text, stats.get("bytes_read", 0)
+
+
+def _staged_blobs(diff_text: str):
+    """
+    Blob hash pairs for the per-file summary index, read only when the diff
+    will actually be summarized file by file.
+    """
+    from commitgen import ai
+
+    if not ai.uses_file_digests(diff_text):
+        return None
+
+    return git_utils.staged_blob_pairs()
+
+
+def _compact_diff(diff_text: str, raw_bytes: int = None) -> str:
+    """
+    Run the staged diff through the compaction stage and report what was cut.
+    """
+    with metrics.span("compact"):
+        result = compaction.compact_diff(diff_text, original_bytes=raw_bytes)
+
+    if result.removed_bytes > 0:
+        _console().print(
+            f"[dim]Compacted diff: removed {result.removed_bytes} bytes "
+            f"(~{result.removed_tokens} tokens), summarized {len(result.summarized)} file(s)[/dim]"
+        )
+
+    if result.reasons:
+        metrics.record("filtered_files", len(result.reasons))
+        shown = [f"{path} ({reason})" for path, reason in list(result.reasons.items())[:5]]
+        more = len(result.reasons) - len(shown)
+        _console().print(f"[dim]Sent as line counts only: {', '.join(shown)}{f' and {more} more' if more else ''}[/dim]")
+
+    return result.text
 
 
 @app.command()
 def version():
     """Show CommitGen version."""
-    console.print(Panel("CommitGen version: 0.1.5", title="Version", border_style="cyan"))
+    _console().print(_panel("CommitGen version: 0.1.5", title="Version", border_style="cyan"))
 
 
 @app.command()
@@ -228,7 +678,393 @@ def config():
     CONFIG_DIR.mkdir(parents=True, exist_ok=True)
     CONFIG_FILE.write_text(f"OPENAI_API_KEY={api_key}\n")
 
-    console.print(Panel("[green]API key saved successfully![/green]", title="Success", border_style="green"))
+    _console().print(_panel("[green]API key saved successfully![/green]", title="Success", border_style="green"))
+
+
+@app.command("batch")
+def batch_command(paths: list[str] = typer.Argument(..., help="Repository paths or glob patterns (e.g. 'services/*')"),
+                  push: bool = typer.Option(False, "--push", "-p", help="Push each repository after committing"),
+                  concurrency: int = typer.Option(None, "--concurrency", "-c", help="Maximum concurrent generation requests"),
+                  no_cache: bool = typer.Option(False, "--no-cache", help="Always request fresh messages")):
+    """
+    Auto-commit staged (or all) changes across many repositories at once.
+    """
+    # batch pulls in asyncio, which only this command needs.
+    from commitgen import batch
+    from rich.table import Table
+
+    _report_pushes()
+    repos = batch.expand_paths(paths)
+
+    if not repos:
+        _console().print(_panel("[bold red]No repositories matched[/bold red]", title="Error", border_style="red"))
+        raise typer.Exit(code=1)
+
+    started = time.perf_counter()
+    results = batch.run_batch(repos, push=push, concurrency=concurrency, use_cache=not no_cache)
+    elapsed = time.perf_counter() - started
+
+    table = Table(title=f"Batch results ({elapsed:.1f}s total)")
+    table.add_column("Repository", style="cyan")
+    table.add_column("Status")
+    table.add_column("Latency", justify="right")
+    table.add_column("Message / Error")
+
+    for result in results:
+        style = "yellow" if result.status == "skipped" else "green" if result.ok else "red"
+        detail = result.message.splitlines()[0] if result.message else result.error
+        table.add_row(result.path, f"[{style}]{result.status}[/{style}]", f"{result.latency:.2f}s", detail)
+
+    _console().print(table)
+
+    if not all(result.ok for result in results):
+        raise typer.Exit(code=1)
+
+
+@app.command("rewrite")
+def rewrite_command(rev_range: str = typer.Argument(..., help="Commits to rewrite, e.g. main..feature"),
+                    dry_run: bool = typer.Option(False, "--dry-run", help="Only generate messages and write the old -> new mapping"),
+                    mapping: str = typer.Option("commitgen-rewrite.jsonl", "--mapping", help="Where --dry-run writes the mapping"),
+                    concurrency: int = typer.Option(None, "--concurrency", "-c", help="Maximum concurrent generation requests"),
+                    no_cache: bool = typer.Option(False, "--no-cache", help="Always request fresh messages"),
+                    yes: bool = typer.Option(False, "--yes", "-y", help="Rewrite the branch without asking for confirmation")):
+    """
+    Regenerate the messages of existing commits and rewrite the branch with them.
+    """
+    from commitgen import rewrite
+
+    with _console().status("Generating messages...") as status:
+        def on_progress(entry):
+            status.update(f"Generating messages... {entry.commit[:7]} {entry.status}")
+
+        try:
+            result = rewrite.generate(rev_range, concurrency=concurrency, use_cache=not no_cache, on_progress=on_progress)
+        except rewrite.RewriteError as exc:
+            _console().print(_panel(f"[bold red]{exc}[/bold red]", title="Error", border_style="red"))
+            raise typer.Exit(code=1)
+
+    counts = ", ".join(
+        f"{result.count(status)} {status}" for status in ("generated", "resumed", "skipped", "failed") if result.count(status)
+    )
+    _console().print(
+        f"[dim]{len(result.entries)} commit(s) in {result.elapsed:.1f}s "
+        f"({result.commits_per_minute:.0f} commits/min): {counts or 'nothing to do'}[/dim]"
+    )
+
+    for entry in result.entries:
+        if entry.status == "failed":
+            _console().print(f"[red]{entry.commit[:7]} {entry.subject}: {entry.error}[/red]")
+
+    if dry_run:
+        rewrite.write_mapping(mapping, result)
+        _console().print(_panel(f"[green]Mapping written to {mapping}[/green]", title="Dry Run", border_style="green"))
+        return
+
+    if result.count("failed"):
+        _console().print(
+            _panel(
+                "[yellow]Some messages could not be generated. Run the command again to retry them; "
+                "finished messages are kept.[/yellow]",
+                title="Incomplete",
+                border_style="yellow",
+            )
+        )
+        raise typer.Exit(code=1)
+
+    if not result.messages:
+        _console().print(_panel("[yellow]No commits to rewrite[/yellow]", title="Info", border_style="yellow"))
+        return
+
+    if not yes and not _confirm(f"Rewrite {len(result.messages)} commit message(s) in {rev_range}?"):
+        raise typer.Exit(code=1)
+
+    try:
+        rewritten = rewrite.apply(rev_range, result)
+    except rewrite.RewriteError as exc:
+        _console().print(_panel(f"[bold red]{exc}[/bold red]", title="Error", border_style="red"))
+        raise typer.Exit(code=1)
+
+    _console().print(_panel(f"[green]✅ Rewrote {rewritten} commit message(s)[/green]", title="Success", border_style="green"))
+
+
+@daemon_app.command("start")
+def daemon_start():
+    """Start the daemon in the background."""
+    from commitgen import daemon
+
+    status = daemon.ping()
+    if status:
+        _console().print(_panel(f"[yellow]Daemon already running (pid {status['pid']})[/yellow]", title="Info", border_style="yellow"))
+        return
+
+    try:
+        pid = daemon.start()
+    except daemon.DaemonError as exc:
+        _console().print(_panel(f"[bold red]{exc}[/bold red]", title="Error", border_style="red"))
+        raise typer.Exit(code=1)
+
+    _console().print(_panel(f"[green]Daemon started (pid {pid}) on {daemon.socket_path()}[/green]", title="Success", border_style="green"))
+
+
+@daemon_app.command("stop")
+def daemon_stop():
+    """Stop the running daemon."""
+    from commitgen import daemon
+
+    if daemon.stop():
+        _console().print(_panel("[green]Daemon stopped[/green]", title="Success", border_style="green"))
+    else:
+        _console().print(_panel("[yellow]No daemon is running[/yellow]", title="Info", border_style="yellow"))
+
+
+@daemon_app.command("status")
+def daemon_status():
+    """Show whether the daemon is running."""
+    from commitgen import daemon
+
+    status = daemon.ping()
+
+    if not status:
+        _console().print(_panel("[yellow]No daemon is running[/yellow]", title="Daemon", border_style="yellow"))
+        raise typer.Exit(code=1)
+
+    _console().print(
+        _panel(
+            f"[green]Running[/green] (pid {status['pid']}, up {status['uptime']:.0f}s) on {daemon.socket_path()}",
+            title="Daemon",
+            border_style="green",
+        )
+    )
+
+
+@daemon_app.command("run")
+def daemon_run():
+    """Run the daemon in the foreground."""
+    from commitgen import daemon
+
+    try:
+        daemon.serve()
+    except daemon.DaemonError as exc:
+        _console().print(_panel(f"[bold red]{exc}[/bold red]", title="Error", border_style="red"))
+        raise typer.Exit(code=1)
+
+
+@hook_app.command("install")
+def hook_install(force: bool = typer.Option(False, "--force", help="Install even if the repository already has these hooks")):
+    """Install the prepare-commit-msg and post-index-change hooks."""
+    from commitgen import hooks
+
+    try:
+        installed = hooks.install(force=force)
+    except hooks.HookError as exc:
+        _console().print(_panel(f"[bold red]{exc}[/bold red]", title="Error", border_style="red"))
+        raise typer.Exit(code=1)
+
+    names = ", ".join(path.name for path in installed)
+    _console().print(_panel(f"[green]Installed {names} in {installed[0].parent}[/green]", title="Success", border_style="green"))
+
+
+@hook_app.command("uninstall")
+def hook_uninstall():
+    """Remove the commitgen hooks."""
+    from commitgen import hooks
+
+    try:
+        removed = hooks.uninstall()
+    except hooks.HookError as exc:
+        _console().print(_panel(f"[bold red]{exc}[/bold red]", title="Error", border_style="red"))
+        raise typer.Exit(code=1)
+
+    if not removed:
+        _console().print(_panel("[yellow]No commitgen hooks installed[/yellow]", title="Info", border_style="yellow"))
+        return
+
+    _console().print(_panel(f"[green]Removed {', '.join(path.name for path in removed)}[/green]", title="Success", border_style="green"))
+
+
+@hook_app.command("run", hidden=True)
+def hook_run(name: str = typer.Argument(..., help="Hook being run"),
+             args: list[str] = typer.Argument(None, help="Arguments git passed to the hook")):
+    """Entry point for the installed hooks."""
+    from commitgen import hooks
+
+    args = args or []
+
+    if name == "prepare-commit-msg" and args:
+        hooks.fill(args[0], args[1] if len(args) > 1 else "")
+    elif name == "post-index-change":
+        hooks.prepare()
+
+
+@app.command("split")
+def split_command(context: str = typer.Option("", "--context", "-c", help="Extra context passed to every generated message"),
+                  offline: bool = typer.Option(False, "--offline", help="Write the messages locally from the diff, without calling the API"),
+                  no_cache: bool = typer.Option(False, "--no-cache", help="Always request fresh messages"),
+                  max_commits: int = typer.Option(None, "--max-commits", min=1, help="Create at most this many commits"),
+                  dry_run: bool = typer.Option(False, "--dry-run", help="Only show how the changes would be split"),
+                  yes: bool = typer.Option(False, "--yes", "-y", help="Create the commits without asking for confirmation")):
+    """
+    Split the staged changes into one commit per change type and area of the tree.
+    """
+    from rich.table import Table
+    from commitgen import resilience, split
+
+    _report_pushes()
+
+    if not git_utils.verify_repo():
+        _console().print(_panel("[bold red]You are not inside a Git repository[/bold red]", title="Error", border_style="red"))
+        raise typer.Exit(code=1)
+
+    try:
+        diff_text = split.read_staged_diff()
+    except split.SplitError as exc:
+        _console().print(_panel(f"[bold red]{exc}[/bold red]", title="Error", border_style="red"))
+        raise typer.Exit(code=1)
+
+    if not diff_text.strip():
+        _console().print(_panel("[yellow]No staged changes detected.[/yellow]", title="Info", border_style="yellow"))
+        raise typer.Exit(code=1)
+
+    groups = split.plan(diff_text, max_commits)
+
+    if not dry_run:
+        try:
+            with _console().status(f"Generating {len(groups)} message(s)..."):
+                split.generate_messages(groups, context, use_cache=not no_cache, offline=offline)
+        except resilience.RequestRejected as exc:
+            _print_rejected(exc)
+            raise typer.Exit(code=1)
+
+    table = Table(title=f"{len(groups)} commit(s)")
+    table.add_column("#", justify="right")
+    table.add_column("Type")
+    table.add_column("Files")
+    table.add_column("Lines", justify="right")
+    if not dry_run:
+        table.add_column("Message")
+
+    for index, group in enumerate(groups, 1):
+        files = ", ".join(group.paths[:3]) + (f" and {len(group.paths) - 3} more" if len(group.paths) > 3 else "")
+        row = [str(index), group.change_type, files, f"+{group.added} -{group.removed}"]
+        table.add_row(*(row if dry_run else row + [group.message]))
+
+    _console().print(table)
+
+    if dry_run:
+        return
+
+    if not yes and not _confirm(f"Create {len(groups)} commit(s)?"):
+        raise typer.Exit(code=1)
+
+    try:
+        created = split.commit(groups)
+    except split.SplitError as exc:
+        _console().print(_panel(f"[bold red]{exc}[/bold red]", title="Error", border_style="red"))
+        raise typer.Exit(code=1)
+
+    _console().print(_panel(f"[green]✅ Created {len(created)} commit(s)[/green]", title="Success", border_style="green"))
+
+
+@push_app.command("status")
+def push_status(limit: int = typer.Option(10, "--limit", help="Number of recent results to show")):
+    """Show queued background pushes and the most recent results."""
+    from rich.table import Table
+    from commitgen import pushqueue
+
+    pushqueue.unseen()
+    jobs = pushqueue.pending()
+    entries = pushqueue.read_log()[-limit:] if limit > 0 else []
+
+    if not jobs and not entries:
+        _console().print(_panel("[yellow]No background pushes yet[/yellow]", title="Info", border_style="yellow"))
+        return
+
+    table = Table(title="Background pushes")
+    table.add_column("Repository")
+    table.add_column("Branch")
+    table.add_column("Commit")
+    table.add_column("Status")
+    table.add_column("Attempts", justify="right")
+    table.add_column("Error")
+
+    for job in jobs:
+        table.add_row(job.repo, job.branch, job.commit[:7], "[cyan]queued[/cyan]", "", "")
+    for entry in reversed(entries):
+        status = "[green]pushed[/green]" if entry.get("status") == "pushed" else "[red]failed[/red]"
+        table.add_row(entry["repo"], entry["branch"], entry["commit"][:7], status,
+                      str(entry.get("attempts", 0)), entry.get("error", ""))
+
+    _console().print(table)
+
+
+@push_app.command("run", hidden=True)
+def push_run():
+    """Entry point for the background push worker."""
+    from commitgen import pushqueue
+
+    pushqueue.run_worker()
+
+
+@app.command("cache")
+def cache_command(clear: bool = typer.Option(False, "--clear", help="Delete all cached commit messages")):
+    """Show response cache statistics."""
+    if clear:
+        cache.clear()
+        digests.clear()
+        _console().print(_panel("[green]Response cache cleared[/green]", title="Success", border_style="green"))
+        return
+
+    from rich.table import Table
+
+    stats = cache.stats()
+    lookups = stats["hits"] + stats["misses"]
+    hit_rate = f"{stats['hits'] / lookups:.0%}" if lookups else "n/a"
+
+    table = Table(title="Response Cache")
+    table.add_column("Metric", style="cyan")
+    table.add_column("Value", justify="right")
+    table.add_row("Hits", str(stats["hits"]))
+    table.add_row("Misses", str(stats["misses"]))
+    table.add_row("Hit rate", hit_rate)
+    table.add_row("Entries", str(stats["entries"]))
+    table.add_row("Size", f"{stats['bytes'] / 1024:.1f} KiB")
+    table.add_row("File summaries", str(digests.count()))
+
+    _console().print(table)
+
+
+@app.command("routing")
+def routing_command():
+    """Show latency per routing tier against the policy's targets."""
+    from rich.table import Table
+    from commitgen import routing
+
+    rows = routing.summarize(routing.read_log(), routing.load_policy()["targets"])
+
+    if not rows:
+        _console().print(_panel("No routed generations recorded yet.", title="Routing", border_style="yellow"))
+        return
+
+    def mark(ok):
+        return "" if ok is None else ("[green]✓[/green]" if ok else "[red]✗[/red]")
+
+    table = Table(title="Model Routing")
+    table.add_column("Tier", style="cyan")
+    table.add_column("Model")
+    table.add_column("Requests", justify="right")
+    table.add_column("p50", justify="right")
+    table.add_column("p95", justify="right")
+
+    for row in rows:
+        table.add_row(
+            row["tier"],
+            row["model"] or "heuristics",
+            str(row["count"]),
+            f"{row['p50_ms']:.0f} ms {mark(row['p50_ok'])}".strip(),
+            f"{row['p95_ms']:.0f} ms {mark(row['p95_ok'])}".strip(),
+        )
+
+    _console().print(table)
 
 
 def editor_template(message: str) -> str:
@@ -0,0 +1,266 @@
+import fnmatch
+import re
+from dataclasses import dataclass, field
+
+from commitgen.config import get_int_setting, get_setting
+from commitgen.constants import CHUNK_THRESHOLD_TOKENS, COMPACT_CONTEXT_LINES, TOKEN_BUDGET
+from commitgen.diffparse import split_file_diffs
+
+# Roughly four characters per token for English text and source code.
+CHARS_PER_TOKEN = 4
+
+LOCKFILE_PATTERNS = (
+    "*.lock",
+    "package-lock.json",
+    "npm-shrinkwrap.json",
+    "pnpm-lock.yaml",
+    "go.sum",
+)
+
+GENERATED_PATTERNS = (
+    "*.min.js",
+    "*.min.css",
+    "*.map",
+    "*_pb2.py",
+    "*_pb2_grpc.py",
+    "*.pb.go",
+    "*.generated.*",
+    "*.snap",
+)
+
+VENDORED_DIRS = ("vendor/", "node_modules/", "third_party/", "dist/", "build/")
+
+LOCKFILE_RE = re.compile("|".join(fnmatch.translate(pattern) for pattern in LOCKFILE_PATTERNS))
+GENERATED_RE = re.compile("|".join(fnmatch.translate(pattern) for pattern in GENERATED_PATTERNS))
+
+
+@dataclass
+class CompactionResult:
+    """
+    The compacted diff along with what was removed to get there.
+    """
+
+    text: str
+    original_bytes: int
+    original_tokens: int
+    summarized: list = field(default_factory=list)
+    # Why each summarized file was collapsed, e.g. "lockfile" or "binary".
+    reasons: dict = field(default_factory=dict)
+
+    @property
+    def compacted_bytes(self) -> int:
+        return len(self.text.encode("utf-8", errors="replace"))
+
+    @property
+    def compacted_tokens(self) -> int:
+        return estimate_tokens(self.text)
+
+    @property
+    def removed_bytes(self) -> int:
+        return self.original_bytes - self.compacted_bytes
+
+    @property
+    def removed_tokens(self) -> int:
+        return self.original_tokens - self.compacted_tokens
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Cheap token estimate used to keep prompts under budget without a tokenizer.
+    """
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def compact_diff(diff_text: str, token_budget: int = None, chunk_threshold: int = None,
+                 original_bytes: int = None) -> CompactionResult:
+    """
+    Shrink a staged diff before it is placed in the prompt.
+
+    Binary, rename-only, lockfile, generated and vendored files are always
+    collapsed to a one-line summary. If the result is still over the token
+    budget, hunk context is trimmed and then the largest files are truncated.
+    Diffs that remain above `chunk_threshold` after trimming are not
+    truncated, since they are summarized chunk by chunk instead.
+
+    `original_bytes` is the size of the raw git output when the diff was
+    already partly collapsed while it was read, so the report covers both.
+    """
+    if token_budget is None:
+        token_budget = get_int_setting("COMMITGEN_TOKEN_BUDGET", TOKEN_BUDGET)
+    if chunk_threshold is None:
+        chunk_threshold = get_int_setting("COMMITGEN_CHUNK_THRESHOLD", CHUNK_THRESHOLD_TOKENS)
+
+    text_bytes = len(diff_text.encode("utf-8", errors="replace"))
+    if original_bytes is None or original_bytes < text_bytes:
+        original_bytes = text_bytes
+
+    result = CompactionResult(
+        text=diff_text,
+        original_bytes=original_bytes,
+        original_tokens=(original_bytes + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN,
+    )
+
+    sections = []
+
+    for file_diff in split_file_diffs(diff_text):
+        summary = summarize_noise(file_diff)
+        if summary:
+            result.summarized.append(file_diff.path)
+            result.reasons[file_diff.path] = _reason(file_diff)
+            sections.append({"summary": summary})
+        else:
+            sections.append({"header": file_diff.header, "hunks": file_diff.hunks, "omitted": 0})
+
+    if not result.summarized and estimate_tokens(diff_text) <= token_budget:
+        return result
+
+    if _estimate_sections(sections) > token_budget:
+        context_lines = get_int_setting("COMMITGEN_CONTEXT_LINES", COMPACT_CONTEXT_LINES)
+        for section in sections:
+            if "hunks" in section:
+                section["hunks"] = [_trim_context(hunk, context_lines) for hunk in section["hunks"]]
+
+    while chunk_threshold >= _estimate_sections(sections) > token_budget:
+        if not _truncate_largest(sections):
+            break
+
+    result.text = "".join(_render(section) for section in sections)
+
+    return result
+
+
+def summarize_noise(file_diff) -> str:
+    """
+    Return a one-line summary for files whose hunks are not worth sending,
+    or an empty string if the file should be kept.
+    """
+    path = file_diff.path
+
+    if file_diff.summary:
+        return file_diff.summary
+
+    if file_diff.is_binary:
+        return f"[summarized] {path}: binary file changed\n"
+
+    if file_diff.is_rename_only:
+        return f"[summarized] renamed {file_diff.old_path} -> {path}\n"
+
+    kind = file_diff.reason or classify_noise(path)
+    if kind or file_diff.hunks_dropped:
+        label = f" ({kind})" if kind else ""
+        return f"[summarized] {path}{label}: +{file_diff.added} -{file_diff.removed} lines\n"
+
+    return ""
+
+
+def classify_noise(path: str) -> str:
+    """
+    Return "lockfile", "generated", "vendored" or "ignored" (matched by
+    COMMITGEN_IGNORE) for paths that should be summarized rather than sent
+    in full, otherwise an empty string.
+    """
+    name = path.rsplit("/", 1)[-1]
+
+    if LOCKFILE_RE.match(name):
+        return "lockfile"
+
+    if GENERATED_RE.match(name):
+        return "generated"
+
+    if any(path.startswith(prefix) or f"/{prefix}" in path for prefix in VENDORED_DIRS):
+        return "vendored"
+
+    if any(fnmatch.fnmatchcase(path, pattern) or fnmatch.fnmatchcase(name, pattern) for pattern in ignore_patterns()):
+        return "ignored"
+
+    return ""
+
+
+def ignore_patterns() -> list:
+    """
+    The comma-separated glob patterns of COMMITGEN_IGNORE. A pattern with a
+    slash is matched against the whole path, any other against both the
+    path and the file name.
+    """
+    return [pattern.strip() for pattern in get_setting("COMMITGEN_IGNORE", "").split(",") if pattern.strip()]
+
+
+class NoiseFilter:
+    """
+    Decides, per path, whether a file's hunks are dropped while the diff is
+    read: the built-in lockfile/generated/vendored rules and COMMITGEN_IGNORE
+    first, then the repository's `linguist-generated` and `linguist-vendored`
+    attributes when `attributes` (a path -> attribute callable) is given.
+    Every file dropped is recorded in `filtered` with its reason.
+    """
+
+    def __init__(self, attributes=None):
+        self.attributes = attributes
+        self.filtered = {}
+
+    def __call__(self, path: str) -> str:
+        reason = classify_noise(path)
+        if not reason and self.attributes is not None:
+            reason = self.attributes(path)
+        if reason:
+            self.filtered[path] = reason
+        return reason
+
+
+def _reason(file_diff) -> str:
+    if file_diff.is_binary or file_diff.summary.endswith(": binary file changed\n"):
+        return "binary"
+    if file_diff.is_rename_only or file_diff.summary.startswith("[summarized] renamed "):
+        return "renamed"
+    return file_diff.reason or classify_noise(file_diff.path) or "summarized"
+
+
+def _trim_context(hunk: list, context_lines: int) -> list:
+    header, body = hunk[0], hunk[1:]
+    changed = [i for i, line in enumerate(body) if line.startswith(("+", "-"))]
+
+    keep = set()
+    for i in changed:
+        keep.update(range(max(0, i - context_lines), min(len(body), i + context_lines + 1)))
+
+    return [header] + [line for i, line in enumerate(body) if i in keep]
+
+
+def _truncate_largest(sections: list) -> bool:
+    candidates = [section for section in sections if _hunk_lines(section) > 1]
+    if not candidates:
+        return False
+
+    largest = max(candidates, key=lambda section: len(_render(section)))
+    budget = _hunk_lines(largest) // 2
+    kept = []
+
+    for hunk in largest["hunks"]:
+        if budget <= 0:
+            largest["omitted"] += len(hunk)
+            continue
+        kept.append(hunk[:budget])
+        largest["omitted"] += max(0, len(hunk) - budget)
+        budget -= len(hunk)
+
+    largest["hunks"] = kept
+    return True
+
+
+def _hunk_lines(section: dict) -> int:
+    return sum(len(hunk) for hunk in section.get("hunks", []))
+
+
+def _render(section: dict) -> str:
+    if "summary" in section:
+        return section["summary"]
+
+    text = "".join(section["header"]) + "".join("".join(hunk) for hunk in section["hunks"])
+    if section["omitted"]:
+        text += f"... {section['omitted']} more lines omitted\n"
+
+    return text
+
+
+def _estimate_sections(sections: list) -> int:
+    return sum(estimate_tokens(_render(section)) for section in sections)
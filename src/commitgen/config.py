@@ -6,14 +6,24 @@ from dotenv import load_dotenv
 CONFIG_DIR = Path.home() / ".config" / "commitgen"
 CONFIG_FILE = CONFIG_DIR / "config.env"
 
+_config_loaded = False
 
-def load_config():
+
+def load_config(force: bool = False):
     """
-    Load user config if it exists.
+    Load user config if it exists. The file is only parsed once per process
+    unless `force` is set.
     """
+    global _config_loaded
+
+    if _config_loaded and not force:
+        return
+
     if CONFIG_FILE.exists():
         load_dotenv(CONFIG_FILE)
 
+    _config_loaded = True
+
 
 def ensure_api_key():
     """
@@ -32,3 +42,36 @@ def ensure_api_key():
         raise typer.Exit(code=1)
 
     return api_key
+
+
+def get_setting(name: str, default: str = None) -> str:
+    """
+    Read a string setting from the environment or config file.
+    """
+    load_config()
+
+    return os.getenv(name) or default
+
+
+def get_int_setting(name: str, default: int) -> int:
+    """
+    Read an integer setting from the environment or config file.
+    """
+    load_config()
+
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+def get_float_setting(name: str, default: float) -> float:
+    """
+    Read a float setting from the environment or config file.
+    """
+    load_config()
+
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return default
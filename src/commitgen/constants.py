@@ -1 +1,76 @@
+DEFAULT_MODEL = "gpt-5-nano"
 
+# Deadline for each attempt at a model request, and how many times a
+# timed-out or failed attempt is retried (see commitgen.resilience).
+REQUEST_TIMEOUT_SECONDS = 30.0
+REQUEST_MAX_RETRIES = 2
+REQUEST_RETRY_BASE_SECONDS = 0.5
+REQUEST_RETRY_MAX_SECONDS = 8.0
+
+# Bump whenever the wording of the generation prompt changes so cached
+# responses built from an older prompt are no longer reused.
+PROMPT_VERSION = "1"
+
+CACHE_MAX_BYTES = 5 * 1024 * 1024
+CACHE_TTL_SECONDS = 7 * 24 * 60 * 60
+
+MAX_DIFF_BYTES = 16 * 1024 * 1024
+
+TOKEN_BUDGET = 12000
+COMPACT_CONTEXT_LINES = 1
+
+# Diffs above this many (estimated) tokens are summarized chunk by chunk
+# and then merged, instead of being sent in one request.
+CHUNK_THRESHOLD_TOKENS = 24000
+CHUNK_TOKENS = 8000
+CHUNK_WORKERS = 4
+
+BATCH_CONCURRENCY = 8
+BATCH_MAX_RETRIES = 4
+
+DAEMON_CONNECT_TIMEOUT_SECONDS = 0.5
+DAEMON_START_TIMEOUT_SECONDS = 10.0
+
+# Diffs over the token budget (COMMITGEN_DIGEST_THRESHOLD, by default
+# COMMITGEN_TOKEN_BUDGET) that touch several files are summarized file by
+# file, so a regeneration only re-summarizes the files that changed since
+# the last run and reuses the rest from the index. Diffs that fit in one
+# prompt are always sent in one request.
+DIGEST_MAX_FILES = 64
+DIGEST_MAX_ENTRIES = 2000
+
+REWRITE_CONCURRENCY = 8
+
+# Default routing policy, checked in order: diffs that fit one request go
+# to the fast tier, larger ones to the large tier.
+ROUTING_RULES = (
+    {"tier": "fast", "max_tokens": CHUNK_THRESHOLD_TOKENS},
+    {"tier": "large"},
+)
+ROUTING_LOG_MAX_ENTRIES = 1000
+
+# Hedging with COMMITGEN_HEDGE=p95 needs this many logged latencies for the
+# model before the p95 is trusted.
+HEDGE_MIN_SAMPLES = 20
+
+# Consecutive failed requests (each after all of its retries) that open the
+# circuit breaker, and how long it stays open before a single trial request
+# is let through.
+BREAKER_THRESHOLD = 3
+BREAKER_COOLDOWN_SECONDS = 120.0
+
+# The post-index-change hook waits this long for the index to settle before
+# preparing a message, so a burst of `git add` calls costs one request.
+HOOK_SETTLE_SECONDS = 0.3
+HOOK_MAX_PREPARED = 20
+HOOK_LOCK_STALE_SECONDS = 300.0
+
+# Background pushes: retries of transient failures per push, and results
+# kept in ~/.config/commitgen/push.log.
+PUSH_RETRIES = 3
+PUSH_LOG_MAX_ENTRIES = 200
+
+# `commitgen split` creates at most this many commits, generating up to
+# SPLIT_CONCURRENCY messages at once.
+SPLIT_MAX_COMMITS = 6
+SPLIT_CONCURRENCY = 6
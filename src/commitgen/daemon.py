@@ -0,0 +1,351 @@
+import json
+import os
+from dataclasses import asdict
+import socket
+import socketserver
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+from commitgen import ai, metrics, ranking
+from commitgen.config import CONFIG_DIR, get_float_setting, get_setting, load_config
+from commitgen.constants import DAEMON_CONNECT_TIMEOUT_SECONDS, DAEMON_START_TIMEOUT_SECONDS
+
+# Requests the daemon answers with a single reply, mapped to the commitgen.ai
+# function that does the work and its argument names.
+CALLS = {
+    "generate": ("generate_commit_message", ("diff_text", "context", "use_cache")),
+    "refine": ("refine_commit_message", ("existing_message", "context")),
+    "candidates": ("generate_candidates", ("diff_text", "context", "n", "use_cache")),
+}
+
+# Requests answered with a series of chunk replies.
+STREAMS = {
+    "stream": ("stream_commit_message", ("diff_text", "context", "use_cache")),
+    "stream_refine": ("stream_refine_commit_message", ("existing_message", "context")),
+}
+
+# Optional request fields passed through as keyword arguments.
+OPTIONS = ("blobs",)
+
+
+class DaemonError(RuntimeError):
+    """
+    The daemon was reachable but the request failed on its side.
+    """
+
+
+def socket_path() -> Path:
+    return Path(get_setting("COMMITGEN_DAEMON_SOCKET", str(CONFIG_DIR / "daemon.sock"))).expanduser()
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    """
+    One connection carries one JSON request line and gets JSON reply lines.
+    """
+
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            return
+
+        try:
+            request = json.loads(line)
+            op = request.get("op")
+
+            if op == "ping":
+                self._reply({"ok": True, "pid": os.getpid(), "uptime": time.time() - self.server.started})
+            elif op == "shutdown":
+                self._reply({"ok": True})
+                threading.Thread(target=self.server.shutdown, daemon=True).start()
+            elif op in CALLS:
+                name, names = CALLS[op]
+                if op == "candidates":
+                    # Each candidate carries its own session.
+                    candidates = getattr(ai, name)(*_args(request, names), **_options(request))
+                    self._reply({"ok": True, "result": [asdict(candidate) for candidate in candidates]})
+                else:
+                    session = _session(request)
+                    result = getattr(ai, name)(*_args(request, names), session=session, **_options(request))
+                    self._reply({"ok": True, "result": result, **_state(session)})
+            elif op in STREAMS:
+                self._stream(*STREAMS[op], request)
+            else:
+                self._reply({"ok": False, "error": f"unknown request {op!r}"})
+        except (BrokenPipeError, ConnectionResetError):
+            # The client went away (e.g. the user pressed Ctrl-C).
+            pass
+        except Exception as exc:
+            self._reply({"ok": False, "error": f"{type(exc).__name__}: {exc}"})
+
+    def _stream(self, name, names, request):
+        session = _session(request)
+        chunks = getattr(ai, name)(*_args(request, names), session=session, **_options(request))
+
+        try:
+            for chunk in chunks:
+                self._reply({"ok": True, "chunk": chunk})
+            self._reply({"ok": True, "done": True, **_state(session)})
+        finally:
+            # Releases the model stream when the client disconnects early.
+            chunks.close()
+
+    def _reply(self, payload: dict):
+        self.wfile.write(json.dumps(payload).encode("utf-8") + b"\n")
+        self.wfile.flush()
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path):
+        self.started = time.time()
+        super().__init__(str(path), _Handler)
+
+
+def _args(request: dict, names: tuple) -> list:
+    return [request[name] for name in names if name in request]
+
+
+def _options(request: dict) -> dict:
+    return {name: request[name] for name in OPTIONS if request.get(name) is not None}
+
+
+def _session(request: dict):
+    # Conversation state lives with the client; the daemon only carries it
+    # through the call and sends the updated state back.
+    if "state" not in request:
+        return None
+    return ai.Session(state=request["state"])
+
+
+def _state(session) -> dict:
+    return {} if session is None else {"state": session.state}
+
+
+def serve(path: Path = None, ready: threading.Event = None):
+    """
+    Run the daemon in the foreground until a shutdown request arrives. The
+    config, provider and HTTP client are created once up front and then
+    shared by every request.
+    """
+    path = Path(path or socket_path())
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    if is_running(path):
+        raise DaemonError(f"a daemon is already listening on {path}")
+
+    if path.exists():
+        # Left behind by a daemon that did not shut down cleanly.
+        path.unlink()
+
+    load_config()
+    ai.get_provider().warm()
+
+    old_umask = os.umask(0o177)
+    try:
+        server = _Server(path)
+    finally:
+        os.umask(old_umask)
+
+    try:
+        if ready is not None:
+            ready.set()
+        server.serve_forever()
+    finally:
+        server.server_close()
+        if path.exists():
+            path.unlink()
+
+
+def start(path: Path = None) -> int:
+    """
+    Start a detached daemon process and wait until it answers. Returns its pid.
+    """
+    path = Path(path or socket_path())
+    env = {**os.environ, "COMMITGEN_DAEMON_SOCKET": str(path)}
+
+    subprocess.Popen(
+        [sys.executable, "-m", "commitgen", "daemon", "run"],
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+        env=env,
+    )
+
+    deadline = time.monotonic() + DAEMON_START_TIMEOUT_SECONDS
+    while time.monotonic() < deadline:
+        status = ping(path)
+        if status:
+            return status["pid"]
+        time.sleep(0.05)
+
+    raise DaemonError(f"daemon did not start listening on {path}")
+
+
+def stop(path: Path = None) -> bool:
+    """
+    Ask the daemon to shut down. Returns False if none was running.
+    """
+    try:
+        _request({"op": "shutdown"}, path)
+        return True
+    except OSError:
+        return False
+
+
+def ping(path: Path = None):
+    """
+    Return the daemon's pid and uptime, or None if it is not running.
+    """
+    try:
+        return _request({"op": "ping"}, path)
+    except (OSError, DaemonError):
+        return None
+
+
+def is_running(path: Path = None) -> bool:
+    return ping(path) is not None
+
+
+def _connect(path: Path = None) -> socket.socket:
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(get_float_setting("COMMITGEN_DAEMON_CONNECT_TIMEOUT", DAEMON_CONNECT_TIMEOUT_SECONDS))
+
+    try:
+        sock.connect(str(path or socket_path()))
+    except OSError:
+        sock.close()
+        raise
+
+    # Connected: from here on the wait is for the model, which has its own timeout.
+    sock.settimeout(None)
+    return sock
+
+
+def _send(sock: socket.socket, payload: dict):
+    sock.sendall(json.dumps(payload).encode("utf-8") + b"\n")
+
+
+def _read(stream) -> dict:
+    line = stream.readline()
+    if not line:
+        raise ConnectionError("daemon closed the connection")
+
+    reply = json.loads(line)
+    if not reply.get("ok"):
+        raise DaemonError(reply.get("error", "request failed"))
+
+    return reply
+
+
+def _request(payload: dict, path: Path = None) -> dict:
+    with _connect(path) as sock, sock.makefile("rb") as stream:
+        _send(sock, payload)
+        return _read(stream)
+
+
+def _stream_request(sock: socket.socket, payload: dict, session=None):
+    with sock, sock.makefile("rb") as stream:
+        _send(sock, payload)
+
+        while True:
+            reply = _read(stream)
+            if reply.get("done"):
+                _update(session, reply)
+                return
+            yield reply["chunk"]
+
+
+def _with_session(payload: dict, session) -> dict:
+    if session is None:
+        return payload
+    return {**payload, "state": session.state}
+
+
+def _update(session, reply: dict):
+    if session is not None and "state" in reply:
+        session.state = reply["state"]
+
+
+class Client:
+    """
+    Forwards generation requests to a running daemon. Exposes the same
+    functions the commit flow uses from commitgen.ai, so either can be used.
+    If the daemon goes away mid-session or a request fails on its side,
+    the request is run again in-process.
+    """
+
+    def __init__(self, path: Path = None):
+        self.path = Path(path or socket_path())
+
+    def generate_commit_message(self, diff_text, context, use_cache=True, session=None, blobs=None):
+        payload = {"op": "generate", "diff_text": diff_text, "context": context, "use_cache": use_cache, "blobs": blobs}
+        return self._call(payload, session, ai.generate_commit_message, diff_text, context, use_cache, blobs=blobs)
+
+    def refine_commit_message(self, existing_message, context, session=None):
+        payload = {"op": "refine", "existing_message": existing_message, "context": context}
+        return self._call(payload, session, ai.refine_commit_message, existing_message, context)
+
+    def generate_candidates(self, diff_text, context, n, use_cache=True, blobs=None):
+        payload = {"op": "candidates", "diff_text": diff_text, "context": context, "n": n,
+                   "use_cache": use_cache, "blobs": blobs}
+        try:
+            with metrics.span("daemon.request"):
+                reply = _request(payload, self.path)
+        except (OSError, DaemonError):
+            return ai.generate_candidates(diff_text, context, n, use_cache, blobs=blobs)
+
+        return [ranking.Candidate.from_dict(candidate) for candidate in reply["result"]]
+
+    def stream_commit_message(self, diff_text, context, use_cache=True, session=None, blobs=None):
+        payload = {"op": "stream", "diff_text": diff_text, "context": context, "use_cache": use_cache, "blobs": blobs}
+        return self._stream(payload, session, ai.stream_commit_message, diff_text, context, use_cache, blobs=blobs)
+
+    def stream_refine_commit_message(self, existing_message, context, session=None):
+        payload = {"op": "stream_refine", "existing_message": existing_message, "context": context}
+        return self._stream(payload, session, ai.stream_refine_commit_message, existing_message, context)
+
+    def _call(self, payload: dict, session, fallback, *args, **kwargs) -> str:
+        try:
+            with metrics.span("daemon.request"):
+                reply = _request(_with_session(payload, session), self.path)
+        except (OSError, DaemonError):
+            return fallback(*args, session=session, **kwargs)
+
+        _update(session, reply)
+        return reply["result"]
+
+    def _stream(self, payload: dict, session, fallback, *args, **kwargs):
+        try:
+            sock = _connect(self.path)
+        except OSError:
+            yield from fallback(*args, session=session, **kwargs)
+            return
+
+        started = False
+        try:
+            for chunk in _stream_request(sock, _with_session(payload, session), session):
+                started = True
+                yield chunk
+        except (OSError, DaemonError):
+            # Text already shown cannot be taken back.
+            if started:
+                raise
+            yield from fallback(*args, session=session, **kwargs)
+
+
+def connect():
+    """
+    Return a Client when a daemon is answering on the socket, otherwise
+    None so the caller runs everything in-process.
+    """
+    path = socket_path()
+
+    if get_setting("COMMITGEN_DAEMON", "auto") == "off" or not path.exists():
+        return None
+
+    return Client(path) if ping(path) else None
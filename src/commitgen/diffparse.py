@@ -0,0 +1,209 @@
+import re
+from dataclasses import dataclass, field
+
+OMITTED_MARKER = re.compile(r"^\[hunks omitted\](?: \((?P<reason>[\w-]+)\))? \+(?P<added>\d+) -(?P<removed>\d+) lines$")
+
+# One-line summaries written by compaction in place of a whole file.
+SUMMARY_RENAME = re.compile(r"^\[summarized\] renamed (?P<old>.+) -> (?P<path>.+)$")
+SUMMARY_FILE = re.compile(
+    r"^\[summarized\] (?P<path>.+?)(?: \((?P<kind>[\w-]+)\))?: "
+    r"(?:binary file changed|\+(?P<added>\d+) -(?P<removed>\d+) lines)$"
+)
+
+
+@dataclass
+class FileDiff:
+    """
+    One file's section of a unified `git diff` output.
+
+    When the parser was told to drop a file's hunks, only the header and
+    the added/removed line counts are kept, and text() renders an
+    "[hunks omitted]" marker in place of the hunks so the result can be
+    parsed again without losing the counts.
+    """
+
+    path: str
+    header: list = field(default_factory=list)
+    hunks: list = field(default_factory=list)
+    added: int = 0
+    removed: int = 0
+    hunks_dropped: bool = False
+    summary: str = ""
+    # Why the hunks were dropped, e.g. "lockfile" or "linguist-generated".
+    reason: str = ""
+
+    @property
+    def is_binary(self) -> bool:
+        return any(line.startswith(("Binary files ", "GIT binary patch")) for line in self.header)
+
+    @property
+    def is_rename_only(self) -> bool:
+        return (
+            not self.hunks
+            and not self.hunks_dropped
+            and any(line.startswith("rename from ") for line in self.header)
+        )
+
+    @property
+    def old_path(self) -> str:
+        for line in self.header:
+            if line.startswith("rename from "):
+                return line[len("rename from "):].rstrip("\n")
+        return self.path
+
+    def text(self) -> str:
+        if self.summary:
+            return self.summary
+
+        if self.hunks_dropped:
+            reason = f" ({self.reason})" if self.reason else ""
+            return "".join(self.header) + f"[hunks omitted]{reason} +{self.added} -{self.removed} lines\n"
+
+        return "".join(self.header) + "".join("".join(hunk) for hunk in self.hunks)
+
+
+def split_file_diffs(diff_text: str) -> list:
+    """
+    Split raw `git diff` output into per-file sections. Lines keep their
+    endings so joining every section's text() reproduces the input.
+    """
+    return list(iter_file_diffs(diff_text.splitlines(keepends=True)))
+
+
+def iter_file_diffs(lines, drop_hunks=None):
+    """
+    Incrementally parse `git diff` lines, yielding each file as soon as the
+    next one starts. `drop_hunks(path)` may return a reason (or True) to
+    only count a file's changed lines instead of keeping them in memory.
+    """
+    current = None
+    dropping = False
+
+    for line in lines:
+        if line.startswith("diff --git "):
+            if current is not None:
+                yield current
+            current = FileDiff(path=_path_from_header(line), header=[line])
+            dropping = False
+        elif line.startswith("[summarized] "):
+            if current is not None:
+                yield current
+            current = _parse_summary(line)
+            dropping = False
+        elif current is None:
+            # Text before the first file header (should not happen with git
+            # output, but keep it rather than silently dropping it).
+            current = FileDiff(path="", header=[line])
+        elif line.startswith("@@"):
+            if not current.hunks and not current.hunks_dropped and drop_hunks is not None:
+                reason = drop_hunks(current.path)
+                dropping = current.hunks_dropped = bool(reason)
+                current.reason = reason if isinstance(reason, str) else ""
+            if not dropping:
+                current.hunks.append([line])
+        elif current.hunks or dropping:
+            if line.startswith("+"):
+                current.added += 1
+            elif line.startswith("-"):
+                current.removed += 1
+            if not dropping:
+                current.hunks[-1].append(line)
+        else:
+            marker = OMITTED_MARKER.match(line.rstrip("\n"))
+            if marker:
+                current.hunks_dropped = True
+                current.reason = marker.group("reason") or ""
+                current.added, current.removed = int(marker.group("added")), int(marker.group("removed"))
+                continue
+
+            current.header.append(line)
+            if line.startswith("+++ b/"):
+                current.path = line[len("+++ b/"):].rstrip("\n")
+            elif line.startswith("rename to "):
+                current.path = line[len("rename to "):].rstrip("\n")
+
+    if current is not None:
+        yield current
+
+
+def _parse_summary(line: str) -> FileDiff:
+    text = line.rstrip("\n")
+
+    rename = SUMMARY_RENAME.match(text)
+    if rename:
+        return FileDiff(path=rename.group("path"), header=[f"rename from {rename.group('old')}\n"], summary=line)
+
+    match = SUMMARY_FILE.match(text)
+    if not match:
+        return FileDiff(path="", summary=line)
+
+    file_diff = FileDiff(path=match.group("path"), summary=line, reason=match.group("kind") or "")
+    if match.group("added") is not None:
+        file_diff.added, file_diff.removed = int(match.group("added")), int(match.group("removed"))
+
+    return file_diff
+
+
+def _path_from_header(line: str) -> str:
+    header = line.rstrip("\n")[len("diff --git "):]
+    marker = header.rfind(" b/")
+
+    if marker == -1:
+        return header
+
+    return header[marker + len(" b/"):]
+
+
+def chunk_diff(diff_text: str, max_chars: int) -> list:
+    """
+    Group a diff into chunks of at most roughly `max_chars` characters.
+    Whole files are kept together where possible; larger files are split
+    between hunks (and very large hunks between lines), repeating the file
+    header so every chunk can be read on its own.
+    """
+    chunks = []
+    current = ""
+
+    for file_diff in split_file_diffs(diff_text):
+        for piece in _split_file(file_diff, max_chars):
+            if current and len(current) + len(piece) > max_chars:
+                chunks.append(current)
+                current = ""
+            current += piece
+
+    if current:
+        chunks.append(current)
+
+    return chunks
+
+
+def _split_file(file_diff: FileDiff, max_chars: int) -> list:
+    text = file_diff.text()
+    if len(text) <= max_chars:
+        return [text]
+
+    header = "".join(file_diff.header)
+    pieces = []
+    current = header
+
+    for hunk in file_diff.hunks:
+        for line in _hunk_parts(hunk, max_chars - len(header)):
+            if len(current) > len(header) and len(current) + len(line) > max_chars:
+                pieces.append(current)
+                current = header
+            current += line
+
+    if len(current) > len(header) or not pieces:
+        pieces.append(current)
+
+    return pieces
+
+
+def _hunk_parts(hunk: list, max_chars: int) -> list:
+    text = "".join(hunk)
+    if len(text) <= max_chars:
+        return [text]
+
+    # Oversized hunk: split between lines. Only the first piece keeps the
+    # @@ header, which is fine since chunks are summarized, not applied.
+    return hunk
@@ -0,0 +1,86 @@
+import hashlib
+import json
+import os
+import time
+
+from commitgen.config import CONFIG_DIR, get_int_setting
+from commitgen.constants import CACHE_TTL_SECONDS, DIGEST_MAX_ENTRIES, PROMPT_VERSION
+
+# Per-file change summaries, reused across regenerations of a diff in which
+# only some files changed. One JSON file, read once and written once per
+# generation, rather than a file per entry like the response cache.
+INDEX_FILE = CONFIG_DIR / "digests.json"
+
+
+def make_key(path: str, blobs, file_text: str, model: str) -> str:
+    """
+    Key a file's summary on its blob hash pair (old -> new, as reported by
+    `git diff --raw`), which pins down exactly what changed in the file.
+    Without one, the text of the file's diff is hashed instead.
+    """
+    digest = hashlib.sha256()
+    identity = "..".join(blobs) if blobs else file_text
+
+    for part in (PROMPT_VERSION, model, path, identity):
+        digest.update(part.encode("utf-8", errors="replace"))
+        digest.update(b"\0")
+
+    return digest.hexdigest()
+
+
+def load() -> dict:
+    """
+    Return the index as {key: {"summary", "used"}}, dropping expired entries.
+    """
+    try:
+        entries = json.loads(INDEX_FILE.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+    if not isinstance(entries, dict):
+        return {}
+
+    oldest = time.time() - _ttl_seconds()
+    return {key: entry for key, entry in entries.items() if entry.get("used", 0) >= oldest}
+
+
+def save(entries: dict):
+    """
+    Merge `entries` into the index on disk and keep only the most recently
+    used ones. Written through a temporary file so a concurrent reader never
+    sees a partial index.
+    """
+    merged = {**load(), **entries}
+    newest = sorted(merged.items(), key=lambda item: item[1].get("used", 0), reverse=True)
+    kept = dict(newest[:_max_entries()])
+
+    try:
+        INDEX_FILE.parent.mkdir(parents=True, exist_ok=True)
+        temp = INDEX_FILE.with_name(f"{INDEX_FILE.name}.{os.getpid()}.tmp")
+        temp.write_text(json.dumps(kept), encoding="utf-8")
+        os.replace(temp, INDEX_FILE)
+    except OSError:
+        pass
+
+
+def entry(summary: str) -> dict:
+    return {"summary": summary, "used": time.time()}
+
+
+def clear():
+    """
+    Delete every stored file summary.
+    """
+    INDEX_FILE.unlink(missing_ok=True)
+
+
+def count() -> int:
+    return len(load())
+
+
+def _max_entries() -> int:
+    return get_int_setting("COMMITGEN_DIGEST_MAX_ENTRIES", DIGEST_MAX_ENTRIES)
+
+
+def _ttl_seconds() -> int:
+    return get_int_setting("COMMITGEN_CACHE_TTL", CACHE_TTL_SECONDS)
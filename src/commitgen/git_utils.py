@@ -1,4 +1,127 @@
+import os
+import shutil
 import subprocess
+import tempfile
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from commitgen import metrics
+from commitgen.compaction import NoiseFilter, classify_noise
+from commitgen.config import get_int_setting
+from commitgen.constants import MAX_DIFF_BYTES
+from commitgen.diffparse import iter_file_diffs
+
+
+@dataclass
+class RepoSnapshot:
+    """
+    Everything the commit flow needs to know about the working tree,
+    collected with as few git processes as possible.
+    """
+
+    is_repo: bool
+    staged_files: list = field(default_factory=list)
+    unstaged_files: list = field(default_factory=list)
+    untracked_files: list = field(default_factory=list)
+    diff: str = ""
+    diff_bytes: int = 0
+    diff_truncated: bool = False
+    # Staged files' (HEAD, index) blob hashes, as reported by git status.
+    blobs: dict = field(default_factory=dict)
+    timings: dict = field(default_factory=dict)
+
+    @property
+    def has_staged_changes(self) -> bool:
+        return bool(self.staged_files)
+
+    @property
+    def modified_files(self) -> list:
+        """
+        Files that can still be staged: unstaged modifications and untracked files.
+        """
+        return list(dict.fromkeys(self.unstaged_files + self.untracked_files))
+
+
+def _git(args: list, cwd=None) -> list:
+    """
+    Build a git command line, targeting `cwd` with `git -C` when given.
+    """
+    if cwd is None:
+        return ["git", *args]
+
+    return ["git", "-C", str(cwd), *args]
+
+
+def take_snapshot(include_diff: bool = True, cwd=None) -> RepoSnapshot:
+    """
+    Collect repo validity, staged/unstaged/untracked files and the staged
+    diff. This takes one `git status` call plus one `git diff` call when
+    something is staged, instead of a separate process per question.
+    """
+    started = time.perf_counter()
+    with metrics.span("git.status"):
+        result = subprocess.run(
+            # git's own untracked mode (status.showUntrackedFiles): listing
+            # every file in a new directory can take longer than the rest.
+            _git(["status", "--porcelain=v2", "-z"], cwd),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            encoding="utf-8",
+            errors="replace",
+        )
+    timings = {"status": time.perf_counter() - started}
+
+    if result.returncode != 0:
+        return RepoSnapshot(is_repo=False, timings=timings)
+
+    snapshot = RepoSnapshot(is_repo=True, timings=timings)
+    _parse_status_v2(result.stdout, snapshot)
+
+    if include_diff and snapshot.staged_files:
+        started = time.perf_counter()
+        stats = {}
+        snapshot.diff = read_staged_diff(cwd=cwd, stats=stats)
+        snapshot.diff_bytes = stats["bytes_read"]
+        snapshot.diff_truncated = stats["truncated"]
+        snapshot.timings["diff"] = time.perf_counter() - started
+
+    return snapshot
+
+
+def _parse_status_v2(output: str, snapshot: RepoSnapshot):
+    records = iter(output.split("\0"))
+
+    for record in records:
+        if not record:
+            continue
+
+        kind = record[0]
+
+        if kind == "?":
+            snapshot.untracked_files.append(record[2:])
+            continue
+
+        if kind == "1":
+            fields = record.split(" ", 8)
+        elif kind == "2":
+            fields = record.split(" ", 9)
+            # Renames and copies carry the original path as the next record.
+            next(records, None)
+        elif kind == "u":
+            fields = record.split(" ", 10)
+        else:
+            continue
+
+        xy, path = fields[1], fields[-1]
+
+        if xy[0] != ".":
+            snapshot.staged_files.append(path)
+            if kind != "u":
+                snapshot.blobs[path] = (fields[6], fields[7])
+        if xy[1] != ".":
+            snapshot.unstaged_files.append(path)
 
 def verify_repo():
     """
@@ -13,79 +136,401 @@ def verify_repo():
 
     return result.returncode == 0
 
-def stage_all_changes():
+def stage_all_changes(cwd=None):
     """
     Stage all changes in the Git repository.
     """
-    subprocess.run(
-        ["git", "add", "."]
-    )
+    with metrics.span("git.add"):
+        subprocess.run(
+            _git(["add", "."], cwd)
+        )
 
-def has_staged_changes():
+def iter_staged_diff(max_bytes: int = None, cwd=None, drop_hunks=None, stats: dict = None, env: dict = None):
     """
-    Check if there are any staged changes in the Git repository.
+    Stream `git diff --staged`, yielding one parsed FileDiff per file as git
+    writes it. Once `max_bytes` of output has been read, git is killed and
+    the remaining output is never buffered. `stats` (if given) receives the
+    number of bytes read and whether the diff was truncated.
     """
-    result = subprocess.run(
-        ["git", "diff", "--cached", "--quiet"],
-        stdout=subprocess.DEVNULL,
+    if stats is None:
+        stats = {}
+    stats.update(bytes_read=0, truncated=False)
+
+    process = subprocess.Popen(
+        _git(["diff", "--staged"], cwd),
+        stdout=subprocess.PIPE,
         stderr=subprocess.DEVNULL,
+        env=env,
     )
 
-    return result.returncode == 1
+    def lines():
+        while True:
+            if max_bytes is None:
+                raw = process.stdout.readline()
+            else:
+                # Never read more than one byte past the cap, however long
+                # the line: a single minified line can be many megabytes.
+                raw = process.stdout.readline(max_bytes - stats["bytes_read"] + 1)
+            if not raw:
+                return
+            stats["bytes_read"] += len(raw)
+            if max_bytes is not None and stats["bytes_read"] > max_bytes:
+                stats["truncated"] = True
+                return
+            yield raw.decode("utf-8", errors="replace")
+
+    try:
+        yield from iter_file_diffs(lines(), drop_hunks=drop_hunks)
+    finally:
+        if process.poll() is None:
+            process.kill()
+        process.stdout.close()
+        process.wait()
 
-def get_staged_diff():
+
+class AttributeReader:
     """
-    Returns the text of the staged changes.
+    Answers which of the `linguist-generated` / `linguist-vendored`
+    attributes a path has, as set in the index's .gitattributes files.
+
+    One `git check-attr --stdin` process is started on first use and fed a
+    path at a time, so a diff of any size costs a single extra process, and
+    none when no file reaches its first hunk. On any error the reader stops
+    asking and treats every later path as unset.
+    """
+
+    ATTRIBUTES = ("linguist-generated", "linguist-vendored")
+
+    def __init__(self, cwd=None, env: dict = None):
+        self.cwd = cwd
+        self.env = env
+        self._process = None
+        self._failed = False
+        self._buffer = b""
+
+    def __call__(self, path: str) -> str:
+        if self._failed:
+            return ""
+
+        try:
+            if self._process is None:
+                self._process = subprocess.Popen(
+                    _git(["check-attr", "--cached", "--stdin", "-z", *self.ATTRIBUTES], self.cwd),
+                    stdin=subprocess.PIPE,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.DEVNULL,
+                    env=self.env,
+                )
+
+            self._process.stdin.write(path.encode("utf-8") + b"\0")
+            self._process.stdin.flush()
+
+            # -z output is "<path> NUL <attribute> NUL <value> NUL" per attribute.
+            found = ""
+            for _ in self.ATTRIBUTES:
+                _, attribute, value = self._read_field(), self._read_field(), self._read_field()
+                if not found and value not in ("unset", "unspecified", "false"):
+                    found = attribute
+            return found
+        except (OSError, EOFError):
+            self._failed = True
+            self.close()
+            return ""
+
+    def _read_field(self) -> str:
+        while b"\0" not in self._buffer:
+            data = self._process.stdout.read1(4096)
+            if not data:
+                raise EOFError("git check-attr exited")
+            self._buffer += data
+
+        value, self._buffer = self._buffer.split(b"\0", 1)
+        return value.decode("utf-8", errors="replace")
+
+    def close(self):
+        if self._process is None:
+            return
+
+        process, self._process = self._process, None
+        try:
+            process.stdin.close()
+        except OSError:
+            pass
+        try:
+            process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+        process.stdout.close()
+
+
+def read_staged_diff(max_bytes: int = None, cwd=None, stats: dict = None, env: dict = None) -> str:
+    """
+    Return the staged diff built from streamed per-file pieces. Hunks of
+    lockfiles, generated and vendored files (by name or by their git
+    attributes) and of COMMITGEN_IGNORE matches are counted rather than
+    kept, and output past `max_bytes` (COMMITGEN_MAX_DIFF_BYTES) is cut
+    off, so memory stays bounded however large the diff is. `stats` also
+    receives the files filtered and why.
+    """
+    if max_bytes is None:
+        max_bytes = get_int_setting("COMMITGEN_MAX_DIFF_BYTES", MAX_DIFF_BYTES)
+    if stats is None:
+        stats = {}
+
+    attributes = AttributeReader(cwd, env)
+    noise = NoiseFilter(attributes)
+
+    try:
+        with metrics.span("git.diff"):
+            pieces = [
+                file_diff.text()
+                for file_diff in iter_staged_diff(max_bytes, cwd, drop_hunks=noise, stats=stats, env=env)
+            ]
+    finally:
+        attributes.close()
+
+    stats["filtered"] = noise.filtered
+    metrics.record("diff_bytes", stats["bytes_read"])
+
+    if stats["truncated"]:
+        pieces.append(f"... diff truncated after {max_bytes} bytes\n")
+
+    return "".join(pieces)
+
+
+def staged_blob_pairs(cwd=None, env: dict = None) -> dict:
+    """
+    Map each staged path to its (old, new) blob hashes from
+    `git diff --staged --raw`, without reading any file contents.
     """
     result = subprocess.run(
-        ["git", "diff", "--staged"],
+        _git(["diff", "--staged", "--raw", "-z", "--no-abbrev"], cwd),
         stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
         text=True,
         encoding="utf-8",
-        errors="replace",  # <- prevents crashes
+        errors="replace",
+        env=env,
     )
 
     if result.returncode != 0:
-        return ""
+        return {}
+
+    blobs = {}
+    records = iter(result.stdout.split("\0"))
+
+    for record in records:
+        if not record.startswith(":"):
+            continue
+
+        _, _, old, new, status = record[1:].split(" ", 4)
+        path = next(records, "")
+        if status[:1] in ("R", "C"):
+            # Renames and copies are followed by the source, then the destination.
+            path = next(records, "")
 
-    return result.stdout or ""
+        blobs[path] = (old, new)
 
-def push_changes():
+    return blobs
+
+
+def preview_stage_all_diff(max_bytes: int = None, cwd=None) -> str:
     """
-    Push committed changes to the remote repository.
+    Return the diff `stage_all_changes` would produce, without touching the
+    real index: changes are added to a temporary copy of it instead.
     """
-    subprocess.run(
-        ["git", "push"],
-        stdout=subprocess.DEVNULL,
+    result = subprocess.run(
+        _git(["rev-parse", "--git-path", "index"], cwd),
+        stdout=subprocess.PIPE,
         stderr=subprocess.DEVNULL,
+        text=True,
     )
 
-def commit_changes(commit_message: str):
+    if result.returncode != 0:
+        return ""
+
+    index_path = Path(cwd or ".") / result.stdout.strip()
+
+    with tempfile.TemporaryDirectory(prefix="commitgen-") as tmp:
+        temp_index = Path(tmp) / "index"
+        if index_path.exists():
+            shutil.copyfile(index_path, temp_index)
+
+        env = {**os.environ, "GIT_INDEX_FILE": str(temp_index)}
+        subprocess.run(_git(["add", "."], cwd), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, env=env)
+
+        return read_staged_diff(max_bytes, cwd, env=env)
+
+
+@dataclass
+class LogCommit:
     """
-    Commit staged changes with the provided commit message.
+    One commit read from `git log -p`, with its patch as diff text.
     """
-    subprocess.run(
-        ["git", "commit", "-m", commit_message],
-        check=True
-    )
 
-def get_modified_files():
+    sha: str
+    parents: list
+    subject: str
+    diff: str = ""
+
+    @property
+    def is_merge(self) -> bool:
+        return len(self.parents) > 1
+
+
+# Marks the start of each commit in `git log` output; the fields are
+# separated by a character that cannot appear in a subject line.
+LOG_FORMAT = "%x1e%H%x1f%P%x1f%s"
+
+
+def iter_log_diffs(rev_range: str, max_bytes: int = None, cwd=None, stats: dict = None):
     """
-    Get a list of modified files in the Git repository.
+    Stream `git log -p` for a revision range, oldest first, yielding one
+    LogCommit per commit. The whole range is read by a single git process;
+    noise hunks are counted rather than kept, and each commit's patch is
+    cut off after `max_bytes`. `stats` receives git's error output if the
+    range could not be read.
     """
+    if max_bytes is None:
+        max_bytes = get_int_setting("COMMITGEN_MAX_DIFF_BYTES", MAX_DIFF_BYTES)
+    if stats is None:
+        stats = {}
+    stats.update(error="")
+
+    process = subprocess.Popen(
+        _git(["log", "--reverse", "--no-color", "--no-ext-diff", "-p", f"--format={LOG_FORMAT}", rev_range, "--"], cwd),
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+
+    def finish(commit, lines):
+        commit.diff = "".join(file_diff.text() for file_diff in iter_file_diffs(lines, drop_hunks=classify_noise))
+        return commit
 
+    current = None
+    lines = []
+    size = 0
+
+    try:
+        for raw in process.stdout:
+            line = raw.decode("utf-8", errors="replace")
+
+            if line.startswith("\x1e"):
+                if current is not None:
+                    yield finish(current, lines)
+                sha, parents, subject = line[1:].rstrip("\n").split("\x1f", 2)
+                current, lines, size = LogCommit(sha, parents.split(), subject), [], 0
+            elif current is not None and (lines or line.strip()):
+                size += len(raw)
+                if size <= max_bytes:
+                    lines.append(line)
+
+        if current is not None:
+            yield finish(current, lines)
+    finally:
+        if process.poll() is None:
+            process.kill()
+        process.stdout.close()
+        stats["error"] = process.stderr.read().decode("utf-8", errors="replace").strip()
+        process.stderr.close()
+        if process.wait() == 0:
+            stats["error"] = ""
+
+
+def resolve_branch(rev: str, cwd=None) -> str:
+    """
+    Return the full branch ref `rev` names (e.g. refs/heads/main), or ""
+    if it is not a local branch.
+    """
     result = subprocess.run(
-        ["git", "status", "--porcelain"],
+        _git(["rev-parse", "--symbolic-full-name", rev], cwd),
         stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
         text=True,
     )
+    ref = result.stdout.strip()
+
+    return ref if result.returncode == 0 and ref.startswith("refs/heads/") else ""
+
+
+def rewrite_messages(revisions: str, messages: dict, cwd=None) -> int:
+    """
+    Replace the messages of the commits in `revisions` (a branch ref or
+    "base..ref") in one pass: `git fast-export` is piped into
+    `git fast-import` and each commit's message is swapped on the way
+    through, by original commit id. Trees, authors and dates are kept.
+    Returns the number of messages replaced; raises CalledProcessError
+    if either git process fails.
+    """
+    export_args = ["fast-export", "--no-data", "--show-original-ids", "--reference-excluded-parents",
+                   "--signed-tags=strip", "--reencode=yes", revisions]
+    import_args = ["fast-import", "--force", "--quiet"]
+
+    exporter = subprocess.Popen(_git(export_args, cwd), stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    importer = subprocess.Popen(_git(import_args, cwd), stdin=subprocess.PIPE,
+                                stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+
+    replaced = 0
+    in_commit = False
+    original = None
+
+    try:
+        for line in exporter.stdout:
+            if line.startswith(b"commit "):
+                in_commit, original = True, None
+            elif in_commit and line.startswith(b"original-oid "):
+                original = line[len(b"original-oid "):].strip().decode("ascii")
+            elif line.startswith(b"data "):
+                payload = exporter.stdout.read(int(line[len(b"data "):]))
 
-    files = []
-    for line in result.stdout.splitlines():
-        files.append(line[3:])
+                # The first data block of a commit is its message.
+                if in_commit and original in messages:
+                    payload = messages[original].rstrip("\n").encode("utf-8") + b"\n"
+                    replaced += 1
 
-    return files
+                in_commit = False
+                line = b"data %d\n" % len(payload) + payload
+
+            importer.stdin.write(line)
+    finally:
+        importer.stdin.close()
+        exporter.stdout.close()
+
+    export_error = exporter.stderr.read()
+    import_error = importer.stderr.read()
+
+    if exporter.wait() != 0:
+        raise subprocess.CalledProcessError(exporter.returncode, export_args, stderr=export_error.decode(errors="replace"))
+    if importer.wait() != 0:
+        raise subprocess.CalledProcessError(importer.returncode, import_args, stderr=import_error.decode(errors="replace"))
+
+    return replaced
+
+
+def push_changes(cwd=None):
+    """
+    Push committed changes to the remote repository.
+    Returns True if the push succeeded.
+    """
+    with metrics.span("git.push"):
+        result = subprocess.run(
+            _git(["push"], cwd),
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+
+    return result.returncode == 0
+
+def commit_changes(commit_message: str, cwd=None):
+    """
+    Commit staged changes with the provided commit message.
+    """
+    with metrics.span("git.commit"):
+        subprocess.run(
+            _git(["commit", "-m", commit_message], cwd),
+            check=True
+        )
 
 
 def stage_file(path: str):
@@ -0,0 +1,200 @@
+import fnmatch
+import posixpath
+import re
+
+from commitgen.compaction import classify_noise
+from commitgen.diffparse import split_file_diffs
+
+DEFAULT_MESSAGE = "[FEAT]: update to codebase"
+
+# Prefixes are emitted in this order, matching the examples in the prompt.
+TYPE_ORDER = ("FEAT", "FIX", "DOCS", "TEST", "CI", "CHORE")
+
+MAX_LINE_LENGTH = 100
+MAX_NAMED_FILES = 3
+
+CI_PATTERNS = (
+    ".github/workflows/*",
+    ".gitlab-ci.yml",
+    ".circleci/*",
+    "Jenkinsfile",
+    "azure-pipelines.yml",
+    ".travis.yml",
+)
+
+DOC_EXTENSIONS = (".md", ".rst", ".txt", ".adoc")
+DOC_DIRS = ("docs/", "doc/")
+
+TEST_DIRS = ("tests/", "test/", "__tests__/", "spec/")
+TEST_PATTERNS = ("test_*", "*_test.*", "*.test.*", "*.spec.*", "*Test.java", "conftest.py")
+
+CHORE_NAMES = (
+    "pyproject.toml",
+    "setup.py",
+    "setup.cfg",
+    "package.json",
+    "Dockerfile",
+    ".dockerignore",
+    ".gitignore",
+    "Makefile",
+    "tox.ini",
+    "LICENSE",
+    "CHANGELOG.md",
+)
+CHORE_PATTERNS = ("requirements*.txt", ".*rc", "*.cfg", "*.ini")
+
+
+def _compile(patterns) -> re.Pattern:
+    # One combined regex per pattern list is much cheaper than calling
+    # fnmatch for every pattern on every file.
+    return re.compile("|".join(fnmatch.translate(pattern) for pattern in patterns))
+
+
+CI_RE = _compile(CI_PATTERNS)
+TEST_RE = _compile(TEST_PATTERNS)
+CHORE_RE = _compile(CHORE_PATTERNS)
+REQUIREMENTS_RE = _compile(("requirements*.txt",))
+
+
+def generate_heuristic_message(diff_text: str, context: str = "") -> str:
+    """
+    Build a Conventional Commit message from the diff alone, without any
+    network calls. Files are classified by path, extension and the shape of
+    their changes, then grouped into one prefixed line per change type.
+    """
+    if not diff_text or diff_text.isspace():
+        return "chore: no changes detected"
+
+    groups = {}
+
+    for file_diff in split_file_diffs(diff_text):
+        if not file_diff.path:
+            continue
+        change_type, action = classify_file(file_diff)
+        groups.setdefault(change_type, []).append((action, file_diff))
+
+    lines = [_describe(change_type, groups[change_type]) for change_type in TYPE_ORDER if change_type in groups]
+    message = "\n".join(lines) if lines else DEFAULT_MESSAGE
+
+    if context:
+        return f"{message}\n\nContext: {context}"
+
+    return message
+
+
+def classify_file(file_diff) -> tuple:
+    """
+    Return the (change type, action) pair for one file, where the action is
+    "add", "remove", "rename" or "update".
+    """
+    path = file_diff.path
+    action = _action(file_diff)
+
+    if _is_ci(path):
+        return "CI", action
+
+    if _is_test(path):
+        return "TEST", action
+
+    if _is_docs(path):
+        return "DOCS", action
+
+    if action in ("remove", "rename") or _is_chore(path) or classify_noise(path) or file_diff.is_binary:
+        return "CHORE", action
+
+    if action == "add":
+        return "FEAT", action
+
+    return classify_edit(file_diff.added, file_diff.removed), action
+
+
+def classify_edit(added: int, removed: int) -> str:
+    """
+    "FIX" or "FEAT" for an edit to existing code, from its line counts.
+    Small, balanced edits are most often fixes; changes that mostly add
+    lines usually extend behaviour.
+    """
+    if removed and added <= removed * 2 and added + removed <= 40:
+        return "FIX"
+
+    return "FEAT"
+
+
+def _action(file_diff) -> str:
+    header = "".join(file_diff.header)
+
+    if "new file mode" in header:
+        return "add"
+    if "deleted file mode" in header:
+        return "remove"
+    if file_diff.is_rename_only:
+        return "rename"
+
+    return "update"
+
+
+def _describe(change_type: str, entries: list) -> str:
+    actions = {action for action, _ in entries}
+    names = [_name(action, file_diff) for action, file_diff in entries]
+
+    if change_type == "FIX":
+        verb = "fix"
+        subject = f"issues in {_join_names(names)}"
+    else:
+        verb = actions.pop() if len(actions) == 1 else "update"
+        noun = {"TEST": "tests", "CI": "CI config"}.get(change_type)
+        subject = f"{noun} in {_join_names(names)}" if noun else _join_names(names)
+
+    line = f"[{change_type}]: {verb} {subject}"
+
+    if len(line) > MAX_LINE_LENGTH:
+        line = line[:MAX_LINE_LENGTH - 3].rstrip() + "..."
+
+    return line
+
+
+def _name(action: str, file_diff) -> str:
+    name = posixpath.basename(file_diff.path)
+
+    if action == "rename":
+        return f"{posixpath.basename(file_diff.old_path)} to {name}"
+
+    return name
+
+
+def _join_names(names: list) -> str:
+    names = list(dict.fromkeys(names))
+
+    if len(names) <= MAX_NAMED_FILES:
+        return ", ".join(names)
+
+    shown = ", ".join(names[:MAX_NAMED_FILES])
+    return f"{shown} and {len(names) - MAX_NAMED_FILES} more files"
+
+
+def _is_ci(path: str) -> bool:
+    return CI_RE.match(path) is not None
+
+
+def _is_test(path: str) -> bool:
+    name = posixpath.basename(path)
+
+    return (
+        any(path.startswith(prefix) or f"/{prefix}" in path for prefix in TEST_DIRS)
+        or TEST_RE.match(name) is not None
+    )
+
+
+def _is_docs(path: str) -> bool:
+    name = posixpath.basename(path)
+
+    return (
+        path.lower().endswith(DOC_EXTENSIONS) and not REQUIREMENTS_RE.match(name)
+        and name not in CHORE_NAMES
+    ) or any(path.startswith(prefix) for prefix in DOC_DIRS)
+
+
+def _is_chore(path: str) -> bool:
+    name = posixpath.basename(path)
+
+    return name in CHORE_NAMES or CHORE_RE.match(name) is not None
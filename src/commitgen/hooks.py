@@ -0,0 +1,292 @@
+import json
+import os
+import shlex
+import subprocess
+import sys
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+import commitgen.git_utils as git_utils
+from commitgen import compaction, heuristics
+from commitgen.config import get_float_setting, get_int_setting
+from commitgen.constants import HOOK_LOCK_STALE_SECONDS, HOOK_MAX_PREPARED, HOOK_SETTLE_SECONDS
+
+HOOK_NAMES = ("prepare-commit-msg", "post-index-change")
+
+MARKER = "# Installed by commitgen"
+
+# Set for every git command the hooks run, so the index writes they cause
+# (e.g. `git write-tree` refreshing the cache tree) do not start new hooks.
+GUARD_ENV = "COMMITGEN_HOOK_RUNNING"
+
+BACKUP_SUFFIX = ".pre-commitgen"
+
+_SCRIPTS = {
+    # Runs inside `git commit`, so it only reads what was prepared and must
+    # never make the commit fail.
+    "prepare-commit-msg": """#!/bin/sh
+{marker}: fills in the message prepared in the background.
+if [ -x "$0{backup}" ]; then "$0{backup}" "$@" || exit $?; fi
+{python} -m commitgen hook run prepare-commit-msg "$@" || true
+""",
+    # Detached, so `git add` returns immediately.
+    "post-index-change": """#!/bin/sh
+{marker}: prepares a message for the new index in the background.
+if [ -x "$0{backup}" ]; then "$0{backup}" "$@"; fi
+[ -n "${guard}" ] && exit 0
+{python} -m commitgen hook run post-index-change "$@" </dev/null >/dev/null 2>&1 &
+exit 0
+""",
+}
+
+
+class HookError(RuntimeError):
+    """
+    The hooks could not be installed or removed.
+    """
+
+
+@dataclass
+class Prepared:
+    """
+    A message generated for one index tree, and the HEAD tree it was
+    generated against: together they determine the staged diff.
+    """
+
+    tree: str
+    base: str
+    message: str
+    source: str = "model"
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Prepared":
+        return cls(data["tree"], data.get("base", ""), data["message"], data.get("source", "model"))
+
+
+def hooks_dir(cwd=None) -> Path:
+    """
+    The repository's hooks directory, honouring core.hooksPath.
+    """
+    output = _git(["rev-parse", "--path-format=absolute", "--git-path", "hooks"], cwd)
+    if not output:
+        raise HookError("not inside a git repository")
+
+    return Path(output)
+
+
+def install(cwd=None, force: bool = False) -> list:
+    """
+    Write the commitgen hooks and return their paths. Hooks that commitgen
+    did not write are left alone unless `force` is set, in which case they
+    are kept next to ours and still run first.
+    """
+    directory = hooks_dir(cwd)
+    python = shlex.quote(sys.executable)
+    installed = []
+
+    for name in HOOK_NAMES:
+        path = directory / name
+
+        if path.exists() and not _is_ours(path):
+            if not force:
+                raise HookError(f"{path} already exists; use --force to keep it alongside the commitgen hook")
+            os.replace(path, path.with_name(name + BACKUP_SUFFIX))
+
+        directory.mkdir(parents=True, exist_ok=True)
+        path.write_text(
+            _SCRIPTS[name].format(marker=MARKER, backup=BACKUP_SUFFIX, guard="{" + GUARD_ENV + "}", python=python),
+            encoding="utf-8",
+        )
+        path.chmod(0o755)
+        installed.append(path)
+
+    return installed
+
+
+def uninstall(cwd=None) -> list:
+    """
+    Remove the commitgen hooks, restoring any hooks they replaced. Returns
+    the paths removed.
+    """
+    directory = hooks_dir(cwd)
+    removed = []
+
+    for name in HOOK_NAMES:
+        path = directory / name
+        if not path.exists() or not _is_ours(path):
+            continue
+
+        backup = path.with_name(name + BACKUP_SUFFIX)
+        if backup.exists():
+            os.replace(backup, path)
+        else:
+            path.unlink()
+        removed.append(path)
+
+    return removed
+
+
+def _is_ours(path: Path) -> bool:
+    try:
+        return MARKER in path.read_text(encoding="utf-8", errors="replace")
+    except OSError:
+        return False
+
+
+def prepare(cwd=None, settle: float = None) -> Prepared:
+    """
+    Generate a message for the current index and store it under the index
+    tree hash, for prepare-commit-msg to pick up. Does nothing when the
+    index changes again while settling (a newer hook takes over), when a
+    message for this tree exists or is being generated, or when nothing is
+    staged. Returns what was prepared, or None.
+    """
+    git_dir = _git(["rev-parse", "--absolute-git-dir"], cwd)
+    if not git_dir:
+        return None
+
+    if settle is None:
+        settle = get_float_setting("COMMITGEN_HOOK_SETTLE", HOOK_SETTLE_SECONDS)
+
+    index = Path(os.environ.get("GIT_INDEX_FILE") or Path(git_dir) / "index")
+    before = _mtime(index)
+    time.sleep(settle)
+    if _mtime(index) != before:
+        return None
+
+    tree, base = _trees(cwd)
+    if not tree or tree == base:
+        return None
+
+    directory = prepared_dir(git_dir)
+    if load(directory, tree, base) is not None:
+        return None
+
+    lock = directory / f"{tree}.lock"
+    if not _acquire(lock):
+        return None
+
+    try:
+        env = {**os.environ, GUARD_ENV: "1"}
+        diff_text = git_utils.read_staged_diff(cwd=cwd, env=env)
+        if not diff_text or diff_text.isspace():
+            return None
+
+        diff_text = compaction.compact_diff(diff_text).text
+        prepared = Prepared(tree, base, _generate(diff_text))
+        save(directory, prepared)
+        return prepared
+    finally:
+        lock.unlink(missing_ok=True)
+
+
+def _generate(diff_text: str) -> str:
+    # Imported here: the prepare-commit-msg side never talks to the model.
+    from commitgen import ai, daemon
+
+    engine = daemon.connect() or ai
+    return engine.generate_commit_message(diff_text, "")
+
+
+def fill(message_file, source: str = "", cwd=None) -> str:
+    """
+    Put the prepared message for the index being committed at the top of
+    `message_file`. Only plain `git commit` (no -m, -F, merge, squash or
+    amend) is filled in. Without a prepared message the local heuristic
+    one is used, so the editor never waits on the model. Returns the
+    message written, or "".
+    """
+    if source not in ("", "template"):
+        return ""
+
+    git_dir = _git(["rev-parse", "--absolute-git-dir"], cwd)
+    tree, base = _trees(cwd)
+    if not git_dir or not tree:
+        return ""
+
+    prepared = load(prepared_dir(git_dir), tree, base)
+    note = ""
+
+    if prepared is None:
+        diff_text = git_utils.read_staged_diff(cwd=cwd, env={**os.environ, GUARD_ENV: "1"})
+        if not diff_text or diff_text.isspace():
+            return ""
+        prepared = Prepared(tree, base, heuristics.generate_heuristic_message(diff_text), source="heuristic")
+        note = "# commitgen: the model's message was not ready yet, this one comes from local heuristics.\n"
+
+    path = Path(message_file)
+    existing = path.read_text(encoding="utf-8") if path.exists() else ""
+    path.write_text(f"{prepared.message.strip()}\n{note}{existing}", encoding="utf-8")
+
+    return prepared.message
+
+
+def prepared_dir(git_dir) -> Path:
+    return Path(git_dir) / "commitgen"
+
+
+def load(directory: Path, tree: str, base: str) -> Prepared:
+    try:
+        prepared = Prepared.from_dict(json.loads((directory / f"{tree}.json").read_text(encoding="utf-8")))
+    except (OSError, ValueError, KeyError):
+        return None
+
+    return prepared if prepared.base == base else None
+
+
+def save(directory: Path, prepared: Prepared):
+    """
+    Store a prepared message, written through a temporary file so the
+    commit hook never reads half of one, and drop the oldest beyond
+    COMMITGEN_HOOK_MAX_PREPARED.
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    temp = directory / f"{prepared.tree}.{os.getpid()}.tmp"
+    temp.write_text(json.dumps(prepared.__dict__), encoding="utf-8")
+    os.replace(temp, directory / f"{prepared.tree}.json")
+
+    entries = sorted(directory.glob("*.json"), key=_mtime, reverse=True)
+    for old in entries[get_int_setting("COMMITGEN_HOOK_MAX_PREPARED", HOOK_MAX_PREPARED):]:
+        old.unlink(missing_ok=True)
+
+
+def _trees(cwd=None) -> tuple:
+    """
+    The tree of the index and of HEAD ("" before the first commit).
+    """
+    tree = _git(["write-tree"], cwd)
+    base = _git(["rev-parse", "-q", "--verify", "HEAD^{tree}"], cwd)
+    return tree, base
+
+
+def _acquire(lock: Path) -> bool:
+    lock.parent.mkdir(parents=True, exist_ok=True)
+
+    # A lock left behind by a worker that died is taken over.
+    if lock.exists() and time.time() - _mtime(lock) > HOOK_LOCK_STALE_SECONDS:
+        lock.unlink(missing_ok=True)
+
+    try:
+        os.close(os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        return True
+    except FileExistsError:
+        return False
+
+
+def _mtime(path: Path) -> float:
+    try:
+        return path.stat().st_mtime_ns / 1e9
+    except OSError:
+        return 0.0
+
+
+def _git(args: list, cwd=None) -> str:
+    result = subprocess.run(
+        git_utils._git(args, cwd),
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        text=True,
+        env={**os.environ, GUARD_ENV: "1"},
+    )
+    return result.stdout.strip() if result.returncode == 0 else ""
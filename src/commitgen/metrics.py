@@ -0,0 +1,127 @@
+import json
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+# The active recorder, or None when instrumentation is off. A plain global
+# rather than a context variable so that spans recorded on worker threads
+# (prefetch, chunk summaries) land in the same report.
+_recorder = None
+
+
+class Recorder:
+    """
+    Collects named timing spans and measured values for one command run.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.finished = None
+        self.spans = {}
+        self.values = {}
+        self._lock = threading.Lock()
+
+    @property
+    def wall_time(self) -> float:
+        return (self.finished or time.perf_counter()) - self.started
+
+    def add_span(self, name: str, duration: float):
+        with self._lock:
+            count, total = self.spans.get(name, (0, 0.0))
+            self.spans[name] = (count + 1, total + duration)
+
+    def record(self, name: str, value, accumulate: bool = False):
+        with self._lock:
+            if accumulate:
+                self.values[name] = self.values.get(name, 0) + value
+            elif name not in self.values:
+                # The first measurement wins, e.g. time to the *first* token.
+                self.values[name] = value
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            return {
+                "wall_ms": round(self.wall_time * 1000, 2),
+                "stages": {
+                    name: {"count": count, "total_ms": round(total * 1000, 2)}
+                    for name, (count, total) in self.spans.items()
+                },
+                **self.values,
+            }
+
+
+def start() -> Recorder:
+    """
+    Begin recording spans for this process and return the recorder.
+    """
+    global _recorder
+
+    _recorder = Recorder()
+    return _recorder
+
+
+def stop() -> Recorder:
+    """
+    Stop recording and return the finished recorder (None if none was active).
+    """
+    global _recorder
+
+    recorder, _recorder = _recorder, None
+    if recorder is not None:
+        recorder.finished = time.perf_counter()
+
+    return recorder
+
+
+def enabled() -> bool:
+    return _recorder is not None
+
+
+@contextmanager
+def span(name: str):
+    """
+    Time the enclosed block as stage `name`. Does nothing when recording is off.
+    """
+    recorder = _recorder
+    if recorder is None:
+        yield
+        return
+
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        recorder.add_span(name, time.perf_counter() - started)
+
+
+def add_span(name: str, duration: float):
+    """
+    Record an already measured duration, for stages that do not fit a
+    with-block (e.g. a generator consumed elsewhere).
+    """
+    recorder = _recorder
+    if recorder is not None:
+        recorder.add_span(name, duration)
+
+
+def record(name: str, value, accumulate: bool = False):
+    """
+    Record a measured value (bytes, tokens, milliseconds) for this run.
+    """
+    recorder = _recorder
+    if recorder is not None:
+        recorder.record(name, value, accumulate=accumulate)
+
+
+def append_jsonl(path, recorder: Recorder, **fields):
+    """
+    Append one run as a JSON line to `path`, creating it if needed.
+    """
+    path = Path(path).expanduser()
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    entry = {"timestamp": time.time(), **fields, **recorder.as_dict()}
+
+    with path.open("a", encoding="utf-8") as handle:
+        handle.write(json.dumps(entry, sort_keys=True) + "\n")
@@ -0,0 +1,109 @@
+import threading
+from concurrent.futures import CancelledError, Future
+
+
+class Prefetcher:
+    """
+    Runs one generation request at a time on a background thread so it can
+    overlap with other work in the commit flow.
+
+    Starting a new request supersedes the previous one. A superseded request
+    that returns a stream of chunks is stopped at the next chunk, which
+    closes the underlying HTTP response. A blocking request that is already
+    running cannot be interrupted, so its result is simply discarded. Worker
+    threads are daemons, so a stale request never delays process exit.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._future = None
+        self._cancel_event = None
+
+    @property
+    def pending(self) -> bool:
+        return self._future is not None
+
+    def start(self, fn, *args, **kwargs):
+        """
+        Start `fn(*args, **kwargs)` in the background, cancelling any
+        request that is still in flight.
+        """
+        future = Future()
+        cancel_event = threading.Event()
+
+        with self._lock:
+            self._cancel_current()
+            self._future = future
+            self._cancel_event = cancel_event
+
+        threading.Thread(
+            target=self._run,
+            args=(future, cancel_event, fn, args, kwargs),
+            name="commitgen-prefetch",
+            daemon=True,
+        ).start()
+
+    def result(self, timeout: float = None):
+        """
+        Wait for the current request and return its result. Raises
+        CancelledError if there is nothing in flight.
+        """
+        with self._lock:
+            future = self._future
+            self._future = None
+            self._cancel_event = None
+
+        if future is None:
+            raise CancelledError("no request in flight")
+
+        return future.result(timeout=timeout)
+
+    def cancel(self):
+        """
+        Cancel the request in flight, if any.
+        """
+        with self._lock:
+            self._cancel_current()
+
+    def _cancel_current(self):
+        if self._future is not None:
+            self._cancel_event.set()
+            self._future.cancel()
+
+        self._future = None
+        self._cancel_event = None
+
+    @staticmethod
+    def _run(future, cancel_event, fn, args, kwargs):
+        if not future.set_running_or_notify_cancel():
+            return
+
+        try:
+            result = _consume(fn(*args, **kwargs), cancel_event)
+        except BaseException as exc:
+            if not cancel_event.is_set():
+                future.set_exception(exc)
+            return
+
+        if not cancel_event.is_set():
+            future.set_result(result)
+
+
+def _consume(result, cancel_event):
+    if not hasattr(result, "__next__"):
+        return result
+
+    # A stream of chunks: stop reading (and close it) as soon as the
+    # request has been superseded.
+    parts = []
+    try:
+        for chunk in result:
+            if cancel_event.is_set():
+                raise CancelledError()
+            parts.append(chunk)
+    finally:
+        close = getattr(result, "close", None)
+        if close is not None:
+            close()
+
+    return "".join(parts)
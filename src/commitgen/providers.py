@@ -0,0 +1,268 @@
+import copy
+import hashlib
+import re
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+from commitgen.heuristics import generate_heuristic_message
+
+PROVIDER_NAMES = ("openai", "compatible", "stub")
+
+# The diff ends where the next prompt section starts: an upper-case
+# heading such as "ADDITIONAL CONTEXT:" or the "Rules:" block.
+_DIFF_IN_PROMPT = re.compile(r"GIT DIFF(?: PART)?:\n(.*?)(?:\n\n(?:[A-Z][A-Z ]+|Rules):\n|\Z)", re.DOTALL)
+
+
+@dataclass
+class Session:
+    """
+    Conversation state carried from a generation to the refinements that
+    follow it, so follow-ups only send what is new. Providers with
+    server-side state keep the id of the last stored response here; the
+    others keep a local log of the messages exchanged so far.
+    """
+
+    state: object = None
+
+    @property
+    def active(self) -> bool:
+        return self.state is not None
+
+
+class Provider:
+    """
+    A backend that turns a prompt into text. Subclasses implement complete()
+    and stream(); everything above them (caching, chunking, metrics) is
+    shared in commitgen.ai. Both take an optional Session, which they
+    continue from and update.
+    """
+
+    name = ""
+
+    def __init__(self, model: str):
+        self.model = model
+
+    @property
+    def cache_id(self) -> str:
+        """
+        Identifies this backend and model in response cache keys.
+        """
+        return f"{self.name}:{self.model}"
+
+    def with_model(self, model: str) -> "Provider":
+        """
+        The same backend with another model. Clients are shared with this
+        provider, so switching models keeps their connection pools.
+        """
+        clone = copy.copy(self)
+        clone.model = model
+        return clone
+
+    def warm(self):
+        """
+        Create clients up front, for long-running processes like the daemon.
+        """
+
+    def complete(self, prompt: str, session: Session = None) -> str:
+        raise NotImplementedError
+
+    def stream(self, prompt: str, session: Session = None):
+        """
+        Yield the response in chunks. The default sends one blocking request.
+        """
+        yield self.complete(prompt, session)
+
+    def sample(self, prompt: str, n: int) -> list:
+        """
+        Return `n` independent responses to one prompt as (text, Session)
+        pairs. The default sends the requests concurrently, so n samples
+        take about as long as one.
+        """
+        sessions = [Session() for _ in range(n)]
+
+        with ThreadPoolExecutor(max_workers=max(1, n)) as pool:
+            texts = list(pool.map(lambda session: self.complete(prompt, session), sessions))
+
+        return list(zip(texts, sessions))
+
+
+class OpenAIProvider(Provider):
+    """
+    The OpenAI Responses API, through a shared `openai.OpenAI` client.
+    """
+
+    name = "openai"
+
+    def __init__(self, model: str, get_client):
+        super().__init__(model)
+        self._get_client = get_client
+
+    @property
+    def cache_id(self) -> str:
+        # Bare model name, so entries cached before providers existed stay valid.
+        return self.model
+
+    def warm(self):
+        self._get_client()
+
+    def complete(self, prompt: str, session: Session = None) -> str:
+        response = self._get_client().responses.create(model=self.model, input=prompt, store=True, **_previous(session))
+
+        if session is not None:
+            session.state = response.id
+
+        return response.output_text
+
+    def stream(self, prompt: str, session: Session = None):
+        stream = self._get_client().responses.create(
+            model=self.model, input=prompt, store=True, stream=True, **_previous(session)
+        )
+
+        try:
+            for event in stream:
+                if event.type == "response.output_text.delta":
+                    yield event.delta
+                elif event.type == "response.completed" and session is not None:
+                    session.state = event.response.id
+        finally:
+            # Runs on normal completion as well as when the consumer stops early
+            # (e.g. Ctrl-C), so the underlying HTTP response is always released.
+            stream.close()
+
+
+class CompatibleProvider(Provider):
+    """
+    Any server that speaks the OpenAI chat completions protocol at a
+    configurable base URL, e.g. a local llama.cpp or vLLM server.
+    """
+
+    name = "compatible"
+
+    def __init__(self, model: str, base_url: str, api_key: str = None, timeout: float = None, max_retries: int = 0):
+        super().__init__(model)
+        self.base_url = base_url
+        self._api_key = api_key
+        self._timeout = timeout
+        self._max_retries = max_retries
+        self._client = None
+
+    @property
+    def cache_id(self) -> str:
+        return f"{self.name}:{self.base_url}:{self.model}"
+
+    @property
+    def client(self):
+        if self._client is None:
+            from openai import OpenAI
+
+            self._client = OpenAI(
+                # Local servers usually ignore the key, but the client requires one.
+                api_key=self._api_key or "not-needed",
+                base_url=self.base_url,
+                timeout=self._timeout,
+                max_retries=self._max_retries,
+            )
+
+        return self._client
+
+    def warm(self):
+        self.client
+
+    def complete(self, prompt: str, session: Session = None) -> str:
+        messages = _messages(prompt, session)
+        response = self.client.chat.completions.create(model=self.model, messages=messages)
+        text = response.choices[0].message.content or ""
+
+        _remember(session, messages, text)
+        return text
+
+    def sample(self, prompt: str, n: int) -> list:
+        # Chat completions can return several choices from one request.
+        # Servers that ignore `n` send back fewer, and the rest are
+        # requested separately.
+        messages = _messages(prompt)
+        response = self.client.chat.completions.create(model=self.model, messages=messages, n=n)
+        samples = []
+
+        for choice in response.choices[:n]:
+            session = Session()
+            _remember(session, messages, choice.message.content or "")
+            samples.append((choice.message.content or "", session))
+
+        if len(samples) < n:
+            samples += super().sample(prompt, n - len(samples))
+
+        return samples
+
+    def stream(self, prompt: str, session: Session = None):
+        messages = _messages(prompt, session)
+        stream = self.client.chat.completions.create(model=self.model, messages=messages, stream=True)
+        parts = []
+
+        try:
+            for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    parts.append(chunk.choices[0].delta.content)
+                    yield parts[-1]
+        finally:
+            stream.close()
+
+        # Only a completed stream becomes part of the conversation.
+        _remember(session, messages, "".join(parts))
+
+
+class StubProvider(Provider):
+    """
+    Deterministic in-process backend for tests and air-gapped runs. Returns
+    the configured response, or the local heuristic message for the diff
+    embedded in the prompt, without any I/O.
+    """
+
+    name = "stub"
+
+    def __init__(self, model: str = "stub", response: str = None):
+        super().__init__(model)
+        self.response = response
+        self.prompts = []
+
+    def complete(self, prompt: str, session: Session = None) -> str:
+        messages = _messages(prompt, session)
+        self.prompts.append(prompt)
+
+        if self.response is not None:
+            text = self.response
+        else:
+            # Follow-ups carry no diff of their own, so look back through the log.
+            match = next(
+                (found for found in (_DIFF_IN_PROMPT.search(m["content"]) for m in reversed(messages)) if found),
+                None,
+            )
+            if match:
+                text = generate_heuristic_message(match.group(1))
+            else:
+                text = f"[CHORE]: update {hashlib.sha256(prompt.encode('utf-8')).hexdigest()[:8]}"
+
+        _remember(session, messages, text)
+        return text
+
+    def stream(self, prompt: str, session: Session = None):
+        words = self.complete(prompt, session).split(" ")
+
+        for i, word in enumerate(words):
+            yield word if i == len(words) - 1 else word + " "
+
+
+def _previous(session: Session) -> dict:
+    if session is not None and session.active:
+        return {"previous_response_id": session.state}
+    return {}
+
+
+def _messages(prompt: str, session: Session = None) -> list:
+    history = list(session.state) if session is not None and session.active else []
+    return history + [{"role": "user", "content": prompt}]
+
+
+def _remember(session: Session, messages: list, reply: str):
+    if session is not None:
+        session.state = messages + [{"role": "assistant", "content": reply}]
@@ -0,0 +1,334 @@
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+from dataclasses import asdict, dataclass
+
+import commitgen.git_utils as git_utils
+from commitgen.config import CONFIG_DIR, get_int_setting, get_setting
+from commitgen.constants import PUSH_LOG_MAX_ENTRIES, PUSH_RETRIES
+
+QUEUE_DIR = CONFIG_DIR / "push-queue"
+LOG_FILE = CONFIG_DIR / "push.log"
+# Touched whenever the log has been shown, so later runs only report newer results.
+SEEN_FILE = CONFIG_DIR / "push.seen"
+
+# An empty worker lock older than this is treated as abandoned.
+LOCK_EMPTY_STALE_SECONDS = 5.0
+
+# Failures that another attempt cannot fix.
+PERMANENT_ERRORS = (
+    "[rejected]",
+    "non-fast-forward",
+    "has no upstream",
+    "Permission denied",
+    "Authentication failed",
+    "Repository not found",
+    "does not appear to be a git repository",
+)
+
+
+@dataclass
+class PushJob:
+    """
+    A branch waiting to be pushed. There is at most one per repository and
+    branch: committing again before the worker gets to it only moves
+    `commit` forward, so several commits cost one push.
+    """
+
+    repo: str
+    branch: str
+    commit: str
+    queued_at: float
+
+    @property
+    def key(self) -> str:
+        return hashlib.sha1(f"{self.repo}\0{self.branch}".encode("utf-8")).hexdigest()[:16]
+
+
+def background_enabled() -> bool:
+    """
+    Whether COMMITGEN_PUSH_MODE asks for pushes to run in the background.
+    """
+    return get_setting("COMMITGEN_PUSH_MODE", "sync").lower() == "background"
+
+
+def enqueue(cwd=None) -> PushJob:
+    """
+    Queue the current branch for pushing and make sure a worker is running.
+    Returns the job, or None when HEAD is not on a branch (the caller should
+    push in the foreground instead).
+    """
+    output = _output(["rev-parse", "--show-toplevel", "HEAD", "--abbrev-ref", "HEAD"], cwd)
+    if len(output.splitlines()) != 3:
+        return None
+
+    repo, commit, branch = output.splitlines()
+    if branch == "HEAD":
+        return None
+
+    job = PushJob(repo, branch, commit, time.time())
+    _write_json(QUEUE_DIR / f"{job.key}.json", asdict(job))
+    start_worker()
+
+    return job
+
+
+def pending() -> list:
+    """
+    The jobs waiting to be pushed, oldest first.
+    """
+    jobs = []
+
+    for path in QUEUE_DIR.glob("*.json"):
+        job = _read_job(path)
+        if job is not None:
+            jobs.append(job)
+
+    return sorted(jobs, key=lambda job: job.queued_at)
+
+
+def start_worker():
+    """
+    Start a detached worker unless one is already draining the queue.
+    """
+    if _worker_alive():
+        return
+
+    subprocess.Popen(
+        [sys.executable, "-m", "commitgen", "push", "run"],
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+
+
+def run_worker() -> int:
+    """
+    Push queued branches until the queue is empty, logging each result.
+    Only one worker runs at a time; a second one exits immediately.
+    Returns the number of pushes made.
+    """
+    pushed = 0
+
+    while _acquire():
+        try:
+            for job in pending():
+                result = push(job)
+                _log(result)
+                pushed += 1
+
+                # A commit queued while pushing replaced the job; keep it
+                # so the next round pushes that one too.
+                path = QUEUE_DIR / f"{job.key}.json"
+                current = _read_job(path)
+                if current is not None and current.commit == job.commit:
+                    path.unlink(missing_ok=True)
+        finally:
+            _release()
+
+        # A job queued after the last listing, while this worker still
+        # held the lock, would otherwise wait for the next commit.
+        if not pending():
+            break
+
+    return pushed
+
+
+def push(job: PushJob, retries: int = None) -> dict:
+    """
+    Push one branch to its push remote, retrying transient failures with
+    backoff. Returns the log entry describing the outcome.
+    """
+    from commitgen.resilience import backoff
+
+    if retries is None:
+        retries = get_int_setting("COMMITGEN_PUSH_RETRIES", PUSH_RETRIES)
+
+    entry = {**asdict(job), "status": "failed", "attempts": 0, "error": ""}
+    ref = f"refs/heads/{job.branch}"
+    remote, remote_ref = (_output(["for-each-ref", "--format=%(push:remotename)\n%(push:remoteref)", ref], job.repo)
+                          .split("\n") + ["", ""])[:2]
+
+    if not remote:
+        entry["error"] = f"branch {job.branch} has no upstream; push it once with `git push --set-upstream`"
+        return entry
+
+    for attempt in range(retries + 1):
+        if attempt:
+            time.sleep(backoff(attempt - 1))
+
+        entry["attempts"] = attempt + 1
+        result = subprocess.run(
+            git_utils._git(["push", remote, f"{ref}:{remote_ref or ref}"], job.repo),
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            errors="replace",
+            env={**os.environ, "GIT_TERMINAL_PROMPT": "0"},
+        )
+
+        if result.returncode == 0:
+            entry.update(status="pushed", error="")
+            return entry
+
+        entry["error"] = _error_line(result.stderr) or f"git push exited with {result.returncode}"
+        if any(marker in result.stderr for marker in PERMANENT_ERRORS):
+            break
+
+    return entry
+
+
+def read_log() -> list:
+    """
+    Every logged push result, oldest first.
+    """
+    try:
+        lines = LOG_FILE.read_text(encoding="utf-8").splitlines()
+    except OSError:
+        return []
+
+    entries = []
+    for line in lines:
+        try:
+            entries.append(json.loads(line))
+        except ValueError:
+            continue
+
+    return entries
+
+
+def unseen() -> list:
+    """
+    Results logged since the last call, for reporting on the next run. Only
+    two stat calls when there is nothing new.
+    """
+    try:
+        modified = LOG_FILE.stat().st_mtime
+    except OSError:
+        return []
+
+    try:
+        seen = SEEN_FILE.stat().st_mtime
+    except OSError:
+        seen = 0.0
+
+    if modified <= seen:
+        return []
+
+    entries = [entry for entry in read_log() if entry.get("time", 0) > seen]
+    # Entries appended after the stat are reported now, so never mark less.
+    seen = max([modified] + [entry["time"] for entry in entries])
+    SEEN_FILE.parent.mkdir(parents=True, exist_ok=True)
+    SEEN_FILE.touch()
+    os.utime(SEEN_FILE, (seen, seen))
+
+    return entries
+
+
+def _log(entry: dict):
+    entry = {**entry, "time": time.time()}
+    LOG_FILE.parent.mkdir(parents=True, exist_ok=True)
+
+    with open(LOG_FILE, "a", encoding="utf-8") as handle:
+        handle.write(json.dumps(entry) + "\n")
+
+    # Only rewrite once the log has grown well past the limit, so most
+    # appends stay a single write.
+    limit = get_int_setting("COMMITGEN_PUSH_LOG_MAX_ENTRIES", PUSH_LOG_MAX_ENTRIES)
+    if LOG_FILE.stat().st_size < limit * 256:
+        return
+
+    lines = LOG_FILE.read_text(encoding="utf-8").splitlines(keepends=True)
+    if len(lines) > 2 * limit:
+        LOG_FILE.write_text("".join(lines[-limit:]), encoding="utf-8")
+
+
+def _read_job(path) -> PushJob:
+    try:
+        return PushJob(**json.loads(path.read_text(encoding="utf-8")))
+    except (OSError, ValueError, TypeError):
+        return None
+
+
+def _write_json(path, data: dict):
+    # Written through a temporary file so the worker never reads half a job.
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    temp.write_text(json.dumps(data), encoding="utf-8")
+    os.replace(temp, path)
+
+
+def _lock_path():
+    return QUEUE_DIR / "worker.lock"
+
+
+def _worker_alive() -> bool:
+    lock = _lock_path()
+    try:
+        text = lock.read_text(encoding="utf-8")
+    except OSError:
+        return False
+
+    # Empty while the worker that just created it writes its pid; one that
+    # stays empty was left by a worker that died in between.
+    if not text:
+        try:
+            return time.time() - lock.stat().st_mtime < LOCK_EMPTY_STALE_SECONDS
+        except OSError:
+            return False
+
+    try:
+        pid = int(text)
+    except ValueError:
+        return False
+
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+
+    return True
+
+
+def _acquire() -> bool:
+    lock = _lock_path()
+    lock.parent.mkdir(parents=True, exist_ok=True)
+
+    # A lock left behind by a worker that died is taken over.
+    if lock.exists() and not _worker_alive():
+        lock.unlink(missing_ok=True)
+
+    try:
+        fd = os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        return False
+
+    with os.fdopen(fd, "w") as handle:
+        handle.write(str(os.getpid()))
+
+    return True
+
+
+def _release():
+    _lock_path().unlink(missing_ok=True)
+
+
+def _error_line(stderr: str) -> str:
+    # git ends with hints; the line saying what went wrong comes before them.
+    lines = [line.strip() for line in stderr.splitlines() if line.strip() and not line.startswith("hint:")]
+    for line in lines:
+        if "[rejected]" in line or line.startswith(("fatal:", "error:", "remote: error")):
+            return line
+    return lines[-1] if lines else ""
+
+
+def _output(args: list, cwd=None) -> str:
+    result = subprocess.run(git_utils._git(args, cwd), stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    return result.stdout.strip() if result.returncode == 0 else ""
@@ -0,0 +1,117 @@
+import re
+from dataclasses import dataclass, field
+
+from commitgen.diffparse import split_file_diffs
+from commitgen.heuristics import MAX_LINE_LENGTH, classify_file
+from commitgen.providers import Session
+
+COMMIT_TYPES = ("FEAT", "FIX", "DOCS", "STYLE", "REFACTOR", "PERF", "TEST", "CI", "CHORE")
+
+# "[FEAT]: add login" as the prompt asks for, or plain "feat(auth): add login".
+LINE_RE = re.compile(
+    r"^(?:\[(?P<bracketed>[A-Z]+)\]|(?P<plain>[a-z]+)(?:\([^)]*\))?!?):\s+\S"
+)
+
+# Types the heuristics can tell apart from paths alone. Everything else is
+# some change to code, where FEAT, FIX, REFACTOR etc. are all plausible.
+PATH_TYPES = ("DOCS", "TEST", "CI", "CHORE")
+
+WEIGHTS = {"format": 3, "coverage": 2, "length": 1}
+
+
+@dataclass
+class Candidate:
+    """
+    One generated message with its local quality score (0 to 1), the
+    problems found while scoring it, and the session it was generated in.
+    """
+
+    message: str
+    score: float = 0.0
+    issues: list = field(default_factory=list)
+    session: Session = None
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Candidate":
+        session = data.get("session")
+        return cls(
+            message=data["message"],
+            score=data.get("score", 0.0),
+            issues=list(data.get("issues", [])),
+            session=Session(**session) if session is not None else None,
+        )
+
+
+def expected_types(diff_text: str) -> set:
+    """
+    Change type groups a message for this diff should mention: the
+    path-based types as they are, and "CODE" for any other change.
+    """
+    groups = set()
+
+    for file_diff in split_file_diffs(diff_text):
+        if not file_diff.path:
+            continue
+        change_type, _ = classify_file(file_diff)
+        groups.add(change_type if change_type in PATH_TYPES else "CODE")
+
+    return groups
+
+
+def score(message: str, expected: set) -> tuple:
+    """
+    Score a message for Conventional Commit format, line length and
+    coverage of the expected change types. Returns (score, issues).
+    """
+    lines = [line.strip() for line in message.strip().splitlines() if line.strip()]
+    if not lines:
+        return 0.0, ["empty message"]
+
+    issues = []
+    found = set()
+    valid = 0
+
+    for line in lines:
+        match = LINE_RE.match(line)
+        change_type = (match.group("bracketed") or match.group("plain").upper()) if match else None
+
+        if change_type in COMMIT_TYPES:
+            valid += 1
+            found.add(change_type if change_type in PATH_TYPES else "CODE")
+
+    too_long = sum(1 for line in lines if len(line) > MAX_LINE_LENGTH)
+
+    if valid < len(lines):
+        issues.append(f"{len(lines) - valid} line(s) without a commit type prefix")
+    if too_long:
+        issues.append(f"{too_long} line(s) over {MAX_LINE_LENGTH} characters")
+
+    missing = sorted(expected - found)
+    if missing:
+        issues.append("no " + ", ".join(missing) + " change")
+
+    parts = {
+        "format": valid / len(lines),
+        "length": 1 - too_long / len(lines),
+        "coverage": len(expected & found) / len(expected) if expected else 1.0,
+    }
+    total = sum(WEIGHTS[name] * value for name, value in parts.items()) / sum(WEIGHTS.values())
+
+    return round(total, 3), issues
+
+
+def rank(candidates: list, diff_text: str) -> list:
+    """
+    Score candidates against the diff and return them best first, dropping
+    duplicate messages. Ties keep the order the candidates arrived in.
+    """
+    expected = expected_types(diff_text)
+    unique = {}
+
+    for candidate in candidates:
+        key = candidate.message.strip()
+        if key and key not in unique:
+            candidate.score, candidate.issues = score(candidate.message, expected)
+            unique[key] = candidate
+
+    return sorted(unique.values(), key=lambda candidate: -candidate.score)
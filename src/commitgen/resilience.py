@@ -0,0 +1,487 @@
+import contextlib
+import json
+import os
+import queue
+import random
+import threading
+import time
+
+from commitgen import metrics, routing
+from commitgen.config import CONFIG_DIR, get_float_setting, get_int_setting, get_setting
+from commitgen.constants import (
+    BREAKER_COOLDOWN_SECONDS,
+    BREAKER_THRESHOLD,
+    HEDGE_MIN_SAMPLES,
+    REQUEST_MAX_RETRIES,
+    REQUEST_RETRY_BASE_SECONDS,
+    REQUEST_RETRY_MAX_SECONDS,
+    REQUEST_TIMEOUT_SECONDS,
+)
+
+BREAKER_FILE = CONFIG_DIR / "breaker.json"
+BREAKER_LOCK_TIMEOUT_SECONDS = 1.0
+
+_breaker_lock = threading.Lock()
+
+
+class BackendUnavailable(RuntimeError):
+    """
+    Every attempt at a request failed, or the backend's circuit is open.
+    Callers answer with the local fallback instead.
+    """
+
+
+class RequestRejected(RuntimeError):
+    """
+    The backend answered with an error that another attempt cannot fix,
+    such as a bad request or a rejected API key.
+    """
+
+
+class AttemptTimeout(TimeoutError):
+    """
+    An attempt produced no response before its deadline.
+    """
+
+
+def call(fn, provider, retries=None):
+    """
+    Run `fn()` against `provider` with a deadline per attempt, jittered
+    exponential retries and, when COMMITGEN_HEDGE is set, a duplicate
+    request once the first has taken longer than the hedge threshold. `fn`
+    may run more than once, also concurrently, so it must not share state
+    between attempts. `retries` overrides COMMITGEN_MAX_RETRIES. Raises
+    BackendUnavailable when the circuit is open or every attempt failed,
+    and RequestRejected for HTTP errors that are not worth retrying.
+    """
+    retries = _admit(provider, retries)
+    deadline = get_float_setting("COMMITGEN_TIMEOUT", REQUEST_TIMEOUT_SECONDS)
+    hedge_after = hedge_threshold(provider)
+    error = None
+
+    for attempt in range(retries + 1):
+        if attempt:
+            metrics.record("retries", 1, accumulate=True)
+            time.sleep(retry_delay(error, attempt - 1))
+
+        try:
+            result = _attempt(fn, deadline, hedge_after)
+        except Exception as exc:
+            if not is_retryable(exc):
+                _give_up(exc, provider)
+            error = exc
+            continue
+
+        record_success(provider.cache_id)
+        return result
+
+    # One failure per request, however many attempts it took, so a single
+    # unlucky request cannot open the circuit on its own.
+    record_failure(provider.cache_id)
+    raise BackendUnavailable(f"{provider.cache_id} failed after {retries + 1} attempt(s): {error}") from error
+
+
+def stream(open_stream, provider):
+    """
+    Streaming counterpart of call(): `open_stream()` returns a chunk
+    iterator, and attempts that fail or miss the deadline before their
+    first chunk are retried. Once text has been yielded the stream is
+    committed to, so later errors propagate as they are.
+    """
+    retries = _admit(provider)
+    deadline = get_float_setting("COMMITGEN_TIMEOUT", REQUEST_TIMEOUT_SECONDS)
+    error = None
+
+    for attempt in range(retries + 1):
+        if attempt:
+            metrics.record("retries", 1, accumulate=True)
+            time.sleep(retry_delay(error, attempt - 1))
+
+        chunks = None
+        abandoned = threading.Event()
+        try:
+            chunks = iter(open_stream())
+            first = _attempt(lambda: _first_chunk(chunks, abandoned), deadline)
+        except Exception as exc:
+            abandoned.set()
+            _close(chunks)
+            if not is_retryable(exc):
+                _give_up(exc, provider)
+            error = exc
+            continue
+
+        record_success(provider.cache_id)
+
+        try:
+            if first is not None:
+                yield first
+                yield from chunks
+        finally:
+            # Also when the consumer stops early, so the provider releases
+            # its HTTP response.
+            _close(chunks)
+        return
+
+    record_failure(provider.cache_id)
+    raise BackendUnavailable(f"{provider.cache_id} failed after {retries + 1} attempt(s): {error}") from error
+
+
+async def acall(make_request, provider, retries=None):
+    """
+    Asyncio counterpart of call(): `make_request()` returns a fresh awaitable
+    for every attempt. Attempts that miss the deadline, and the slower one
+    of a hedged pair, are cancelled rather than abandoned.
+    """
+    import asyncio
+
+    retries = _admit(provider, retries)
+    deadline = get_float_setting("COMMITGEN_TIMEOUT", REQUEST_TIMEOUT_SECONDS)
+    hedge_after = hedge_threshold(provider)
+    error = None
+
+    for attempt in range(retries + 1):
+        if attempt:
+            metrics.record("retries", 1, accumulate=True)
+            await asyncio.sleep(retry_delay(error, attempt - 1))
+
+        try:
+            result = await _aattempt(make_request, deadline, hedge_after)
+        except Exception as exc:
+            if not is_retryable(exc):
+                _give_up(exc, provider)
+            error = exc
+            continue
+
+        record_success(provider.cache_id)
+        return result
+
+    record_failure(provider.cache_id)
+    raise BackendUnavailable(f"{provider.cache_id} failed after {retries + 1} attempt(s): {error}") from error
+
+
+def _give_up(exc, provider):
+    # HTTP errors mean the backend is up but refused this request; anything
+    # else is not the backend's doing and propagates as it is.
+    if getattr(exc, "status_code", None) is None:
+        raise exc
+
+    record_success(provider.cache_id)
+    raise RequestRejected(f"{provider.cache_id} rejected the request: {exc}") from exc
+
+
+def _first_chunk(chunks, abandoned):
+    try:
+        return next(chunks, None)
+    finally:
+        # The attempt may have been given up while this was waiting.
+        if abandoned.is_set():
+            _close(chunks)
+
+
+def _close(chunks):
+    # Releases the provider's HTTP response. A generator that is still
+    # running on an abandoned attempt's thread cannot be closed from here;
+    # _first_chunk closes it once next() returns.
+    try:
+        chunks.close()
+    except (AttributeError, ValueError):
+        pass
+
+
+def _admit(provider, retries=None) -> int:
+    """
+    Check the circuit and return how many retries this request gets: none
+    for the single trial request of a half-open circuit.
+    """
+    state = breaker_state(provider.cache_id)
+    metrics.record("breaker", state)
+
+    if state == "open":
+        raise BackendUnavailable(f"{provider.cache_id} is unavailable (circuit open)")
+
+    if state == "half-open":
+        if not claim_probe(provider.cache_id):
+            raise BackendUnavailable(f"{provider.cache_id} is unavailable (trial request in progress)")
+        return 0
+
+    if retries is None:
+        retries = get_int_setting("COMMITGEN_MAX_RETRIES", REQUEST_MAX_RETRIES)
+
+    return max(0, retries)
+
+
+def _attempt(fn, deadline: float, hedge_after: float = None):
+    # Attempts run on daemon threads: a hung request cannot be interrupted,
+    # but it is abandoned at the deadline and never delays process exit.
+    results = queue.Queue()
+    started = time.monotonic()
+    launched = finished = 0
+
+    def launch():
+        nonlocal launched
+        launched += 1
+        threading.Thread(target=_run, args=(fn, results), name="commitgen-request", daemon=True).start()
+
+    launch()
+
+    while True:
+        now = time.monotonic()
+        remaining = started + deadline - now
+        if remaining <= 0:
+            raise AttemptTimeout(f"no response within {deadline:g}s")
+
+        hedging = hedge_after is not None and launched == 1
+        wait = min(remaining, max(0.0, started + hedge_after - now)) if hedging else remaining
+
+        try:
+            ok, value = results.get(timeout=wait)
+        except queue.Empty:
+            if hedging and time.monotonic() >= started + hedge_after:
+                metrics.record("hedged", 1, accumulate=True)
+                launch()
+            continue
+
+        if ok:
+            return value
+
+        finished += 1
+        if finished == launched:
+            raise value
+
+
+async def _aattempt(make_request, deadline: float, hedge_after: float = None):
+    import asyncio
+
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    running = {asyncio.ensure_future(make_request())}
+    launched = 1
+
+    try:
+        while True:
+            remaining = started + deadline - loop.time()
+            if remaining <= 0:
+                raise AttemptTimeout(f"no response within {deadline:g}s")
+
+            hedging = hedge_after is not None and launched == 1
+            wait = min(remaining, max(0.0, started + hedge_after - loop.time())) if hedging else remaining
+
+            done, running = await asyncio.wait(running, timeout=wait, return_when=asyncio.FIRST_COMPLETED)
+
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                if not running:
+                    raise task.exception()
+
+            if hedging and not done and loop.time() >= started + hedge_after:
+                metrics.record("hedged", 1, accumulate=True)
+                running.add(asyncio.ensure_future(make_request()))
+                launched += 1
+    finally:
+        for task in running:
+            task.cancel()
+
+
+def _run(fn, results):
+    try:
+        results.put((True, fn()))
+    except Exception as exc:
+        results.put((False, exc))
+
+
+def is_retryable(exc) -> bool:
+    """
+    Timeouts, dropped connections, rate limits and server errors are worth
+    another attempt; other errors (bad request, authentication) are not.
+    """
+    status = getattr(exc, "status_code", None)
+    if status is not None:
+        return status in (408, 409, 429) or status >= 500
+
+    if isinstance(exc, (TimeoutError, ConnectionError)):
+        return True
+
+    # openai's connection and timeout errors carry no status code.
+    return any(cls.__name__ in ("APIConnectionError", "APITimeoutError") for cls in type(exc).__mro__)
+
+
+def retry_delay(exc, attempt: int) -> float:
+    """
+    Delay before retry `attempt` (0-based) after `exc`: the server's
+    Retry-After hint when it sent one, and backoff() otherwise.
+    """
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None) or {}
+
+    try:
+        return max(0.0, float(headers.get("retry-after")))
+    except (TypeError, ValueError):
+        return backoff(attempt)
+
+
+def backoff(attempt: int) -> float:
+    """
+    Delay before retry `attempt` (0-based): exponential with full jitter, so
+    clients that failed together do not retry in lockstep.
+    """
+    base = get_float_setting("COMMITGEN_RETRY_BASE", REQUEST_RETRY_BASE_SECONDS)
+    return random.uniform(0, min(REQUEST_RETRY_MAX_SECONDS, base * 2 ** attempt))
+
+
+def hedge_threshold(provider) -> float:
+    """
+    Seconds after which a duplicate request is sent, or None. COMMITGEN_HEDGE
+    is "off" (the default), a number of milliseconds, or "p95" for the 95th
+    percentile of the model's logged latencies.
+    """
+    setting = get_setting("COMMITGEN_HEDGE", "off").lower()
+
+    if setting == "off":
+        return None
+
+    if setting == "p95":
+        latencies = [
+            entry["latency_ms"] for entry in routing.read_log()
+            if entry.get("model") == provider.model and "latency_ms" in entry
+        ]
+        if len(latencies) < HEDGE_MIN_SAMPLES:
+            return None
+        return routing.percentile(latencies, 95) / 1000
+
+    try:
+        return float(setting) / 1000
+    except ValueError:
+        return None
+
+
+def breaker_state(key: str) -> str:
+    """
+    "closed" while the backend is healthy, "open" after too many failures
+    in a row, and "half-open" once the cooldown has passed and a trial
+    request may go through.
+    """
+    entry = _load_breakers().get(key)
+    threshold = get_int_setting("COMMITGEN_BREAKER_THRESHOLD", BREAKER_THRESHOLD)
+
+    if not entry or entry.get("failures", 0) < threshold:
+        return "closed"
+
+    cooldown = get_float_setting("COMMITGEN_BREAKER_COOLDOWN", BREAKER_COOLDOWN_SECONDS)
+    if time.time() - entry.get("opened_at", 0) < cooldown:
+        return "open"
+
+    return "half-open"
+
+
+def claim_probe(key: str) -> bool:
+    """
+    Claim the single trial request of a half-open circuit by recording it
+    in the breaker file. Only one caller, across threads and processes,
+    gets True until the trial has been recorded as a success or failure;
+    a claim left by a caller that died lapses after the cooldown.
+    """
+    cooldown = get_float_setting("COMMITGEN_BREAKER_COOLDOWN", BREAKER_COOLDOWN_SECONDS)
+
+    with _locked() as locked:
+        if not locked:
+            return False
+
+        breakers = _load_breakers()
+        entry = breakers.get(key)
+        if entry is None:
+            # Closed by another caller's successful trial in the meantime.
+            return True
+
+        now = time.time()
+        if now - entry.get("probing_at", 0) < cooldown:
+            return False
+
+        entry["probing_at"] = now
+        _save_breakers(breakers)
+        return True
+
+
+def record_failure(key: str):
+    with _locked():
+        breakers = _load_breakers()
+        entry = breakers.setdefault(key, {"failures": 0})
+        entry["failures"] += 1
+        entry.pop("probing_at", None)
+
+        # Re-opened on every failure past the threshold, so a failed trial
+        # request starts a new cooldown.
+        if entry["failures"] >= get_int_setting("COMMITGEN_BREAKER_THRESHOLD", BREAKER_THRESHOLD):
+            entry["opened_at"] = time.time()
+
+        _save_breakers(breakers)
+
+
+def record_success(key: str):
+    with _locked():
+        breakers = _load_breakers()
+
+        # Healthy backends leave the file alone.
+        if breakers.pop(key, None) is not None:
+            _save_breakers(breakers)
+
+
+def reset_breakers():
+    """
+    Close every circuit.
+    """
+    BREAKER_FILE.unlink(missing_ok=True)
+
+
+@contextlib.contextmanager
+def _locked():
+    # Serializes read-modify-write cycles of the breaker file between
+    # threads and processes. Yields whether the file lock was taken; it is
+    # only held for a few milliseconds, so one older than a second is left
+    # over from a crash and removed.
+    lock = BREAKER_FILE.with_name(f"{BREAKER_FILE.name}.lock")
+
+    with _breaker_lock:
+        acquired = False
+        deadline = time.monotonic() + BREAKER_LOCK_TIMEOUT_SECONDS
+
+        while not acquired:
+            try:
+                lock.parent.mkdir(parents=True, exist_ok=True)
+                os.close(os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                acquired = True
+            except FileExistsError:
+                try:
+                    if time.time() - lock.stat().st_mtime > BREAKER_LOCK_TIMEOUT_SECONDS:
+                        lock.unlink(missing_ok=True)
+                        continue
+                except OSError:
+                    continue
+                if time.monotonic() >= deadline:
+                    break
+                time.sleep(0.005)
+            except OSError:
+                break
+
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                lock.unlink(missing_ok=True)
+
+
+def _load_breakers() -> dict:
+    try:
+        return json.loads(BREAKER_FILE.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_breakers(breakers: dict):
+    try:
+        BREAKER_FILE.parent.mkdir(parents=True, exist_ok=True)
+        temp = BREAKER_FILE.with_name(f"{BREAKER_FILE.name}.{os.getpid()}.tmp")
+        temp.write_text(json.dumps(breakers), encoding="utf-8")
+        os.replace(temp, BREAKER_FILE)
+    except OSError:
+        pass
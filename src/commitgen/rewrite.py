@@ -0,0 +1,235 @@
+import asyncio
+import hashlib
+import json
+import subprocess
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import commitgen.git_utils as git_utils
+from commitgen import compaction
+from commitgen.batch import create_client, generate_with_backoff
+from commitgen.config import CONFIG_DIR, get_int_setting
+from commitgen.constants import REWRITE_CONCURRENCY
+
+PROGRESS_DIR = CONFIG_DIR / "rewrite"
+
+
+class RewriteError(RuntimeError):
+    """
+    The range could not be read or the history could not be rewritten.
+    """
+
+
+@dataclass
+class RewriteEntry:
+    """
+    One commit in the range with its original subject and the message it
+    gets. `status` is "generated", "resumed" (from an earlier run),
+    "skipped" (merges and empty commits keep their message) or "failed".
+    """
+
+    commit: str
+    subject: str
+    message: str = ""
+    status: str = "pending"
+    error: str = ""
+
+
+@dataclass
+class RewriteResult:
+    entries: list = field(default_factory=list)
+    elapsed: float = 0.0
+    applied: int = 0
+
+    def count(self, status: str) -> int:
+        return sum(1 for entry in self.entries if entry.status == status)
+
+    @property
+    def commits_per_minute(self) -> float:
+        return len(self.entries) / self.elapsed * 60 if self.elapsed else 0.0
+
+    @property
+    def messages(self) -> dict:
+        return {entry.commit: entry.message for entry in self.entries if entry.status in ("generated", "resumed")}
+
+
+def parse_range(rev_range: str) -> tuple:
+    """
+    Split "base..tip" into (base, tip). A single revision means its whole
+    history, with no base.
+    """
+    if "..." in rev_range:
+        raise RewriteError("symmetric ranges (a...b) are not supported, use base..tip")
+
+    if ".." in rev_range:
+        base, tip = rev_range.split("..", 1)
+        return base or None, tip or "HEAD"
+
+    return None, rev_range or "HEAD"
+
+
+def progress_path(rev_range: str, cwd=None) -> Path:
+    """
+    Where generated messages for this range are recorded as they arrive.
+    Keyed on the repository, the range and its current tip, so an
+    interrupted run resumes while a changed branch starts over.
+    """
+    result = subprocess.run(
+        ["git", "-C", str(cwd or "."), "rev-parse", "--show-toplevel", parse_range(rev_range)[1]],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        text=True,
+    )
+    key = hashlib.sha256(f"{result.stdout}\0{rev_range}".encode("utf-8")).hexdigest()[:16]
+
+    return PROGRESS_DIR / f"{key}.jsonl"
+
+
+def load_progress(path: Path) -> dict:
+    messages = {}
+
+    try:
+        with path.open(encoding="utf-8") as handle:
+            for line in handle:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # A line cut short by an interrupted run.
+                    continue
+                messages[entry["commit"]] = entry["message"]
+    except OSError:
+        pass
+
+    return messages
+
+
+def generate(rev_range: str, cwd=None, concurrency: int = None, use_cache: bool = True, on_progress=None) -> RewriteResult:
+    """
+    Generate a new message for every non-merge commit in `rev_range`. The
+    patches come from one streamed `git log -p`, requests run concurrently
+    with at most `concurrency` in flight (which also bounds how many patches
+    are held in memory), and each result is appended to the progress file
+    so an interrupted run picks up where it stopped.
+    """
+    if concurrency is None:
+        concurrency = get_int_setting("COMMITGEN_REWRITE_CONCURRENCY", REWRITE_CONCURRENCY)
+
+    path = progress_path(rev_range, cwd)
+    done = load_progress(path)
+    started = time.perf_counter()
+
+    result = RewriteResult()
+    stats = {}
+    commits = git_utils.iter_log_diffs(rev_range, cwd=cwd, stats=stats)
+
+    asyncio.run(_generate_all(commits, result, done, path, max(1, concurrency), use_cache, on_progress))
+
+    if stats["error"]:
+        raise RewriteError(stats["error"])
+
+    result.elapsed = time.perf_counter() - started
+    return result
+
+
+async def _generate_all(commits, result, done, path, concurrency, use_cache, on_progress):
+    client = create_client()
+    semaphore = asyncio.Semaphore(concurrency)
+    tasks = []
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    try:
+        with path.open("a", encoding="utf-8") as progress:
+            while True:
+                # Acquired before reading the next patch, so at most
+                # `concurrency` patches are in memory at once.
+                await semaphore.acquire()
+                commit = await asyncio.to_thread(next, commits, None)
+
+                if commit is None:
+                    semaphore.release()
+                    break
+
+                entry = RewriteEntry(commit.sha, commit.subject)
+                result.entries.append(entry)
+                tasks.append(asyncio.create_task(
+                    _generate_one(client, semaphore, commit, entry, done, progress, use_cache, on_progress)
+                ))
+
+            await asyncio.gather(*tasks)
+    finally:
+        commits.close()
+        if client is not None:
+            await client.close()
+
+
+async def _generate_one(client, semaphore, commit, entry, done, progress, use_cache, on_progress):
+    try:
+        if commit.sha in done:
+            entry.message, entry.status = done[commit.sha], "resumed"
+        elif commit.is_merge or not commit.diff.strip():
+            entry.message, entry.status = commit.subject, "skipped"
+        else:
+            diff_text = compaction.compact_diff(commit.diff).text
+            message = (await generate_with_backoff(client, diff_text, use_cache)).strip()
+
+            if not message:
+                raise RewriteError("empty response")
+
+            entry.message, entry.status = message, "generated"
+            # Written from the event loop thread only, so lines never interleave.
+            progress.write(json.dumps({"commit": commit.sha, "message": message}) + "\n")
+            progress.flush()
+    except Exception as exc:
+        entry.status, entry.error = "failed", str(exc)
+    finally:
+        semaphore.release()
+        if on_progress is not None:
+            on_progress(entry)
+
+
+def write_mapping(path, result: RewriteResult):
+    """
+    Write the old -> new message mapping as JSON lines, for --dry-run.
+    """
+    path = Path(path).expanduser()
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    with path.open("w", encoding="utf-8") as handle:
+        for entry in result.entries:
+            handle.write(json.dumps({
+                "commit": entry.commit,
+                "original": entry.subject,
+                "message": entry.message,
+                "status": entry.status,
+            }) + "\n")
+
+
+def apply(rev_range: str, result: RewriteResult, cwd=None) -> int:
+    """
+    Rewrite the branch at the tip of `rev_range` with the generated messages
+    in one non-interactive pass, then drop the progress file. Returns the
+    number of commits rewritten.
+    """
+    base, tip = parse_range(rev_range)
+    ref = git_utils.resolve_branch(tip, cwd)
+
+    if not ref:
+        raise RewriteError(f"{tip} is not a local branch; rewrite needs a branch to update")
+
+    revisions = f"{base}..{ref}" if base else ref
+    # Keyed on the current tip, so it has to be found before the rewrite moves it.
+    progress = progress_path(rev_range, cwd)
+
+    try:
+        rewritten = git_utils.rewrite_messages(revisions, result.messages, cwd)
+    except subprocess.CalledProcessError as exc:
+        raise RewriteError(exc.stderr.strip() or f"git {exc.cmd[0]} failed") from exc
+    except OSError as exc:
+        raise RewriteError(str(exc)) from exc
+
+    progress.unlink(missing_ok=True)
+    result.applied = rewritten
+
+    return rewritten
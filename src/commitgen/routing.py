@@ -0,0 +1,197 @@
+import json
+import statistics
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+
+from commitgen import compaction
+from commitgen.config import CONFIG_DIR, get_int_setting, get_setting
+from commitgen.constants import ROUTING_LOG_MAX_ENTRIES, ROUTING_RULES
+from commitgen.diffparse import split_file_diffs
+from commitgen.heuristics import classify_file
+
+POLICY_FILE = CONFIG_DIR / "routing.json"
+LOG_FILE = CONFIG_DIR / "routing.jsonl"
+
+# "local" answers with the heuristic engine and never calls a model.
+TIERS = ("local", "fast", "large")
+
+_log_lock = threading.Lock()
+
+
+@dataclass
+class Decision:
+    """
+    The tier and model chosen for one diff, with the measurements the
+    choice was based on.
+    """
+
+    tier: str
+    model: str = ""
+    tokens: int = 0
+    files: int = 0
+    types: list = field(default_factory=list)
+    rule: int = -1
+
+
+def load_policy() -> dict:
+    """
+    Return the routing policy: an ordered list of rules, the model for each
+    tier and optional latency targets. Read from COMMITGEN_ROUTING_POLICY
+    (or ~/.config/commitgen/routing.json) when present; missing parts fall
+    back to the defaults.
+    """
+    path = Path(get_setting("COMMITGEN_ROUTING_POLICY", str(POLICY_FILE))).expanduser()
+
+    try:
+        configured = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        configured = {}
+
+    return {
+        "rules": configured.get("rules") or [dict(rule) for rule in ROUTING_RULES],
+        "models": configured.get("models") or {},
+        "targets": configured.get("targets") or {},
+    }
+
+
+def measure(diff_text: str) -> tuple:
+    """
+    Return the estimated token count, the number of files and the sorted
+    change types (as classified by the heuristics) of a diff.
+    """
+    types = set()
+    files = 0
+
+    for file_diff in split_file_diffs(diff_text):
+        if not file_diff.path:
+            continue
+        files += 1
+        types.add(classify_file(file_diff)[0])
+
+    return compaction.estimate_tokens(diff_text), files, sorted(types)
+
+
+def choose(diff_text: str, provider, policy: dict = None) -> Decision:
+    """
+    Pick the tier for a diff from the first policy rule it satisfies. A rule
+    may set `max_tokens`, `max_files` and `types` (the diff's change types
+    must all be among them); unset limits always match.
+    """
+    if policy is None:
+        policy = load_policy()
+
+    tokens, files, types = measure(diff_text)
+    decision = Decision("fast", tokens=tokens, files=files, types=types)
+
+    for index, rule in enumerate(policy["rules"]):
+        if _matches(rule, tokens, files, types) and rule.get("tier") in TIERS:
+            decision.tier, decision.rule = rule["tier"], index
+            break
+
+    decision.model = "" if decision.tier == "local" else _model(decision.tier, provider, policy)
+    return decision
+
+
+def _matches(rule: dict, tokens: int, files: int, types: list) -> bool:
+    if "max_tokens" in rule and tokens > rule["max_tokens"]:
+        return False
+    if "max_files" in rule and files > rule["max_files"]:
+        return False
+    if "types" in rule and not set(types) <= set(rule["types"]):
+        return False
+    return True
+
+
+def _model(tier: str, provider, policy: dict) -> str:
+    # Tiers without a model of their own keep the configured one, so routing
+    # never switches models unless the policy or settings ask for it.
+    return policy["models"].get(tier) or get_setting(f"COMMITGEN_MODEL_{tier.upper()}") or provider.model
+
+
+def record(decision: Decision, latency_ms: float):
+    """
+    Append a routing decision and the observed generation latency to the
+    routing log, keeping only the most recent entries.
+    """
+    entry = {"timestamp": time.time(), **asdict(decision), "latency_ms": round(latency_ms, 2)}
+
+    with _log_lock:
+        try:
+            LOG_FILE.parent.mkdir(parents=True, exist_ok=True)
+            with LOG_FILE.open("a", encoding="utf-8") as handle:
+                handle.write(json.dumps(entry) + "\n")
+
+            _trim_log()
+        except OSError:
+            pass
+
+
+def _trim_log():
+    limit = get_int_setting("COMMITGEN_ROUTING_LOG_MAX_ENTRIES", ROUTING_LOG_MAX_ENTRIES)
+
+    # Only rewrite once the log has grown well past the limit, so most
+    # appends stay a single write.
+    if LOG_FILE.stat().st_size < limit * 256:
+        return
+
+    lines = LOG_FILE.read_text(encoding="utf-8").splitlines(keepends=True)
+    if len(lines) > 2 * limit:
+        LOG_FILE.write_text("".join(lines[-limit:]), encoding="utf-8")
+
+
+def read_log() -> list:
+    try:
+        lines = LOG_FILE.read_text(encoding="utf-8").splitlines()
+    except OSError:
+        return []
+
+    entries = []
+    for line in lines:
+        try:
+            entries.append(json.loads(line))
+        except ValueError:
+            continue
+
+    return entries
+
+
+def summarize(entries: list, targets: dict = None) -> list:
+    """
+    Per tier and model: request count, p50 and p95 latency, and whether
+    they meet the policy's `p50_ms` / `p95_ms` targets for that tier.
+    """
+    targets = targets or {}
+    groups = {}
+
+    for entry in entries:
+        groups.setdefault((entry.get("tier", ""), entry.get("model", "")), []).append(entry.get("latency_ms", 0.0))
+
+    rows = []
+    for (tier, model), latencies in sorted(groups.items()):
+        p50, p95 = percentile(latencies, 50), percentile(latencies, 95)
+        target = targets.get(tier, {})
+
+        rows.append({
+            "tier": tier,
+            "model": model,
+            "count": len(latencies),
+            "p50_ms": round(p50, 1),
+            "p95_ms": round(p95, 1),
+            "p50_ok": p50 <= target["p50_ms"] if "p50_ms" in target else None,
+            "p95_ok": p95 <= target["p95_ms"] if "p95_ms" in target else None,
+        })
+
+    return rows
+
+
+def percentile(values: list, pct: float) -> float:
+    if not values:
+        return 0.0
+    if len(values) == 1:
+        return float(values[0])
+
+    # "inclusive" interpolates between the observed values, so p95 of a
+    # small sample never exceeds its maximum.
+    return statistics.quantiles(values, n=100, method="inclusive")[int(pct) - 1]
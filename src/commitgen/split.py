@@ -0,0 +1,227 @@
+import dataclasses
+import os
+import posixpath
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+import commitgen.git_utils as git_utils
+from commitgen import compaction, heuristics
+from commitgen.config import get_int_setting
+from commitgen.constants import SPLIT_CONCURRENCY, SPLIT_MAX_COMMITS
+from commitgen.diffparse import split_file_diffs
+from commitgen.hooks import GUARD_ENV
+
+# Leading directories that count as the same place in the tree.
+SCOPE_DEPTH = 2
+
+
+class SplitError(RuntimeError):
+    """
+    The staged changes could not be split into commits.
+    """
+
+
+@dataclass
+class Group:
+    """
+    Staged changes that become one commit: whole files and, for edits that
+    mix fixes and new behaviour, single hunks of a file.
+    """
+
+    change_type: str
+    scope: str
+    # FileDiffs holding only the hunks that belong to this group.
+    pieces: list = field(default_factory=list)
+    message: str = ""
+
+    @property
+    def paths(self) -> list:
+        return list(dict.fromkeys(piece.path for piece in self.pieces))
+
+    @property
+    def added(self) -> int:
+        return sum(piece.added for piece in self.pieces)
+
+    @property
+    def removed(self) -> int:
+        return sum(piece.removed for piece in self.pieces)
+
+    def patch(self) -> str:
+        """
+        The group's changes as a patch that `git apply --cached` accepts on
+        top of any of the other groups.
+        """
+        return "".join(piece.text() for piece in self.pieces)
+
+
+def read_staged_diff(cwd=None) -> str:
+    """
+    The complete staged diff, binary changes included, so every group can
+    be applied back to the index. Unlike git_utils.read_staged_diff nothing
+    is dropped or truncated.
+    """
+    result = subprocess.run(
+        git_utils._git(["diff", "--staged", "--binary", "--no-color", "--no-ext-diff"], cwd),
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        encoding="utf-8",
+        errors="surrogateescape",
+    )
+
+    if result.returncode != 0:
+        raise SplitError(result.stderr.strip() or "git diff failed")
+
+    return result.stdout
+
+
+def plan(diff_text: str, max_commits: int = None) -> list:
+    """
+    Cluster a staged diff into groups by change type and path locality,
+    parsing and classifying it once. Edits to existing code are classified
+    hunk by hunk, so a fix and a feature in the same file land in separate
+    commits; everything else moves as a whole file. Groups come out in the
+    heuristics' type order, at most `max_commits` (COMMITGEN_SPLIT_MAX_COMMITS)
+    of them.
+    """
+    if max_commits is None:
+        max_commits = get_int_setting("COMMITGEN_SPLIT_MAX_COMMITS", SPLIT_MAX_COMMITS)
+
+    groups = {}
+
+    for file_diff in split_file_diffs(diff_text):
+        if not file_diff.path:
+            continue
+
+        scope = _scope(file_diff.path)
+        change_type, action = heuristics.classify_file(file_diff)
+
+        if action != "update" or change_type not in ("FEAT", "FIX") or len(file_diff.hunks) < 2:
+            _add(groups, change_type, scope, file_diff)
+            continue
+
+        by_type = {}
+        for hunk in file_diff.hunks:
+            added, removed = _count(hunk)
+            by_type.setdefault(heuristics.classify_edit(added, removed), []).append(hunk)
+
+        for hunk_type, hunks in by_type.items():
+            added, removed = map(sum, zip(*(_count(hunk) for hunk in hunks)))
+            _add(groups, hunk_type, scope, dataclasses.replace(file_diff, hunks=hunks, added=added, removed=removed))
+
+    ordered = sorted(groups.values(), key=lambda group: (heuristics.TYPE_ORDER.index(group.change_type), group.scope))
+    return _limit(ordered, max(1, max_commits))
+
+
+def generate_messages(groups: list, context: str = "", use_cache: bool = True, offline: bool = False,
+                      concurrency: int = None) -> list:
+    """
+    Fill in every group's message, requesting them concurrently. Each
+    request sees only its group's compacted patch and is told which change
+    type it covers. A group whose request fails gets the heuristic message.
+    """
+    if concurrency is None:
+        concurrency = get_int_setting("COMMITGEN_SPLIT_CONCURRENCY", SPLIT_CONCURRENCY)
+
+    def generate(group):
+        if offline:
+            return heuristics.generate_heuristic_message(group.patch(), context)
+
+        diff_text = compaction.compact_diff(group.patch()).text
+
+        # Imported here: a plan or an offline split never talks to the model.
+        from commitgen import ai
+
+        hint = f"This is the [{group.change_type}] part of a larger change that is committed separately."
+        try:
+            return ai.generate_commit_message(diff_text, f"{context}\n{hint}".strip(), use_cache=use_cache)
+        except Exception:
+            return heuristics.generate_heuristic_message(group.patch(), context)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(groups) or 1))) as pool:
+        for group, message in zip(groups, pool.map(generate, groups)):
+            group.message = message.strip() or heuristics.generate_heuristic_message(group.patch(), context)
+
+    return groups
+
+
+def commit(groups: list, cwd=None) -> list:
+    """
+    Create one commit per group, in order: the index is reset to HEAD and
+    each group's patch is staged with `git apply --cached` and committed.
+    The working tree is never touched. If a step fails, the index is put
+    back to the original staged state, so whatever was not committed is
+    still staged. Returns the new commit hashes.
+    """
+    env = {**os.environ, GUARD_ENV: "1"}
+    staged_tree = _git(["write-tree"], cwd, env)
+    has_head = bool(_git(["rev-parse", "-q", "--verify", "HEAD"], cwd, env, check=False))
+    created = []
+
+    try:
+        _git(["read-tree", "HEAD"] if has_head else ["read-tree", "--empty"], cwd, env)
+
+        for group in groups:
+            _git(["apply", "--cached", "--whitespace=nowarn", "-"], cwd, env, patch=group.patch())
+            _git(["commit", "-q", "--no-edit", "-m", group.message], cwd, env)
+            created.append(_git(["rev-parse", "HEAD"], cwd, env))
+    except SplitError as exc:
+        _git(["read-tree", staged_tree], cwd, env, check=False)
+        raise SplitError(f"{exc} ({len(created)} of {len(groups)} commits created; the rest is still staged)") from exc
+
+    if _git(["write-tree"], cwd, env) != staged_tree:
+        _git(["read-tree", staged_tree], cwd, env, check=False)
+        raise SplitError("the commits do not add up to the staged changes; the difference is still staged")
+
+    return created
+
+
+def _add(groups: dict, change_type: str, scope: str, piece):
+    group = groups.setdefault((change_type, scope), Group(change_type, scope))
+    group.pieces.append(piece)
+
+
+def _limit(groups: list, max_commits: int) -> list:
+    # Over the limit, scopes of the same type are merged first, then the
+    # smallest groups are folded into the one before them.
+    if len(groups) > max_commits:
+        merged = {}
+        for group in groups:
+            target = merged.setdefault(group.change_type, Group(group.change_type, ""))
+            target.pieces.extend(group.pieces)
+        groups = list(merged.values())
+
+    while len(groups) > max_commits:
+        smallest = min(range(1, len(groups)), key=lambda i: groups[i].added + groups[i].removed)
+        groups[smallest - 1].pieces.extend(groups.pop(smallest).pieces)
+
+    return groups
+
+
+def _scope(path: str) -> str:
+    return "/".join(posixpath.dirname(path).split("/")[:SCOPE_DEPTH])
+
+
+def _count(hunk: list) -> tuple:
+    added = sum(1 for line in hunk[1:] if line.startswith("+"))
+    removed = sum(1 for line in hunk[1:] if line.startswith("-"))
+    return added, removed
+
+
+def _git(args: list, cwd=None, env: dict = None, check: bool = True, patch: str = None) -> str:
+    result = subprocess.run(
+        git_utils._git(args, cwd),
+        input=patch,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        encoding="utf-8",
+        errors="surrogateescape",
+        env=env,
+    )
+
+    if check and result.returncode != 0:
+        raise SplitError(result.stderr.strip() or f"git {args[0]} failed")
+
+    return result.stdout.strip()
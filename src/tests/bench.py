@@ -0,0 +1,289 @@
+import argparse
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from unittest.mock import patch
+from typer.testing import CliRunner
+from commitgen import ai, cache, digests, resilience, routing
+from commitgen.cli import app
+from tests.fake_openai import FakeOpenAIServer
+
+IDENTITY = {"GIT_AUTHOR_NAME": "Bench", "GIT_AUTHOR_EMAIL": "bench@example.com",
+            "GIT_COMMITTER_NAME": "Bench", "GIT_COMMITTER_EMAIL": "bench@example.com"}
+
+# Metrics compared between revisions; lower is better for all of them.
+METRICS = ("wall_ms", "subprocesses", "peak_rss_kb", "prompt_bytes", "requests")
+
+
+@dataclass
+class Scenario:
+    """
+    A throwaway repository with `files` tracked files of `lines` lines each,
+    every line of which is then changed: `lines` * `files` changed lines.
+    """
+
+    name: str
+    files: int
+    lines: int
+
+
+SCENARIOS = {
+    "small": Scenario("small", files=1, lines=10),
+    "medium": Scenario("medium", files=20, lines=200),
+    "large": Scenario("large", files=100, lines=1000),
+}
+
+
+def build_repo(root: Path, scenario: Scenario):
+    """
+    Commit the files, then rewrite every line so the working tree holds the
+    scenario's diff, unstaged.
+    """
+    env = {**os.environ, **IDENTITY}
+    subprocess.run(["git", "init", "-q", str(root)], check=True, env=env)
+
+    for i in range(scenario.files):
+        path = root / "pkg" / f"module_{i}.py"
+        path.parent.mkdir(exist_ok=True)
+        path.write_text("".join(f"value_{j} = {j}\n" for j in range(scenario.lines)))
+
+    subprocess.run(["git", "-C", str(root), "add", "-A"], check=True, env=env)
+    subprocess.run(["git", "-C", str(root), "commit", "-qm", "initial"], check=True, env=env)
+
+    for i in range(scenario.files):
+        path = root / "pkg" / f"module_{i}.py"
+        path.write_text("".join(f"renamed_{j} = {j} + {i}\n" for j in range(scenario.lines)))
+
+
+@contextmanager
+def count_subprocesses():
+    """
+    Count every process started through `subprocess` while active.
+    """
+    counter = {"count": 0}
+    original = subprocess.Popen.__init__
+
+    def init(self, *args, **kwargs):
+        counter["count"] += 1
+        original(self, *args, **kwargs)
+
+    with patch.object(subprocess.Popen, "__init__", init):
+        yield counter
+
+
+@contextmanager
+def isolated(workdir: Path):
+    """
+    Keep the cache, indexes and logs of a run inside `workdir`, so runs
+    start cold and never touch the user's config directory.
+    """
+    targets = (
+        (cache, "CACHE_DIR", workdir / "cache"),
+        (digests, "INDEX_FILE", workdir / "digests.json"),
+        (routing, "LOG_FILE", workdir / "routing.jsonl"),
+        (routing, "POLICY_FILE", workdir / "routing.json"),
+        (resilience, "BREAKER_FILE", workdir / "breaker.json"),
+    )
+
+    with patch.dict(os.environ, IDENTITY):
+        patchers = [patch.object(module, name, value) for module, name, value in targets]
+        for patcher in patchers:
+            patcher.start()
+        try:
+            yield
+        finally:
+            for patcher in reversed(patchers):
+                patcher.stop()
+
+
+def run_scenario(scenario: Scenario, latency: float = 0.0) -> dict:
+    """
+    Build the scenario's repository and run `commitgen commit --auto`
+    against a fake OpenAI-compatible server in this process. Returns the
+    measurements of the run.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = Path(tmp)
+        root = workdir / "repo"
+        build_repo(root, scenario)
+        metrics_file = workdir / "metrics.jsonl"
+
+        env = {"COMMITGEN_PROVIDER": "compatible", "COMMITGEN_MODEL": "bench", "COMMITGEN_DAEMON": "off"}
+
+        with FakeOpenAIServer(reply="[REFACTOR]: rename module values", latency=latency) as server, \
+                isolated(workdir), patch.dict(os.environ, {**env, "COMMITGEN_BASE_URL": server.base_url}):
+            ai.reset_client()
+            cwd = os.getcwd()
+            os.chdir(root)
+
+            try:
+                with count_subprocesses() as processes:
+                    started = time.perf_counter()
+                    result = CliRunner().invoke(
+                        app, ["commit", "--auto", "--no-cache", "--no-daemon", "--metrics-file", str(metrics_file)]
+                    )
+                    wall_ms = (time.perf_counter() - started) * 1000
+            finally:
+                os.chdir(cwd)
+                ai.reset_client()
+
+        if result.exit_code != 0:
+            raise RuntimeError(f"commit --auto failed in {scenario.name}: {result.output}")
+
+        run = json.loads(metrics_file.read_text().splitlines()[-1])
+        subject = subprocess.run(
+            ["git", "-C", str(root), "log", "-1", "--format=%s"], stdout=subprocess.PIPE, text=True
+        ).stdout.strip()
+
+    return {
+        **asdict(scenario),
+        "wall_ms": round(wall_ms, 2),
+        "subprocesses": processes["count"],
+        "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "prompt_bytes": sum(len(json.dumps(body).encode("utf-8")) for _, body in server.requests),
+        "requests": len(server.requests),
+        "diff_bytes": run.get("diff_bytes", 0),
+        "prompt_tokens": run.get("prompt_tokens", 0),
+        "stages_ms": {name: stage["total_ms"] for name, stage in run.get("stages", {}).items()},
+        "subject": subject,
+    }
+
+
+def run_isolated(scenario: Scenario, latency: float) -> dict:
+    """
+    Run one scenario in a fresh interpreter, so peak RSS belongs to that
+    scenario alone.
+    """
+    with tempfile.TemporaryDirectory() as home:
+        # A fresh HOME also keeps the user's config.env out of the run.
+        result = subprocess.run(
+            [sys.executable, "-m", "tests.bench", "--child", json.dumps([asdict(scenario), latency])],
+            cwd=Path(__file__).resolve().parents[1],
+            env={**os.environ, "HOME": home},
+            stdout=subprocess.PIPE,
+            text=True,
+            check=True,
+        )
+    # git commit prints to the same stdout; the result is the last line.
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def run(scenarios: list, latency: float = 0.0, repeat: int = 1, in_process: bool = False) -> dict:
+    """
+    Run every scenario `repeat` times and return the results document:
+    the median of each metric per scenario, plus the environment.
+    """
+    report = {
+        "revision": _revision(),
+        "python": platform.python_version(),
+        "latency_s": latency,
+        "isolated": not in_process,
+        "scenarios": {},
+    }
+
+    for scenario in scenarios:
+        runs = [(run_scenario if in_process else run_isolated)(scenario, latency) for _ in range(repeat)]
+        summary = dict(runs[0])
+        for name in METRICS:
+            summary[name] = statistics.median(run[name] for run in runs)
+        summary["wall_ms_runs"] = [run["wall_ms"] for run in runs]
+        report["scenarios"][scenario.name] = summary
+
+    return report
+
+
+def compare(old: dict, new: dict, threshold: float = 0.1) -> list:
+    """
+    Compare two results documents. Returns one row per scenario and metric
+    present in both, flagged as a regression when it grew by more than
+    `threshold` (a fraction).
+    """
+    rows = []
+
+    for name, scenario in new["scenarios"].items():
+        before = old["scenarios"].get(name)
+        if before is None:
+            continue
+
+        for metric in METRICS:
+            if metric not in scenario or metric not in before:
+                continue
+            change = (scenario[metric] - before[metric]) / before[metric] if before[metric] else 0.0
+            rows.append({
+                "scenario": name,
+                "metric": metric,
+                "old": before[metric],
+                "new": scenario[metric],
+                "change": round(change, 4),
+                "regression": change > threshold,
+            })
+
+    return rows
+
+
+def _revision() -> str:
+    result = subprocess.run(
+        ["git", "-C", str(Path(__file__).resolve().parent), "rev-parse", "--short", "HEAD"],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        text=True,
+    )
+    return result.stdout.strip()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m tests.bench",
+        description="Benchmark `commitgen commit --auto` on synthetic repositories against a fake model server.",
+    )
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS), help="Scenario to run (repeatable)")
+    parser.add_argument("--files", type=int, help="Run a custom scenario with this many files")
+    parser.add_argument("--lines", type=int, default=100, help="Changed lines per file in the custom scenario")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds the fake server waits per request")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per scenario; medians are reported")
+    parser.add_argument("--in-process", action="store_true", help="Run in this interpreter (peak RSS is shared)")
+    parser.add_argument("--out", help="Write the results as JSON to this file")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="Compare two results files")
+    parser.add_argument("--threshold", type=float, default=0.1, help="Growth that counts as a regression")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        scenario, latency = json.loads(args.child)
+        print(json.dumps(run_scenario(Scenario(**scenario), latency)))
+        return 0
+
+    if args.compare:
+        old, new = (json.loads(Path(path).read_text()) for path in args.compare)
+        rows = compare(old, new, args.threshold)
+        for row in rows:
+            flag = "  REGRESSION" if row["regression"] else ""
+            print(f"{row['scenario']:<10} {row['metric']:<14} {row['old']:>12} -> {row['new']:>12} "
+                  f"({row['change']:+.1%}){flag}")
+        return 1 if any(row["regression"] for row in rows) else 0
+
+    scenarios = [SCENARIOS[name] for name in args.scenario or ()]
+    if args.files:
+        scenarios.append(Scenario("custom", args.files, args.lines))
+
+    report = run(scenarios or [SCENARIOS["small"]], args.latency, max(1, args.repeat), args.in_process)
+    output = json.dumps(report, indent=2)
+
+    if args.out:
+        Path(args.out).write_text(output + "\n")
+    print(output)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,162 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeOpenAIServer:
+    """
+    Local stand-in for an OpenAI-compatible API. Serves the Responses API
+    (`/v1/responses`) and chat completions (`/v1/chat/completions`), both
+    blocking and streamed, with a configurable reply and latency.
+
+    Faults are injected per request: `delays` and `errors` are consumed one
+    entry per request (a latency in seconds, an HTTP status or None), and
+    requests past their end use `latency` and succeed.
+
+    Use as a context manager; `base_url` points the clients at it.
+    """
+
+    def __init__(self, reply: str = "[FEAT]: add login", latency: float = 0.0, delays: list = None,
+                 errors: list = None):
+        self.reply = reply
+        self.latency = latency
+        self.delays = list(delays or [])
+        self.errors = list(errors or [])
+        self.requests = []
+        self._lock = threading.Lock()
+        # Ends injected delays on exit, so a request the client abandoned
+        # does not keep its handler thread asleep for the rest of the run.
+        self._stopped = threading.Event()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stopped.set()
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _record(self, path: str, body: dict) -> tuple:
+        with self._lock:
+            self.requests.append((path, body))
+            delay = self.delays.pop(0) if self.delays else self.latency
+            error = self.errors.pop(0) if self.errors else None
+
+        return delay, error
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                delay, error = server._record(self.path, body)
+
+                if delay:
+                    server._stopped.wait(delay)
+
+                if error:
+                    self._send_json(error, {"error": {"message": f"injected {error}", "type": "server_error"}})
+                    return
+
+                if self.path.endswith("/responses"):
+                    events = _response_events(server.reply, body.get("model", ""))
+                elif self.path.endswith("/chat/completions"):
+                    events = _chat_events(server.reply, body.get("model", ""), body.get("n", 1))
+                else:
+                    self._send_json(404, {"error": {"message": f"unknown path {self.path}"}})
+                    return
+
+                if body.get("stream"):
+                    self._send_stream(events["stream"])
+                else:
+                    self._send_json(200, events["body"])
+
+            def _send_json(self, status, payload):
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _send_stream(self, events):
+                data = "".join(f"data: {json.dumps(event)}\n\n" for event in events) + "data: [DONE]\n\n"
+                data = data.encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        return Handler
+
+
+def _words(text: str) -> list:
+    words = text.split(" ")
+    return [word if i == len(words) - 1 else word + " " for i, word in enumerate(words)]
+
+
+def _response_events(reply: str, model: str) -> dict:
+    message = {
+        "id": "msg_fake",
+        "type": "message",
+        "role": "assistant",
+        "status": "completed",
+        "content": [{"type": "output_text", "text": reply, "annotations": []}],
+    }
+    response = {
+        "id": "resp_fake",
+        "object": "response",
+        "created_at": int(time.time()),
+        "model": model,
+        "status": "completed",
+        "output": [message],
+        "parallel_tool_calls": False,
+        "tool_choice": "auto",
+        "tools": [],
+    }
+    deltas = [
+        {"type": "response.output_text.delta", "item_id": "msg_fake", "output_index": 0,
+         "content_index": 0, "delta": word, "sequence_number": i, "logprobs": []}
+        for i, word in enumerate(_words(reply), 1)
+    ]
+    completed = {"type": "response.completed", "response": response, "sequence_number": len(deltas) + 1}
+
+    return {"body": response, "stream": deltas + [completed]}
+
+
+def _chat_events(reply: str, model: str, n: int = 1) -> dict:
+    created = int(time.time())
+    body = {
+        "id": "chatcmpl_fake",
+        "object": "chat.completion",
+        "created": created,
+        "model": model,
+        "choices": [
+            {"index": i, "message": {"role": "assistant", "content": reply}, "finish_reason": "stop"} for i in range(n)
+        ],
+    }
+    chunks = [
+        {"id": "chatcmpl_fake", "object": "chat.completion.chunk", "created": created, "model": model,
+         "choices": [{"index": 0, "delta": {"content": word}, "finish_reason": None}]}
+        for word in _words(reply)
+    ]
+
+    return {"body": body, "stream": chunks}
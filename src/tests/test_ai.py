@@ -1,9 +1,29 @@
+import tempfile
 import unittest
+from pathlib import Path
 from unittest.mock import patch, MagicMock
-from commitgen import ai
+from commitgen import ai, cache, metrics
+
+
+def make_stream(*deltas):
+    events = [MagicMock(type="response.output_text.delta", delta=d) for d in deltas]
+    events.append(MagicMock(type="response.completed"))
+    stream = MagicMock()
+    stream.__iter__.return_value = iter(events)
+    return stream
 
 class TestAI(unittest.TestCase):
 
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        for target, path in (("commitgen.cache.CACHE_DIR", ""), ("commitgen.routing.LOG_FILE", "routing.jsonl")):
+            patcher = patch(target, Path(self.tmp.name) / path)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.addCleanup(self.tmp.cleanup)
+        ai.reset_client()
+        self.addCleanup(ai.reset_client)
+
     def test_build_prompt_without_context(self):
         diff = "diff --git a/file b/file"
         prompt = ai._build_prompt(diff, "")
@@ -19,7 +39,7 @@ class TestAI(unittest.TestCase):
         self.assertIn(context, prompt)
 
     @patch("commitgen.ai.ensure_api_key", return_value="fake-key")
-    @patch("commitgen.ai.OpenAI")
+    @patch("openai.OpenAI")
     def test_generate_commit_message(self, mock_openai, _):
         mock_client = MagicMock()
         mock_response = MagicMock()
@@ -30,6 +50,31 @@ class TestAI(unittest.TestCase):
         msg = ai.generate_commit_message("diff", "")
         self.assertEqual(msg, "[FEAT]: add login")
 
+    @patch("commitgen.ai.ensure_api_key", return_value="fake-key")
+    @patch("openai.OpenAI")
+    def test_generate_commit_message_reuses_cached_response(self, mock_openai, _):
+        mock_client = MagicMock()
+        mock_client.responses.create.return_value.output_text = "[FEAT]: add login"
+        mock_openai.return_value = mock_client
+
+        first = ai.generate_commit_message("diff", "")
+        second = ai.generate_commit_message("diff", "")
+
+        self.assertEqual(first, second)
+        mock_client.responses.create.assert_called_once()
+
+    @patch("commitgen.ai.ensure_api_key", return_value="fake-key")
+    @patch("openai.OpenAI")
+    def test_generate_commit_message_without_cache(self, mock_openai, _):
+        mock_client = MagicMock()
+        mock_client.responses.create.return_value.output_text = "[FEAT]: add login"
+        mock_openai.return_value = mock_client
+
+        ai.generate_commit_message("diff", "", use_cache=False)
+        ai.generate_commit_message("diff", "", use_cache=False)
+
+        self.assertEqual(mock_client.responses.create.call_count, 2)
+
     def test_generate_commit_message_empty_diff(self):
         msg = ai.generate_commit_message("", "")
         self.assertEqual(msg, "chore: no changes detected")
@@ -43,7 +88,7 @@ class TestAI(unittest.TestCase):
         self.assertIn("Context: extra context", msg)
 
     @patch("commitgen.ai.ensure_api_key", return_value="fake-key")
-    @patch("commitgen.ai.OpenAI")
+    @patch("openai.OpenAI")
     def test_refine_commit_message_preserves_structure(self, mock_openai, _):
         mock_client = MagicMock()
         mock_response = MagicMock()
@@ -53,3 +98,119 @@ class TestAI(unittest.TestCase):
 
         msg = ai.refine_commit_message("[FEAT]: add login", "fix bug")
         self.assertEqual(msg, "[FEAT]: refined message")
+
+    @patch("commitgen.ai.ensure_api_key", return_value="fake-key")
+    @patch("openai.OpenAI")
+    def test_stream_commit_message_yields_deltas_and_caches(self, mock_openai, _):
+        stream = make_stream("[FEAT]: ", "add ", "login")
+        mock_openai.return_value.responses.create.return_value = stream
+
+        chunks = list(ai.stream_commit_message("diff", ""))
+
+        self.assertEqual(chunks, ["[FEAT]: ", "add ", "login"])
+        self.assertTrue(mock_openai.return_value.responses.create.call_args.kwargs["stream"])
+        stream.close.assert_called_once()
+        self.assertEqual(cache.get(cache.make_key("diff", "", ai.DEFAULT_MODEL)), "[FEAT]: add login")
+
+    @patch("commitgen.ai.ensure_api_key", return_value="fake-key")
+    @patch("openai.OpenAI")
+    def test_stream_commit_message_records_metrics(self, mock_openai, _):
+        mock_openai.return_value.responses.create.return_value = make_stream("[FEAT]: ", "add login")
+        recorder = metrics.start()
+        self.addCleanup(metrics.stop)
+
+        list(ai.stream_commit_message("diff", "", use_cache=False))
+
+        report = recorder.as_dict()
+        self.assertIn("ttft_ms", report)
+        self.assertIn("model_latency_ms", report)
+        self.assertGreater(report["prompt_tokens"], 0)
+        self.assertEqual(report["stages"]["model.stream"]["count"], 1)
+
+    @patch("commitgen.ai.ensure_api_key", return_value="fake-key")
+    @patch("openai.OpenAI")
+    def test_stream_commit_message_interrupted_is_not_cached(self, mock_openai, _):
+        stream = make_stream("[FEAT]: ", "add ", "login")
+        mock_openai.return_value.responses.create.return_value = stream
+
+        chunks = ai.stream_commit_message("diff", "")
+        next(chunks)
+        chunks.close()
+
+        stream.close.assert_called_once()
+        self.assertIsNone(cache.get(cache.make_key("diff", "", ai.DEFAULT_MODEL)))
+
+    @patch("commitgen.ai.ensure_api_key", return_value="fake-key")
+    @patch("openai.OpenAI")
+    def test_stream_refine_commit_message(self, mock_openai, _):
+        mock_openai.return_value.responses.create.return_value = make_stream("[FEAT]: ", "refined")
+
+        chunks = list(ai.stream_refine_commit_message("[FEAT]: add login", "fix bug"))
+        self.assertEqual("".join(chunks), "[FEAT]: refined")
+
+    @patch("commitgen.ai.ensure_api_key", return_value="fake-key")
+    @patch("openai.OpenAI")
+    def test_client_is_reused_across_generate_and_refine(self, mock_openai, mock_key):
+        mock_openai.return_value.responses.create.return_value.output_text = "[FEAT]: add login"
+
+        ai.generate_commit_message("diff", "", use_cache=False)
+        ai.refine_commit_message("[FEAT]: add login", "fix bug")
+        ai.generate_commit_message("other diff", "", use_cache=False)
+
+        mock_openai.assert_called_once()
+        mock_key.assert_called_once()
+        self.assertEqual(mock_openai.return_value.responses.create.call_count, 3)
+
+    @patch.dict("os.environ", {"COMMITGEN_TIMEOUT": "5", "COMMITGEN_MAX_RETRIES": "4", "OPENAI_BASE_URL": "http://127.0.0.1:9999/v1"})
+    @patch("commitgen.ai.ensure_api_key", return_value="fake-key")
+    @patch("openai.OpenAI")
+    def test_client_settings_come_from_config(self, mock_openai, _):
+        ai.get_client()
+
+        kwargs = mock_openai.call_args.kwargs
+        self.assertEqual(kwargs["timeout"], 5.0)
+        # COMMITGEN_MAX_RETRIES is applied by commitgen.resilience instead.
+        self.assertEqual(kwargs["max_retries"], 0)
+        self.assertEqual(kwargs["base_url"], "http://127.0.0.1:9999/v1")
+
+    @patch("openai.OpenAI")
+    def test_set_client_injects_stand_in(self, mock_openai):
+        stand_in = MagicMock()
+        stand_in.responses.create.return_value.output_text = "[TEST]: stand-in"
+        ai.set_client(stand_in)
+
+        msg = ai.generate_commit_message("diff", "", use_cache=False)
+
+        self.assertEqual(msg, "[TEST]: stand-in")
+        mock_openai.assert_not_called()
+
+    @patch.dict("os.environ", {"COMMITGEN_CHUNK_THRESHOLD": "50", "COMMITGEN_CHUNK_TOKENS": "60"})
+    def test_large_diff_is_summarized_in_chunks_then_reduced(self):
+        client = MagicMock()
+
+        def respond(model, input, store):
+            if input.startswith("You are an expert software engineer.\nThe following is one part"):
+                path = input.split("diff --git a/", 1)[1].split(" ", 1)[0]
+                return MagicMock(output_text=f"- [FEAT]: change {path}")
+            return MagicMock(output_text="[FEAT]: merged message")
+
+        client.responses.create.side_effect = respond
+        ai.set_client(client)
+        diff = "".join(
+            f"diff --git a/f{i}.py b/f{i}.py\n@@ -1 +1 @@\n" + "".join(f"+line {n}\n" for n in range(20))
+            for i in range(3)
+        )
+
+        msg = ai.generate_commit_message(diff, "context", use_cache=False)
+
+        self.assertEqual(msg, "[FEAT]: merged message")
+        prompts = [call.kwargs["input"] for call in client.responses.create.call_args_list]
+        self.assertGreaterEqual(len(prompts), 4)
+        reduce_prompt = prompts[-1]
+        self.assertIn("CHANGE SUMMARIES", reduce_prompt)
+        self.assertIn("- [FEAT]: change f0.py", reduce_prompt)
+        self.assertIn("- [FEAT]: change f2.py", reduce_prompt)
+        self.assertIn("ADDITIONAL CONTEXT:\ncontext", reduce_prompt)
+
+    def test_small_diff_is_not_chunked(self):
+        self.assertFalse(ai.needs_chunking("diff --git a/x b/x\n+small\n"))
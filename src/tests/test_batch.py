@@ -0,0 +1,137 @@
+import asyncio
+import subprocess
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+from commitgen import batch
+
+
+class FakeAsyncClient:
+
+    def __init__(self, overlap=1, failures=None):
+        # Each request waits until `overlap` requests are in flight at once,
+        # or a few seconds, so missing concurrency fails instead of hanging.
+        self.overlap = overlap
+        self.failures = list(failures or [])
+        self.calls = 0
+        self.in_flight = 0
+        self.peak = 0
+        self.responses = MagicMock()
+        self.responses.create = self._create
+        self.closed = False
+
+    async def _create(self, **kwargs):
+        self.calls += 1
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            for _ in range(500):
+                if self.peak >= self.overlap:
+                    break
+                await asyncio.sleep(0.01)
+        finally:
+            self.in_flight -= 1
+        if self.failures:
+            raise self.failures.pop(0)
+        return MagicMock(output_text="[FEAT]: batch commit")
+
+    async def close(self):
+        self.closed = True
+
+
+class RateLimited(Exception):
+    status_code = 429
+    response = MagicMock(headers={"retry-after": "0"})
+
+
+def make_repo(root, name, staged=True):
+    path = Path(root) / name
+    path.mkdir()
+    git = ["git", "-C", str(path), "-c", "user.email=t@example.com", "-c", "user.name=t"]
+    subprocess.run(git + ["init", "-q"], check=True)
+    (path / "file.txt").write_text("hello\n")
+    if staged:
+        subprocess.run(git + ["add", "."], check=True)
+    return path
+
+
+def log_subject(path):
+    return subprocess.run(
+        ["git", "-C", str(path), "log", "-1", "--format=%s"], capture_output=True, text=True
+    ).stdout.strip()
+
+
+class TestBatch(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        for name, value in {
+            "GIT_AUTHOR_NAME": "t", "GIT_AUTHOR_EMAIL": "t@example.com",
+            "GIT_COMMITTER_NAME": "t", "GIT_COMMITTER_EMAIL": "t@example.com",
+        }.items():
+            patcher = patch.dict("os.environ", {name: value})
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        for target, name in (("commitgen.routing.LOG_FILE", "routing.jsonl"),
+                             ("commitgen.resilience.BREAKER_FILE", "breaker.json")):
+            patcher = patch(target, Path(self.tmp.name) / name)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = patch("commitgen.resilience.backoff", return_value=0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_expand_paths_handles_globs(self):
+        make_repo(self.tmp.name, "svc-a")
+        make_repo(self.tmp.name, "svc-b")
+        paths = batch.expand_paths([f"{self.tmp.name}/svc-*", f"{self.tmp.name}/svc-a"])
+        self.assertEqual([Path(p).name for p in paths], ["svc-a", "svc-b"])
+
+    def test_run_batch_commits_concurrently(self):
+        repos = [str(make_repo(self.tmp.name, f"svc-{i}", staged=i % 2 == 0)) for i in range(4)]
+        client = FakeAsyncClient(overlap=len(repos))
+
+        with patch("commitgen.batch.ai.create_async_client", return_value=client):
+            results = batch.run_batch(repos, concurrency=4, use_cache=False)
+
+        self.assertTrue(all(result.status == "committed" for result in results))
+        self.assertTrue(all(log_subject(repo) == "[FEAT]: batch commit" for repo in repos))
+        self.assertEqual(client.peak, len(repos))
+        self.assertTrue(client.closed)
+
+    def test_run_batch_retries_rate_limits(self):
+        repo = str(make_repo(self.tmp.name, "svc"))
+        client = FakeAsyncClient(failures=[RateLimited(), RateLimited()])
+
+        with patch("commitgen.batch.ai.create_async_client", return_value=client):
+            results = batch.run_batch([repo], use_cache=False)
+
+        self.assertEqual(results[0].status, "committed")
+        self.assertEqual(client.calls, 3)
+
+    @patch.dict("os.environ", {"COMMITGEN_BATCH_MAX_RETRIES": "1"})
+    def test_run_batch_fails_repo_once_retries_are_spent(self):
+        repo = make_repo(self.tmp.name, "svc")
+        client = FakeAsyncClient(failures=[RateLimited(), RateLimited()])
+
+        with patch("commitgen.batch.ai.create_async_client", return_value=client):
+            results = batch.run_batch([str(repo)], use_cache=False)
+
+        self.assertEqual(results[0].status, "failed")
+        self.assertEqual(client.calls, 2)
+        self.assertEqual(log_subject(repo), "")
+
+    def test_run_batch_reports_failures_per_repo(self):
+        good = str(make_repo(self.tmp.name, "good"))
+        not_repo = Path(self.tmp.name) / "plain"
+        not_repo.mkdir()
+        client = FakeAsyncClient(failures=[ValueError("boom")])
+
+        with patch("commitgen.batch.ai.create_async_client", return_value=client):
+            results = batch.run_batch([good, str(not_repo)], use_cache=False)
+
+        self.assertEqual(results[0].status, "failed")
+        self.assertIn("boom", results[0].error)
+        self.assertEqual(results[1].status, "skipped")
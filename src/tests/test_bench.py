@@ -0,0 +1,46 @@
+import unittest
+from tests import bench
+
+# git processes one `commit --auto` may start with unstaged changes: status,
+# add, diff, commit and push, plus a little headroom.
+SUBPROCESS_BUDGET = 8
+
+
+class BenchmarkPipeline(unittest.TestCase):
+    """
+    Runs the full `commit --auto` path on synthetic repositories against the
+    fake model server, guarding process count and prompt size. Run
+    `python -m tests.bench` from src/ to see the numbers.
+    """
+
+    def test_benchmark_small_and_medium_repos(self):
+        report = bench.run([bench.SCENARIOS["small"], bench.SCENARIOS["medium"]], in_process=True)
+
+        for name, result in report["scenarios"].items():
+            self.assertEqual(result["subject"], "[REFACTOR]: rename module values", name)
+            self.assertLessEqual(result["subprocesses"], SUBPROCESS_BUDGET, name)
+            self.assertGreater(result["prompt_bytes"], 0, name)
+
+        small = report["scenarios"]["small"]
+        self.assertEqual(small["requests"], 1)
+        # One request carrying the diff and the prompt around it, nothing more.
+        self.assertLess(small["prompt_bytes"], small["diff_bytes"] + 4096)
+
+
+class TestCompare(unittest.TestCase):
+
+    def test_growth_past_threshold_is_a_regression(self):
+        old = {"scenarios": {"small": {"wall_ms": 100.0, "subprocesses": 5, "prompt_bytes": 1000}}}
+        new = {"scenarios": {"small": {"wall_ms": 105.0, "subprocesses": 7, "prompt_bytes": 900},
+                             "large": {"wall_ms": 1.0}}}
+
+        rows = {row["metric"]: row for row in bench.compare(old, new, threshold=0.1)}
+
+        self.assertEqual(set(rows), {"wall_ms", "subprocesses", "prompt_bytes"})
+        self.assertFalse(rows["wall_ms"]["regression"])
+        self.assertTrue(rows["subprocesses"]["regression"])
+        self.assertEqual(rows["prompt_bytes"]["change"], -0.1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+import os
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+from commitgen import cache
+
+
+class TestCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        patcher = patch("commitgen.cache.CACHE_DIR", Path(self.tmp.name) / "cache")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.tmp.cleanup)
+
+    def test_make_key_ignores_line_endings_and_trailing_whitespace(self):
+        a = cache.make_key("diff --git a b\n+line  \n", "", "model")
+        b = cache.make_key("diff --git a b\r\n+line\r\n", "", "model")
+        self.assertEqual(a, b)
+
+    def test_make_key_depends_on_context_and_model(self):
+        base = cache.make_key("diff", "", "model")
+        self.assertNotEqual(base, cache.make_key("diff", "ctx", "model"))
+        self.assertNotEqual(base, cache.make_key("diff", "", "other-model"))
+
+    def test_put_then_get_hits(self):
+        key = cache.make_key("diff", "", "model")
+        cache.put(key, "[FEAT]: add login")
+        self.assertEqual(cache.get(key), "[FEAT]: add login")
+        self.assertEqual(cache.stats()["hits"], 1)
+
+    def test_get_missing_counts_miss(self):
+        self.assertIsNone(cache.get("missing"))
+        self.assertEqual(cache.stats()["misses"], 1)
+
+    def test_put_ignores_empty_message(self):
+        cache.put("key", "  ")
+        self.assertEqual(cache.stats()["entries"], 0)
+
+    @patch("commitgen.cache._ttl_seconds", return_value=60)
+    def test_expired_entry_is_a_miss(self, _):
+        cache.put("key", "[FIX]: old")
+        with patch("commitgen.cache.time.time", return_value=time.time() + 120):
+            self.assertIsNone(cache.get("key"))
+
+    def test_evict_drops_least_recently_used_over_budget(self):
+        cache.put("old", "[FEAT]: " + "a" * 200)
+        old_path = cache.CACHE_DIR / "old.json"
+        past = time.time() - 100
+        os.utime(old_path, (past, past))
+        cache.put("new", "[FEAT]: " + "b" * 200)
+
+        with patch("commitgen.cache._max_bytes", return_value=old_path.stat().st_size + 10):
+            removed = cache.evict()
+
+        self.assertEqual(removed, 1)
+        self.assertFalse(old_path.exists())
+        self.assertTrue((cache.CACHE_DIR / "new.json").exists())
+
+    def test_clear_resets_entries_and_stats(self):
+        cache.put("key", "[FEAT]: add login")
+        cache.get("key")
+        cache.clear()
+        self.assertEqual(cache.stats(), {"hits": 0, "misses": 0, "entries": 0, "bytes": 0})
@@ -1,20 +1,43 @@
+import json
+import tempfile
 import unittest
+from pathlib import Path
 from unittest.mock import patch
 from typer.testing import CliRunner
 from commitgen.cli import app
+from commitgen.batch import BatchResult
+from commitgen.git_utils import RepoSnapshot
+from commitgen.ranking import Candidate
+from commitgen.resilience import RequestRejected
 
 runner = CliRunner()
 
 
+def make_snapshot(staged=True, diff="diff --git a b", modified=None):
+    return RepoSnapshot(
+        is_repo=True,
+        staged_files=["file"] if staged else [],
+        untracked_files=modified or [],
+        diff=diff if staged else "",
+    )
+
+
 class TestCLI(unittest.TestCase):
 
-    @patch("commitgen.cli.git_utils.verify_repo", return_value=False)
-    def test_commit_not_git_repo(self, mock_verify_repo):
+    @patch("commitgen.cli.git_utils.take_snapshot", return_value=RepoSnapshot(is_repo=False))
+    def test_commit_not_git_repo(self, mock_snapshot):
         result = runner.invoke(app, ["commit"])
         self.assertNotEqual(result.exit_code, 0)
 
-    @patch("commitgen.cli.git_utils.verify_repo", return_value=True)
-    @patch("commitgen.cli.git_utils.has_staged_changes", return_value=False)
+    @patch("commitgen.daemon.connect")
+    @patch("commitgen.cli.git_utils.take_snapshot", return_value=RepoSnapshot(is_repo=False))
+    def test_commit_outside_repo_does_not_connect_to_daemon(self, mock_snapshot, mock_connect):
+        result = runner.invoke(app, ["commit"])
+
+        self.assertEqual(result.exit_code, 1)
+        mock_connect.assert_not_called()
+
+    @patch("commitgen.cli.git_utils.take_snapshot", return_value=make_snapshot(staged=False))
     @patch("commitgen.cli.typer.prompt", return_value="q")
     def test_commit_no_staged_changes_abort(self, *_):
         result = runner.invoke(app, ["commit"])
@@ -22,10 +45,8 @@ class TestCLI(unittest.TestCase):
 
     @patch("commitgen.cli.git_utils.push_changes")
     @patch("commitgen.cli.git_utils.commit_changes")
-    @patch("commitgen.cli.ai.generate_commit_message", return_value="[FEAT]: add login")
-    @patch("commitgen.cli.git_utils.get_staged_diff", return_value="diff --git a b")
-    @patch("commitgen.cli.git_utils.has_staged_changes", return_value=True)
-    @patch("commitgen.cli.git_utils.verify_repo", return_value=True)
+    @patch("commitgen.ai.generate_commit_message", return_value="[FEAT]: add login")
+    @patch("commitgen.cli.git_utils.take_snapshot", return_value=make_snapshot(diff="diff --git a b"))
     @patch("commitgen.cli.typer.prompt", side_effect=["a", "n"])
     def test_commit_accept_flow(self, *_):
         result = runner.invoke(app, ["commit"])
@@ -33,11 +54,9 @@ class TestCLI(unittest.TestCase):
 
     @patch("commitgen.cli.git_utils.push_changes")
     @patch("commitgen.cli.git_utils.commit_changes")
-    @patch("commitgen.cli.ai.generate_commit_message", return_value="[FEAT]: initial")
+    @patch("commitgen.ai.generate_commit_message", return_value="[FEAT]: initial")
     @patch("commitgen.cli.typer.edit", return_value="[FEAT]: edited message")
-    @patch("commitgen.cli.git_utils.get_staged_diff", return_value="diff")
-    @patch("commitgen.cli.git_utils.has_staged_changes", return_value=True)
-    @patch("commitgen.cli.git_utils.verify_repo", return_value=True)
+    @patch("commitgen.cli.git_utils.take_snapshot", return_value=make_snapshot(diff="diff"))
     @patch(
         "commitgen.cli.typer.prompt",
         side_effect=[
@@ -62,14 +81,12 @@ class TestCLI(unittest.TestCase):
         result = runner.invoke(app, ["config"])
         self.assertEqual(result.exit_code, 0)
 
-    @patch("commitgen.cli.git_utils.verify_repo", return_value=True)
-    @patch("commitgen.cli.git_utils.has_staged_changes", return_value=True)
-    @patch("commitgen.cli.git_utils.get_staged_diff", return_value="diff --git a b")
-    @patch("commitgen.cli.ai.generate_commit_message", return_value="[FEAT]: auto commit")
-    @patch("commitgen.cli.ai._fallback_commit_message", return_value="[FEAT]: fallback commit")
+    @patch("commitgen.cli.git_utils.take_snapshot", return_value=make_snapshot(diff="diff --git a b"))
+    @patch("commitgen.ai.generate_commit_message", return_value="[FEAT]: auto commit")
+    @patch("commitgen.ai._fallback_commit_message", return_value="[FEAT]: fallback commit")
     @patch("commitgen.cli.git_utils.commit_changes")
     @patch("commitgen.cli.git_utils.push_changes")
-    def test_commit_auto_flag(self, mock_push, mock_commit, mock_fallback, mock_generate, mock_diff, mock_staged, mock_verify):
+    def test_commit_auto_flag(self, mock_push, mock_commit, mock_fallback, mock_generate, mock_snapshot):
         """Test that --auto flag commits and pushes automatically."""
         result = runner.invoke(app, ["commit", "--auto"])
 
@@ -82,14 +99,13 @@ class TestCLI(unittest.TestCase):
         # Ensure push_changes is called once
         mock_push.assert_called_once()
 
-    @patch("commitgen.cli.git_utils.verify_repo", return_value=True)
-    @patch("commitgen.cli.git_utils.has_staged_changes", return_value=False)
+    @patch("commitgen.cli.git_utils.take_snapshot", return_value=make_snapshot(staged=False))
     @patch("commitgen.cli.git_utils.stage_all_changes")
-    @patch("commitgen.cli.git_utils.get_staged_diff", return_value="diff --git a b")
-    @patch("commitgen.cli.ai.generate_commit_message", return_value="[FEAT]: auto staged commit")
+    @patch("commitgen.cli.git_utils.read_staged_diff", return_value="diff --git a b")
+    @patch("commitgen.ai.generate_commit_message", return_value="[FEAT]: auto staged commit")
     @patch("commitgen.cli.git_utils.commit_changes")
     @patch("commitgen.cli.git_utils.push_changes")
-    def test_commit_auto_flag_stages_changes(self, mock_push, mock_commit, mock_generate, mock_diff, mock_stage_all, mock_staged, mock_verify):
+    def test_commit_auto_flag_stages_changes(self, mock_push, mock_commit, mock_generate, mock_diff, mock_stage_all, mock_snapshot):
         """Test that --auto stages all changes if nothing is staged."""
         result = runner.invoke(app, ["commit", "--auto"])
 
@@ -97,3 +113,257 @@ class TestCLI(unittest.TestCase):
         mock_stage_all.assert_called_once()
         mock_commit.assert_called_once_with("[FEAT]: auto staged commit")
         mock_push.assert_called_once()
+
+    @patch("commitgen.cli.git_utils.take_snapshot", return_value=make_snapshot(diff="diff --git a b"))
+    @patch("commitgen.ai.generate_commit_message", return_value="[FEAT]: auto commit")
+    @patch("commitgen.cli.git_utils.commit_changes")
+    @patch("commitgen.cli.git_utils.push_changes")
+    def test_commit_no_cache_flag(self, mock_push, mock_commit, mock_generate, *_):
+        result = runner.invoke(app, ["commit", "--auto", "--no-cache"])
+
+        self.assertEqual(result.exit_code, 0)
+        mock_generate.assert_called_once()
+        self.assertFalse(mock_generate.call_args.kwargs["use_cache"])
+
+    @patch("commitgen.cli.git_utils.take_snapshot", return_value=make_snapshot(diff="diff --git a b"))
+    @patch("commitgen.ai.generate_commit_message", side_effect=RequestRejected("openai rejected the request: 401"))
+    @patch("commitgen.cli.git_utils.commit_changes")
+    def test_commit_reports_rejected_request_without_traceback(self, mock_commit, *_):
+        result = runner.invoke(app, ["commit", "--auto"])
+
+        self.assertEqual(result.exit_code, 1)
+        self.assertIn("Request rejected", result.output)
+        self.assertIn("401", result.output)
+        self.assertNotIsInstance(result.exception, RequestRejected)
+        mock_commit.assert_not_called()
+
+    @patch("commitgen.cli.digests.count", return_value=5)
+    @patch("commitgen.cli.cache.stats", return_value={"hits": 3, "misses": 1, "entries": 2, "bytes": 2048})
+    def test_cache_command_shows_stats(self, *_):
+        result = runner.invoke(app, ["cache"])
+        self.assertEqual(result.exit_code, 0)
+        self.assertIn("75%", result.output)
+
+    @patch("commitgen.cli.digests.clear")
+    @patch("commitgen.cli.cache.clear")
+    def test_cache_command_clear(self, mock_clear, mock_clear_digests):
+        result = runner.invoke(app, ["cache", "--clear"])
+        self.assertEqual(result.exit_code, 0)
+        mock_clear.assert_called_once()
+        mock_clear_digests.assert_called_once()
+
+    @patch("commitgen.cli.git_utils.push_changes")
+    @patch("commitgen.cli.git_utils.commit_changes")
+    @patch("commitgen.ai.stream_commit_message", return_value=iter(["[FEAT]: ", "add login"]))
+    @patch("commitgen.cli.git_utils.take_snapshot", return_value=make_snapshot(diff="diff --git a b"))
+    @patch("commitgen.cli.typer.prompt", side_effect=["a", "n"])
+    def test_commit_stream_flow(self, mock_prompt, mock_snapshot, mock_stream, mock_commit, mock_push):
+        result = runner.invoke(app, ["commit", "--stream"])
+
+        self.assertEqual(result.exit_code, 0)
+        mock_commit.assert_called_once_with("[FEAT]: add login")
+
+    @patch("commitgen.cli.git_utils.commit_changes")
+    @patch("commitgen.ai.stream_commit_message")
+    @patch("commitgen.cli.git_utils.take_snapshot", return_value=make_snapshot(diff="diff --git a b"))
+    def test_commit_stream_cancelled(self, mock_snapshot, mock_stream, mock_commit):
+        def interrupted():
+            yield "[FEAT]: "
+            raise KeyboardInterrupt
+
+        mock_stream.return_value = interrupted()
+        result = runner.invoke(app, ["commit", "--stream"])
+
+        self.assertEqual(result.exit_code, 1)
+        self.assertIn("cancelled", result.output)
+        mock_commit.assert_not_called()
+
+    @patch("commitgen.cli.git_utils.push_changes")
+    @patch("commitgen.cli.git_utils.commit_changes")
+    @patch("commitgen.ai.generate_commit_message", return_value="[FEAT]: add login")
+    @patch("commitgen.cli.git_utils.preview_stage_all_diff", return_value="diff --git a b")
+    @patch("commitgen.cli.git_utils.read_staged_diff", return_value="diff --git a b")
+    @patch("commitgen.cli.git_utils.stage_file")
+    @patch("commitgen.cli.git_utils.take_snapshot", return_value=make_snapshot(staged=False, modified=["one.py", "two.py"]))
+    @patch("commitgen.cli.typer.prompt", side_effect=["s", "2", "a", "n"])
+    def test_commit_select_files_uses_snapshot(self, mock_prompt, mock_snapshot, mock_stage_file, mock_diff, *_):
+        result = runner.invoke(app, ["commit"])
+
+        self.assertEqual(result.exit_code, 0)
+        mock_snapshot.assert_called_once()
+        mock_stage_file.assert_called_once_with("two.py")
+        mock_diff.assert_called_once()
+
+    @patch("commitgen.cli.git_utils.push_changes")
+    @patch("commitgen.cli.git_utils.commit_changes")
+    @patch("commitgen.cli.git_utils.take_snapshot", return_value=make_snapshot(diff="diff --git a b"))
+    def test_commit_starts_generation_before_prompt(self, mock_snapshot, mock_commit, mock_push):
+        events = []
+
+        def generate(*args, **kwargs):
+            events.append("generate")
+            return "[FEAT]: add login"
+
+        def prompt(text, *args, **kwargs):
+            events.append("prompt")
+            return "a" if text.startswith("(a) accept") else "n"
+
+        with patch("commitgen.ai.generate_commit_message", side_effect=generate), \
+                patch("commitgen.cli.typer.prompt", side_effect=prompt):
+            result = runner.invoke(app, ["commit"])
+
+        self.assertEqual(result.exit_code, 0)
+        self.assertEqual(events[0], "generate")
+        mock_commit.assert_called_once_with("[FEAT]: add login")
+
+    @patch("commitgen.cli.git_utils.push_changes")
+    @patch("commitgen.cli.git_utils.commit_changes")
+    @patch("commitgen.ai.generate_commit_message", return_value="[FEAT]: add login")
+    @patch("commitgen.cli.git_utils.read_staged_diff", return_value="diff --git a b")
+    @patch("commitgen.cli.git_utils.preview_stage_all_diff", return_value="diff --git a b")
+    @patch("commitgen.cli.git_utils.stage_all_changes")
+    @patch("commitgen.cli.git_utils.take_snapshot", return_value=make_snapshot(staged=False, modified=["one.py"]))
+    @patch("commitgen.cli.typer.prompt", side_effect=["a", "a", "n"])
+    def test_commit_stage_all_reuses_speculative_message(self, mock_prompt, mock_snapshot, mock_stage_all,
+                                                         mock_preview, mock_diff, mock_generate, mock_commit, _):
+        result = runner.invoke(app, ["commit"])
+
+        self.assertEqual(result.exit_code, 0)
+        mock_preview.assert_called_once()
+        mock_generate.assert_called_once()
+        mock_commit.assert_called_once_with("[FEAT]: add login")
+
+    @patch("commitgen.cli.git_utils.push_changes")
+    @patch("commitgen.cli.git_utils.commit_changes")
+    @patch("commitgen.ai.generate_commit_message", side_effect=["[FEAT]: stale guess", "[FEAT]: add login"])
+    @patch("commitgen.cli.git_utils.read_staged_diff", return_value="diff --git a/real b/real")
+    @patch("commitgen.cli.git_utils.preview_stage_all_diff", return_value="diff --git a/guess b/guess")
+    @patch("commitgen.cli.git_utils.stage_all_changes")
+    @patch("commitgen.cli.git_utils.take_snapshot", return_value=make_snapshot(staged=False, modified=["one.py"]))
+    @patch("commitgen.cli.typer.prompt", side_effect=["a", "a", "n"])
+    def test_commit_stage_all_discards_mismatched_guess(self, mock_prompt, mock_snapshot, mock_stage_all,
+                                                        mock_preview, mock_diff, mock_generate, mock_commit, _):
+        result = runner.invoke(app, ["commit"])
+
+        self.assertEqual(result.exit_code, 0)
+        self.assertEqual(mock_generate.call_count, 2)
+        mock_commit.assert_called_once_with("[FEAT]: add login")
+
+    @patch("commitgen.cli.git_utils.push_changes")
+    @patch("commitgen.cli.git_utils.commit_changes")
+    @patch("commitgen.ai.refine_commit_message", return_value="[FIX]: handle empty token")
+    @patch("commitgen.ai.generate_commit_message", return_value="[FEAT]: add login")
+    @patch("commitgen.cli.git_utils.take_snapshot", return_value=make_snapshot(diff="diff --git a b"))
+    @patch("commitgen.cli.typer.prompt", side_effect=["r", "it is a fix", "a", "n"])
+    def test_commit_refine_runs_through_prefetcher(self, mock_prompt, mock_snapshot, mock_generate, mock_refine, mock_commit, _):
+        result = runner.invoke(app, ["commit"])
+
+        self.assertEqual(result.exit_code, 0)
+        mock_refine.assert_called_once()
+        self.assertEqual(mock_refine.call_args.args, ("[FEAT]: add login", "it is a fix"))
+        mock_commit.assert_called_once_with("[FIX]: handle empty token")
+
+    @patch("commitgen.cli.git_utils.push_changes")
+    @patch("commitgen.cli.git_utils.commit_changes")
+    @patch("commitgen.ai.generate_commit_message", return_value="[FEAT]: add login")
+    @patch("commitgen.cli.git_utils.take_snapshot", return_value=make_snapshot(diff="diff --git a b"))
+    def test_commit_profile_writes_metrics(self, *_):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "metrics.jsonl"
+            result = runner.invoke(app, ["commit", "--auto", "--profile", "--metrics-file", str(path)])
+            entry = json.loads(path.read_text())
+
+        self.assertEqual(result.exit_code, 0)
+        self.assertIn("Profile", result.output)
+        self.assertEqual(entry["command"], "commit")
+        self.assertEqual(entry["exit_code"], 0)
+        self.assertIn("compact", entry["stages"])
+        self.assertIn("model.wait", entry["stages"])
+
+    @patch("commitgen.cli.git_utils.push_changes")
+    @patch("commitgen.cli.git_utils.commit_changes")
+    @patch("commitgen.ai.generate_commit_message")
+    @patch("commitgen.daemon.connect")
+    @patch("commitgen.cli.git_utils.take_snapshot", return_value=make_snapshot(diff="diff --git a b"))
+    def test_commit_uses_running_daemon(self, mock_snapshot, mock_connect, mock_generate, mock_commit, _):
+        mock_connect.return_value.generate_commit_message.return_value = "[FEAT]: from daemon"
+
+        result = runner.invoke(app, ["commit", "--auto"])
+
+        self.assertEqual(result.exit_code, 0)
+        mock_generate.assert_not_called()
+        mock_commit.assert_called_once_with("[FEAT]: from daemon")
+
+    @patch("commitgen.cli.git_utils.push_changes")
+    @patch("commitgen.cli.git_utils.commit_changes")
+    @patch("commitgen.ai.generate_commit_message", return_value="[FEAT]: in process")
+    @patch("commitgen.daemon.connect")
+    @patch("commitgen.cli.git_utils.take_snapshot", return_value=make_snapshot(diff="diff --git a b"))
+    def test_commit_no_daemon_flag(self, mock_snapshot, mock_connect, mock_generate, mock_commit, _):
+        result = runner.invoke(app, ["commit", "--auto", "--no-daemon"])
+
+        self.assertEqual(result.exit_code, 0)
+        mock_connect.assert_not_called()
+        mock_commit.assert_called_once_with("[FEAT]: in process")
+
+    @patch("commitgen.cli.git_utils.push_changes")
+    @patch("commitgen.cli.git_utils.commit_changes")
+    @patch("commitgen.cli.typer.getchar", return_value="2")
+    @patch("commitgen.ai.generate_candidates", return_value=[
+        Candidate("[FEAT]: add login", 1.0), Candidate("[FEAT]: add login page", 0.9, ["no DOCS change"]),
+    ])
+    @patch("commitgen.cli.git_utils.take_snapshot", return_value=make_snapshot(diff="diff --git a b"))
+    @patch("commitgen.cli.typer.prompt", side_effect=["a", "n"])
+    def test_commit_candidates_pick_from_table(self, mock_prompt, mock_snapshot, mock_candidates, mock_getchar,
+                                               mock_commit, _):
+        result = runner.invoke(app, ["commit", "--candidates", "2"])
+
+        self.assertEqual(result.exit_code, 0)
+        self.assertIn("no DOCS change", result.output)
+        mock_candidates.assert_called_once()
+        self.assertEqual(mock_candidates.call_args.args[2], 2)
+        mock_commit.assert_called_once_with("[FEAT]: add login page")
+
+    @patch("commitgen.cli.git_utils.push_changes")
+    @patch("commitgen.cli.git_utils.commit_changes")
+    @patch("commitgen.ai.generate_candidates", return_value=[
+        Candidate("[FEAT]: add login", 1.0), Candidate("added login", 0.4),
+    ])
+    @patch("commitgen.cli.git_utils.take_snapshot", return_value=make_snapshot(diff="diff --git a b"))
+    def test_commit_auto_takes_best_candidate(self, mock_snapshot, mock_candidates, mock_commit, _):
+        result = runner.invoke(app, ["commit", "--auto", "-n", "3"])
+
+        self.assertEqual(result.exit_code, 0)
+        mock_commit.assert_called_once_with("[FEAT]: add login")
+
+    @patch("commitgen.batch.run_batch", return_value=[
+        BatchResult("svc-a", "pushed", message="[FEAT]: add login", latency=1.2),
+        BatchResult("svc-b", "skipped", error="no changes"),
+    ])
+    @patch("commitgen.batch.expand_paths", return_value=["svc-a", "svc-b"])
+    def test_batch_command_prints_summary(self, mock_expand, mock_run):
+        result = runner.invoke(app, ["batch", "svc-*", "--push", "--concurrency", "3"])
+
+        self.assertEqual(result.exit_code, 0)
+        mock_run.assert_called_once_with(["svc-a", "svc-b"], push=True, concurrency=3, use_cache=True)
+        self.assertIn("svc-a", result.output)
+        self.assertIn("no changes", result.output)
+
+    @patch("commitgen.batch.run_batch", return_value=[BatchResult("svc-a", "failed", error="boom")])
+    @patch("commitgen.batch.expand_paths", return_value=["svc-a"])
+    def test_batch_command_fails_when_a_repo_fails(self, *_):
+        result = runner.invoke(app, ["batch", "svc-a"])
+        self.assertEqual(result.exit_code, 1)
+
+    @patch("commitgen.cli.git_utils.push_changes")
+    @patch("commitgen.cli.git_utils.commit_changes")
+    @patch("commitgen.ai.generate_commit_message")
+    @patch("commitgen.cli.git_utils.take_snapshot", return_value=make_snapshot(
+        diff="diff --git a/README.md b/README.md\n--- a/README.md\n+++ b/README.md\n@@ -1 +1,2 @@\n x\n+y\n"
+    ))
+    def test_commit_offline_uses_local_engine(self, mock_snapshot, mock_generate, mock_commit, mock_push):
+        result = runner.invoke(app, ["commit", "--auto", "--offline"])
+
+        self.assertEqual(result.exit_code, 0)
+        mock_generate.assert_not_called()
+        mock_commit.assert_called_once_with("[DOCS]: update README.md")
@@ -0,0 +1,135 @@
+import os
+import unittest
+from unittest.mock import patch
+from commitgen import compaction
+from commitgen.diffparse import chunk_diff, iter_file_diffs, split_file_diffs
+
+
+def make_file_diff(path, added, removed=0, context=3):
+    lines = [
+        f"diff --git a/{path} b/{path}\n",
+        f"--- a/{path}\n",
+        f"+++ b/{path}\n",
+        f"@@ -1,{removed + context} +1,{added + context} @@\n",
+    ]
+    lines += [f" context line {i}\n" for i in range(context)]
+    lines += [f"-old line {i}\n" for i in range(removed)]
+    lines += [f"+new line {i}\n" for i in range(added)]
+    lines += [f" trailing context {i}\n" for i in range(context)]
+    return "".join(lines)
+
+
+class TestDiffParse(unittest.TestCase):
+
+    def test_split_round_trips(self):
+        diff = make_file_diff("a.py", 2, 1) + make_file_diff("b.py", 1)
+        files = split_file_diffs(diff)
+        self.assertEqual([f.path for f in files], ["a.py", "b.py"])
+        self.assertEqual("".join(f.text() for f in files), diff)
+        self.assertEqual((files[0].added, files[0].removed), (2, 1))
+
+    def test_rename_only(self):
+        diff = (
+            "diff --git a/old.py b/new.py\n"
+            "similarity index 100%\n"
+            "rename from old.py\n"
+            "rename to new.py\n"
+        )
+        file_diff = split_file_diffs(diff)[0]
+        self.assertTrue(file_diff.is_rename_only)
+        self.assertEqual((file_diff.old_path, file_diff.path), ("old.py", "new.py"))
+
+
+    def test_chunk_diff_respects_size_and_keeps_headers(self):
+        diff = make_file_diff("a.py", 10) + make_file_diff("big.py", 400) + make_file_diff("c.py", 10)
+        chunks = chunk_diff(diff, 1000)
+
+        self.assertGreater(len(chunks), 3)
+        self.assertTrue(all(len(chunk) <= 1100 for chunk in chunks))
+        self.assertTrue(all(chunk.startswith("diff --git") for chunk in chunks))
+        self.assertIn("+new line 399", "".join(chunks))
+
+    def test_chunk_diff_groups_small_files(self):
+        diff = make_file_diff("a.py", 1) + make_file_diff("b.py", 1)
+        self.assertEqual(chunk_diff(diff, 10_000), [diff])
+
+
+class TestCompaction(unittest.TestCase):
+
+    def test_small_diff_is_unchanged(self):
+        diff = make_file_diff("src/app.py", 3)
+        result = compaction.compact_diff(diff, token_budget=10_000)
+        self.assertEqual(result.text, diff)
+        self.assertEqual(result.removed_bytes, 0)
+
+    def test_lockfile_and_binary_are_summarized(self):
+        diff = (
+            make_file_diff("src/app.py", 1)
+            + make_file_diff("poetry.lock", 400, 300)
+            + "diff --git a/logo.png b/logo.png\nBinary files a/logo.png and b/logo.png differ\n"
+        )
+        result = compaction.compact_diff(diff, token_budget=10_000)
+
+        self.assertIn("+new line 0", result.text)
+        self.assertIn("[summarized] poetry.lock (lockfile): +400 -300 lines", result.text)
+        self.assertIn("[summarized] logo.png: binary file changed", result.text)
+        self.assertEqual(result.summarized, ["poetry.lock", "logo.png"])
+        self.assertEqual(result.reasons, {"poetry.lock": "lockfile", "logo.png": "binary"})
+        self.assertGreater(result.removed_tokens, 0)
+
+    def test_hunks_omitted_while_reading_are_summarized_with_counts(self):
+        diff = "diff --git a/yarn.lock b/yarn.lock\n--- a/yarn.lock\n+++ b/yarn.lock\n[hunks omitted] +12 -3 lines\n"
+        result = compaction.compact_diff(diff, token_budget=10_000, original_bytes=50_000)
+
+        self.assertEqual(result.text, "[summarized] yarn.lock (lockfile): +12 -3 lines\n")
+        self.assertEqual(result.original_bytes, 50_000)
+        self.assertGreater(result.removed_bytes, 49_000)
+
+    def test_classify_noise(self):
+        self.assertEqual(compaction.classify_noise("web/package-lock.json"), "lockfile")
+        self.assertEqual(compaction.classify_noise("static/app.min.js"), "generated")
+        self.assertEqual(compaction.classify_noise("vendor/lib/x.go"), "vendored")
+        self.assertEqual(compaction.classify_noise("src/app.py"), "")
+
+    @patch.dict(os.environ, {"COMMITGEN_IGNORE": "*.csv, docs/api/*"})
+    def test_ignore_patterns_match_names_and_paths(self):
+        self.assertEqual(compaction.classify_noise("data/fixtures/users.csv"), "ignored")
+        self.assertEqual(compaction.classify_noise("docs/api/index.html"), "ignored")
+        self.assertEqual(compaction.classify_noise("docs/guide.md"), "")
+
+    def test_noise_filter_records_attribute_reasons(self):
+        noise = compaction.NoiseFilter(attributes=lambda path: "linguist-generated" if path.startswith("gen/") else "")
+        diff = make_file_diff("gen/schema.py", 50) + make_file_diff("poetry.lock", 3) + make_file_diff("app.py", 1)
+
+        pieces = [file_diff.text() for file_diff in iter_file_diffs(diff.splitlines(keepends=True), drop_hunks=noise)]
+        result = compaction.compact_diff("".join(pieces), token_budget=10_000)
+
+        self.assertEqual(noise.filtered, {"gen/schema.py": "linguist-generated", "poetry.lock": "lockfile"})
+        self.assertIn("[summarized] gen/schema.py (linguist-generated): +50 -0 lines", result.text)
+        self.assertEqual(result.reasons, noise.filtered)
+
+    def test_context_is_trimmed_when_over_budget(self):
+        diff = make_file_diff("src/app.py", 2, context=40)
+        result = compaction.compact_diff(diff, token_budget=100)
+        self.assertIn("+new line 1", result.text)
+        self.assertNotIn("context line 0\n", result.text)
+        self.assertLessEqual(result.compacted_tokens, 100)
+
+    def test_large_files_are_truncated_to_budget(self):
+        diff = make_file_diff("src/big.py", 5000) + make_file_diff("src/small.py", 3)
+        result = compaction.compact_diff(diff, token_budget=500)
+
+        self.assertLessEqual(result.compacted_tokens, 500)
+        self.assertIn("more lines omitted", result.text)
+        self.assertIn("src/small.py", result.text)
+
+    def test_output_stays_flat_as_diff_grows(self):
+        sizes = [compaction.compact_diff(make_file_diff("src/x.py", n), token_budget=1000, chunk_threshold=10**9).compacted_tokens
+                 for n in (1_000, 10_000, 50_000)]
+        self.assertTrue(all(size <= 1000 for size in sizes))
+
+    def test_diff_above_chunk_threshold_is_not_truncated(self):
+        diff = make_file_diff("src/big.py", 2000)
+        result = compaction.compact_diff(diff, token_budget=500, chunk_threshold=1000)
+        self.assertNotIn("more lines omitted", result.text)
+        self.assertIn("+new line 1999", result.text)
@@ -0,0 +1,148 @@
+import os
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from commitgen import ai, daemon, providers
+
+
+class TestDaemon(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = Path(self.tmp.name) / "d.sock"
+
+        env = patch.dict(os.environ, {"COMMITGEN_DAEMON_SOCKET": str(self.path)})
+        env.start()
+        self.addCleanup(env.stop)
+
+        cache_dir = patch("commitgen.cache.CACHE_DIR", Path(self.tmp.name) / "cache")
+        cache_dir.start()
+        self.addCleanup(cache_dir.stop)
+
+        routing_log = patch("commitgen.routing.LOG_FILE", Path(self.tmp.name) / "routing.jsonl")
+        routing_log.start()
+        self.addCleanup(routing_log.stop)
+
+        self.stub = providers.StubProvider(response="[FEAT]: add login")
+        ai.set_provider(self.stub)
+        self.addCleanup(ai.reset_client)
+
+    def start_daemon(self):
+        ready = threading.Event()
+        thread = threading.Thread(target=daemon.serve, kwargs={"ready": ready}, daemon=True)
+        thread.start()
+        # The socket is listening once `ready` is set; the timeout only
+        # guards against a daemon that never starts.
+        self.assertTrue(ready.wait(timeout=30))
+
+        def stop():
+            if thread.is_alive():
+                daemon.stop()
+                thread.join()
+
+        self.addCleanup(stop)
+        return thread
+
+    def stop_daemon(self, thread):
+        daemon.stop()
+        # serve() removes the socket before the thread ends.
+        thread.join()
+
+    def test_connect_without_daemon(self):
+        self.assertIsNone(daemon.connect())
+        self.assertIsNone(daemon.ping())
+
+    def test_connect_ignores_stale_socket_file(self):
+        self.path.touch()
+        self.assertIsNone(daemon.connect())
+
+    def test_client_forwards_requests(self):
+        self.start_daemon()
+        client = daemon.connect()
+
+        self.assertIsInstance(client, daemon.Client)
+        self.assertEqual(client.generate_commit_message("diff --git a b", "", use_cache=False), "[FEAT]: add login")
+        self.assertEqual(client.refine_commit_message("[FEAT]: x", "more"), "[FEAT]: add login")
+        self.assertEqual("".join(client.stream_commit_message("diff --git a b", "", use_cache=False)), "[FEAT]: add login")
+        self.assertEqual(len(self.stub.prompts), 3)
+
+    def test_blob_pairs_are_forwarded(self):
+        self.start_daemon()
+
+        with patch("commitgen.ai.generate_commit_message", return_value="[FEAT]: add login") as mock_generate:
+            daemon.connect().generate_commit_message("diff --git a b", "", blobs={"a": ("0" * 40, "1" * 40)})
+
+        self.assertEqual(mock_generate.call_args.kwargs["blobs"], {"a": ["0" * 40, "1" * 40]})
+
+    def test_candidates_round_trip_with_sessions(self):
+        self.start_daemon()
+
+        candidates = daemon.connect().generate_candidates("diff --git a b", "", 2, use_cache=False)
+
+        self.assertEqual([c.message for c in candidates], ["[FEAT]: add login"])
+        self.assertIsInstance(candidates[0].session, ai.Session)
+        self.assertEqual(len(self.stub.prompts), 2)
+
+    def test_session_state_round_trips(self):
+        self.start_daemon()
+        client = daemon.connect()
+        session = ai.Session()
+
+        client.generate_commit_message("diff --git a b", "", use_cache=False, session=session)
+        self.assertEqual([m["role"] for m in session.state], ["user", "assistant"])
+
+        "".join(client.stream_refine_commit_message("[FEAT]: add login", "more", session=session))
+        self.assertEqual(len(session.state), 4)
+
+    def test_daemon_errors_fall_back_in_process(self):
+        self.start_daemon()
+        client = daemon.connect()
+
+        # Only the daemon's request handler reads the options, so the
+        # request fails there and succeeds when run in-process.
+        with patch("commitgen.daemon._options", side_effect=RuntimeError("rate limited")):
+            self.assertEqual(client.refine_commit_message("[FEAT]: x", "more"), "[FEAT]: add login")
+            self.assertEqual("".join(client.stream_refine_commit_message("[FEAT]: x", "more")), "[FEAT]: add login")
+            self.assertEqual(len(client.generate_candidates("diff --git a b", "", 1, use_cache=False)), 1)
+
+        self.assertEqual(len(self.stub.prompts), 3)
+
+    def test_daemon_error_after_the_first_chunk_is_raised(self):
+        self.start_daemon()
+
+        def chunks(*args, **kwargs):
+            yield "[FEAT]: "
+            raise RuntimeError("connection reset")
+
+        with patch("commitgen.ai.stream_commit_message", side_effect=chunks):
+            with self.assertRaises(daemon.DaemonError):
+                "".join(daemon.connect().stream_commit_message("diff --git a b", ""))
+
+    def test_client_falls_back_when_daemon_goes_away(self):
+        thread = self.start_daemon()
+        client = daemon.connect()
+
+        self.stop_daemon(thread)
+
+        self.assertFalse(self.path.exists())
+        self.assertEqual(client.refine_commit_message("[FEAT]: x", "more"), "[FEAT]: add login")
+        self.assertEqual("".join(client.stream_refine_commit_message("[FEAT]: x", "more")), "[FEAT]: add login")
+
+    def test_second_daemon_refuses_to_start(self):
+        self.start_daemon()
+
+        with self.assertRaises(daemon.DaemonError):
+            daemon.serve()
+
+    @patch.dict(os.environ, {"COMMITGEN_DAEMON": "off"})
+    def test_daemon_can_be_disabled(self):
+        self.start_daemon()
+        self.assertIsNone(daemon.connect())
+
+
+if __name__ == "__main__":
+    unittest.main()
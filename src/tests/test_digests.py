@@ -0,0 +1,168 @@
+import os
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+from commitgen import ai, digests, metrics, providers
+
+
+def file_diff(path: str, marker: str, lines: int = 40) -> str:
+    return (
+        f"diff --git a/{path} b/{path}\n--- a/{path}\n+++ b/{path}\n@@ -1 +1,{lines} @@\n"
+        + "".join(f"+{marker} {n}\n" for n in range(lines))
+    )
+
+
+class SummaryStub(providers.StubProvider):
+    """
+    Answers file summary prompts with the file's path and the rest with a
+    fixed message, so tests can tell which files were sent to the model.
+    """
+
+    def complete(self, prompt, session=None):
+        self.prompts.append(prompt)
+        if "GIT DIFF PART:" in prompt:
+            return "- [FEAT]: change " + prompt.split("diff --git a/", 1)[1].split(" ", 1)[0]
+        return "[FEAT]: merged"
+
+
+class DigestTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        for target, path in (
+            ("commitgen.digests.INDEX_FILE", "digests.json"),
+            ("commitgen.cache.CACHE_DIR", "cache"),
+            ("commitgen.routing.LOG_FILE", "routing.jsonl"),
+        ):
+            patcher = patch(target, Path(self.tmp.name) / path)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.addCleanup(self.tmp.cleanup)
+        ai.reset_client()
+        self.addCleanup(ai.reset_client)
+
+
+class TestDigestIndex(DigestTestCase):
+
+    def test_key_uses_blob_pair_over_text(self):
+        a = digests.make_key("app.py", ("aaa", "bbb"), "diff one", "model")
+        b = digests.make_key("app.py", ("aaa", "bbb"), "diff two", "model")
+
+        self.assertEqual(a, b)
+        self.assertNotEqual(a, digests.make_key("app.py", ("aaa", "ccc"), "diff one", "model"))
+        self.assertNotEqual(a, digests.make_key("app.py", ("aaa", "bbb"), "diff one", "other-model"))
+        self.assertNotEqual(digests.make_key("app.py", None, "diff one", "model"),
+                            digests.make_key("app.py", None, "diff two", "model"))
+
+    def test_save_merges_and_keeps_most_recent(self):
+        digests.save({"old": {"summary": "- old", "used": time.time() - 10}})
+        digests.save({"new": digests.entry("- new")})
+
+        self.assertEqual(set(digests.load()), {"old", "new"})
+
+        with patch.dict(os.environ, {"COMMITGEN_DIGEST_MAX_ENTRIES": "1"}):
+            digests.save({})
+
+        self.assertEqual(set(digests.load()), {"new"})
+
+    @patch.dict(os.environ, {"COMMITGEN_CACHE_TTL": "60"})
+    def test_expired_entries_are_dropped(self):
+        digests.save({"stale": {"summary": "- stale", "used": time.time() - 120}})
+        self.assertEqual(digests.load(), {})
+
+    def test_corrupt_index_is_empty(self):
+        digests.INDEX_FILE.write_text("not json")
+        self.assertEqual(digests.load(), {})
+
+
+@patch.dict(os.environ, {"COMMITGEN_DIGEST_THRESHOLD": "50"})
+class TestFileSummaries(DigestTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.stub = SummaryStub()
+        ai.set_provider(self.stub)
+
+    def summary_prompts(self) -> list:
+        return [prompt for prompt in self.stub.prompts if "GIT DIFF PART:" in prompt]
+
+    def test_only_changed_files_are_summarized_again(self):
+        first = file_diff("api.py", "v1") + file_diff("docs.md", "v1") + file_diff("tests.py", "v1")
+        blobs = {"api.py": ("a0", "a1"), "docs.md": ("d0", "d1"), "tests.py": ("t0", "t1")}
+
+        self.assertEqual(ai.generate_commit_message(first, "", blobs=blobs), "[FEAT]: merged")
+        self.assertEqual(len(self.summary_prompts()), 3)
+
+        second = file_diff("api.py", "v2") + file_diff("docs.md", "v1") + file_diff("tests.py", "v1")
+        self.stub.prompts.clear()
+        ai.generate_commit_message(second, "", blobs={**blobs, "api.py": ("a0", "a2")})
+
+        sent = self.summary_prompts()
+        self.assertEqual(len(sent), 1)
+        self.assertIn("+v2 0", sent[0])
+        reduce_prompt = self.stub.prompts[-1]
+        for path in ("api.py", "docs.md", "tests.py"):
+            self.assertIn(f"{path}:\n- [FEAT]: change {path}", reduce_prompt)
+
+    def test_summaries_keep_diff_order_and_compacted_lines(self):
+        diff = (
+            file_diff("b.py", "x") + "[summarized] poetry.lock (lockfile): +10 -2 lines\n" + file_diff("a.py", "x")
+        )
+
+        summaries = ai.summarize_files(diff)
+
+        self.assertEqual(summaries, [
+            "b.py:\n- [FEAT]: change b.py",
+            "[summarized] poetry.lock (lockfile): +10 -2 lines",
+            "a.py:\n- [FEAT]: change a.py",
+        ])
+        self.assertEqual(len(self.summary_prompts()), 2)
+
+    def test_no_cache_summarizes_every_file(self):
+        diff = file_diff("a.py", "x") + file_diff("b.py", "x")
+        ai.summarize_files(diff)
+        self.stub.prompts.clear()
+
+        ai.summarize_files(diff, use_cache=False)
+
+        self.assertEqual(len(self.summary_prompts()), 2)
+
+    def test_hits_and_misses_are_recorded(self):
+        ai.summarize_files(file_diff("a.py", "x"))
+        recorder = metrics.start()
+        try:
+            ai.summarize_files(file_diff("a.py", "x") + file_diff("b.py", "x"))
+        finally:
+            metrics.stop()
+
+        self.assertEqual(recorder.values["digest_hits"], 1)
+        self.assertEqual(recorder.values["digest_misses"], 1)
+
+    def test_small_or_single_file_diffs_use_one_request(self):
+        self.assertFalse(ai.uses_file_digests(file_diff("a.py", "x", lines=200)))
+        self.assertFalse(ai.uses_file_digests(file_diff("a.py", "x", lines=1) + file_diff("b.py", "x", lines=1)))
+        self.assertTrue(ai.uses_file_digests(file_diff("a.py", "x") + file_diff("b.py", "x")))
+
+        with patch.dict(os.environ, {"COMMITGEN_FILE_DIGESTS": "off"}):
+            self.assertFalse(ai.uses_file_digests(file_diff("a.py", "x") + file_diff("b.py", "x")))
+
+
+
+class TestDigestThreshold(DigestTestCase):
+
+    def test_diff_within_the_budget_is_one_request(self):
+        stub = SummaryStub()
+        ai.set_provider(stub)
+        diff = "".join(file_diff(f"m{i}.py", "value", lines=600) for i in range(4))
+        self.assertLess(ai.compaction.estimate_tokens(diff), ai.TOKEN_BUDGET)
+
+        ai.generate_commit_message(diff, "", use_cache=False)
+
+        self.assertEqual(len(stub.prompts), 1)
+        self.assertIn("GIT DIFF:", stub.prompts[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
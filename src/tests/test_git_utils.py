@@ -1,7 +1,26 @@
+import io
+import os
+import subprocess
+import tempfile
 import unittest
-from unittest.mock import patch
+from unittest.mock import MagicMock, patch
 import commitgen.git_utils as git_utils
 
+
+def make_process(output: bytes, running=False):
+    process = MagicMock()
+    process.stdout = io.BytesIO(output)
+    process.poll.return_value = None if running else 0
+    return process
+
+
+LOCKFILE_DIFF = (
+    b"diff --git a/app.py b/app.py\n"
+    b"--- a/app.py\n+++ b/app.py\n@@ -1 +1,2 @@\n ctx\n+new\n"
+    b"diff --git a/poetry.lock b/poetry.lock\n"
+    b"--- a/poetry.lock\n+++ b/poetry.lock\n@@ -1,2 +1,3 @@\n-old\n+one\n+two\n"
+)
+
 class TestGitUtils(unittest.TestCase):
 
     @patch("commitgen.git_utils.subprocess.run")
@@ -19,27 +38,6 @@ class TestGitUtils(unittest.TestCase):
         git_utils.stage_all_changes()
         mock_run.assert_called_once_with(["git", "add", "."])
 
-    @patch("commitgen.git_utils.subprocess.run")
-    def test_has_staged_changes_true(self, mock_run):
-        mock_run.return_value.returncode = 1
-        self.assertTrue(git_utils.has_staged_changes())
-
-    @patch("commitgen.git_utils.subprocess.run")
-    def test_has_staged_changes_false(self, mock_run):
-        mock_run.return_value.returncode = 0
-        self.assertFalse(git_utils.has_staged_changes())
-
-    @patch("commitgen.git_utils.subprocess.run")
-    def test_get_staged_diff_success(self, mock_run):
-        mock_run.return_value.returncode = 0
-        mock_run.return_value.stdout = "diff --git a/file b/file"
-        self.assertEqual(git_utils.get_staged_diff(), "diff --git a/file b/file")
-
-    @patch("commitgen.git_utils.subprocess.run")
-    def test_get_staged_diff_failure(self, mock_run):
-        mock_run.return_value.returncode = 1
-        self.assertEqual(git_utils.get_staged_diff(), "")
-
     @patch("commitgen.git_utils.subprocess.run")
     def test_commit_changes(self, mock_run):
         git_utils.commit_changes("feat: test")
@@ -50,13 +48,178 @@ class TestGitUtils(unittest.TestCase):
         git_utils.push_changes()
         mock_run.assert_called_once()
 
-    @patch("commitgen.git_utils.subprocess.run")
-    def test_get_modified_files(self, mock_run):
-        mock_run.return_value.stdout = " M file1\n?? file2\n"
-        files = git_utils.get_modified_files()
-        self.assertEqual(files, ["file1", "file2"])
-
     @patch("commitgen.git_utils.subprocess.run")
     def test_stage_file(self, mock_run):
         git_utils.stage_file("file1")
         mock_run.assert_called_once_with(["git", "add", "file1"])
+
+    @patch("commitgen.git_utils.subprocess.run")
+    def test_take_snapshot_outside_repo(self, mock_run):
+        mock_run.return_value.returncode = 128
+        snapshot = git_utils.take_snapshot()
+        self.assertFalse(snapshot.is_repo)
+        mock_run.assert_called_once()
+
+    @patch("commitgen.git_utils.subprocess.Popen")
+    @patch("commitgen.git_utils.subprocess.run")
+    def test_take_snapshot_parses_status_and_reads_diff_once(self, mock_run, mock_popen):
+        status = MagicMock(returncode=0, stdout=(
+            "1 M. N... 100644 100644 100644 aaa bbb staged.py\0"
+            "1 .M N... 100644 100644 100644 aaa aaa unstaged.py\0"
+            "2 RM N... 100644 100644 100644 ccc ccc R100 new name.py\0old name.py\0"
+            "? untracked.txt\0"
+        ))
+        mock_run.return_value = status
+        mock_popen.return_value = make_process(b"diff --git a/staged.py b/staged.py")
+
+        snapshot = git_utils.take_snapshot()
+
+        self.assertTrue(snapshot.is_repo)
+        self.assertEqual(snapshot.staged_files, ["staged.py", "new name.py"])
+        self.assertEqual(snapshot.unstaged_files, ["unstaged.py", "new name.py"])
+        self.assertEqual(snapshot.untracked_files, ["untracked.txt"])
+        self.assertEqual(snapshot.modified_files, ["unstaged.py", "new name.py", "untracked.txt"])
+        self.assertEqual(snapshot.diff, "diff --git a/staged.py b/staged.py")
+        self.assertEqual(snapshot.diff_bytes, len("diff --git a/staged.py b/staged.py"))
+        self.assertEqual(snapshot.blobs, {"staged.py": ("aaa", "bbb"), "new name.py": ("ccc", "ccc")})
+        self.assertEqual(set(snapshot.timings), {"status", "diff"})
+        mock_run.assert_called_once()
+        mock_popen.assert_called_once()
+
+    @patch("commitgen.git_utils.subprocess.run")
+    def test_take_snapshot_skips_diff_when_nothing_staged(self, mock_run):
+        mock_run.return_value = MagicMock(returncode=0, stdout="? untracked.txt\0")
+        snapshot = git_utils.take_snapshot()
+        self.assertFalse(snapshot.has_staged_changes)
+        self.assertEqual(snapshot.diff, "")
+        mock_run.assert_called_once()
+
+    @patch("commitgen.git_utils.subprocess.Popen")
+    def test_iter_staged_diff_yields_per_file(self, mock_popen):
+        mock_popen.return_value = make_process(LOCKFILE_DIFF)
+        files = list(git_utils.iter_staged_diff())
+        self.assertEqual([f.path for f in files], ["app.py", "poetry.lock"])
+        self.assertEqual(files[1].hunks[0][1:], ["-old\n", "+one\n", "+two\n"])
+
+    @patch("commitgen.git_utils.AttributeReader.__call__", return_value="")
+    @patch("commitgen.git_utils.subprocess.Popen")
+    def test_read_staged_diff_counts_lockfile_hunks_instead_of_keeping_them(self, mock_popen, _):
+        mock_popen.return_value = make_process(LOCKFILE_DIFF)
+        diff = git_utils.read_staged_diff()
+        self.assertIn("+new", diff)
+        self.assertNotIn("+one", diff)
+        self.assertIn("[hunks omitted] (lockfile) +2 -1 lines", diff)
+
+    @patch("commitgen.git_utils.AttributeReader.__call__", return_value="")
+    @patch("commitgen.git_utils.subprocess.Popen")
+    def test_read_staged_diff_stops_and_kills_git_at_cap(self, mock_popen, _):
+        process = make_process(LOCKFILE_DIFF * 100, running=True)
+        mock_popen.return_value = process
+        stats = {}
+
+        diff = git_utils.read_staged_diff(max_bytes=100, stats=stats)
+
+        self.assertTrue(stats["truncated"])
+        self.assertIn("diff truncated after 100 bytes", diff)
+        self.assertLess(len(diff), 300)
+        process.kill.assert_called_once()
+
+    @patch("commitgen.git_utils.subprocess.Popen")
+    def test_iter_staged_diff_reads_no_further_than_the_cap(self, mock_popen):
+        # One minified line far larger than the cap.
+        output = b"diff --git a/app.min.js b/app.min.js\n+" + b"x" * 1_000_000 + b"\n"
+        mock_popen.return_value = make_process(output, running=True)
+        stats = {}
+
+        list(git_utils.iter_staged_diff(max_bytes=100, stats=stats))
+
+        self.assertTrue(stats["truncated"])
+        self.assertEqual(stats["bytes_read"], 101)
+
+    def test_read_staged_diff_honours_gitattributes(self):
+        with tempfile.TemporaryDirectory() as root:
+            subprocess.run(["git", "-C", root, "init", "-q"], check=True)
+            files = {
+                ".gitattributes": "gen/* linguist-generated\nassets.bin -diff\n",
+                "gen/schema.py": "A = 1\nB = 2\n",
+                "assets.bin": "text, but not for diffing\n",
+                "app.py": "print('hi')\n",
+            }
+            for name, text in files.items():
+                os.makedirs(os.path.dirname(os.path.join(root, name)), exist_ok=True)
+                with open(os.path.join(root, name), "w") as handle:
+                    handle.write(text)
+            subprocess.run(["git", "-C", root, "add", "-A"], check=True)
+            stats = {}
+
+            diff = git_utils.read_staged_diff(cwd=root, stats=stats)
+
+        self.assertIn("+print('hi')", diff)
+        self.assertNotIn("+A = 1", diff)
+        self.assertIn("[hunks omitted] (linguist-generated) +2 -0 lines", diff)
+        self.assertIn("Binary files /dev/null and b/assets.bin differ", diff)
+        self.assertEqual(stats["filtered"], {"gen/schema.py": "linguist-generated"})
+
+    def test_take_snapshot_lists_new_directories_once(self):
+        with tempfile.TemporaryDirectory() as root:
+            subprocess.run(["git", "-C", root, "init", "-q"], check=True)
+            os.makedirs(os.path.join(root, "build", "out"))
+            for name in ("build/a.txt", "build/out/b.txt", "notes.txt"):
+                with open(os.path.join(root, name), "w") as handle:
+                    handle.write("x\n")
+
+            snapshot = git_utils.take_snapshot(cwd=root)
+
+        self.assertEqual(sorted(snapshot.untracked_files), ["build/", "notes.txt"])
+
+
+class TestPreviewStageAllDiff(unittest.TestCase):
+
+    def test_preview_leaves_real_index_untouched(self):
+        with tempfile.TemporaryDirectory() as root:
+            subprocess.run(["git", "-C", root, "init", "-q"], check=True)
+            with open(f"{root}/app.py", "w") as handle:
+                handle.write("print('hi')\n")
+
+            diff_text = git_utils.preview_stage_all_diff(cwd=root)
+            staged = subprocess.run(
+                ["git", "-C", root, "diff", "--cached", "--name-only"],
+                stdout=subprocess.PIPE, text=True, check=True,
+            ).stdout
+
+        self.assertIn("diff --git a/app.py b/app.py", diff_text)
+        self.assertEqual(staged, "")
+
+    def test_preview_outside_repo_is_empty(self):
+        with tempfile.TemporaryDirectory() as root:
+            self.assertEqual(git_utils.preview_stage_all_diff(cwd=root), "")
+
+
+class TestStagedBlobPairs(unittest.TestCase):
+
+    def test_blob_pairs_match_status_and_follow_renames(self):
+        with tempfile.TemporaryDirectory() as root:
+            def git(*args):
+                subprocess.run(["git", "-C", root, *args], check=True, stdout=subprocess.DEVNULL)
+
+            git("init", "-q")
+            with open(f"{root}/old.py", "w") as handle:
+                handle.write("".join(f"line {n}\n" for n in range(20)))
+            git("add", ".")
+            git("-c", "user.name=t", "-c", "user.email=t@example.com", "commit", "-qm", "init")
+            git("mv", "old.py", "new.py")
+            with open(f"{root}/app.py", "w") as handle:
+                handle.write("print('hi')\n")
+            git("add", ".")
+
+            blobs = git_utils.staged_blob_pairs(cwd=root)
+            snapshot = git_utils.take_snapshot(include_diff=False, cwd=root)
+
+        self.assertEqual(set(blobs), {"app.py", "new.py"})
+        self.assertEqual(blobs["app.py"][0], "0" * 40)
+        self.assertEqual(blobs["new.py"][0], blobs["new.py"][1])
+        self.assertEqual(snapshot.blobs, blobs)
+
+    def test_blob_pairs_outside_repo_are_empty(self):
+        with tempfile.TemporaryDirectory() as root:
+            self.assertEqual(git_utils.staged_blob_pairs(cwd=root), {})
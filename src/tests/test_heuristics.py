@@ -0,0 +1,126 @@
+import os
+import time
+import unittest
+from commitgen import heuristics
+
+
+def file_diff(path, added=1, removed=0, new=False, deleted=False):
+    header = f"diff --git a/{path} b/{path}\n"
+    if new:
+        header += "new file mode 100644\n--- /dev/null\n"
+    elif deleted:
+        header += "deleted file mode 100644\n"
+    else:
+        header += f"--- a/{path}\n"
+    header += f"+++ b/{path}\n" if not deleted else "+++ /dev/null\n"
+    body = f"@@ -1,{removed} +1,{added} @@\n"
+    body += "".join(f"-old {i}\n" for i in range(removed))
+    body += "".join(f"+new {i}\n" for i in range(added))
+    return header + body
+
+
+def synthetic_diff(files):
+    kinds = ["src/module_{}.py", "tests/test_module_{}.py", "docs/page_{}.md", "src/feature_{}.py"]
+    return "".join(
+        file_diff(kinds[i % len(kinds)].format(i), added=5 + i % 7, removed=i % 3)
+        for i in range(files)
+    )
+
+
+class TestHeuristics(unittest.TestCase):
+
+    def test_new_source_file_is_feat(self):
+        msg = heuristics.generate_heuristic_message(file_diff("src/login.py", added=30, new=True))
+        self.assertEqual(msg, "[FEAT]: add login.py")
+
+    def test_small_balanced_edit_is_fix(self):
+        msg = heuristics.generate_heuristic_message(file_diff("src/auth.py", added=2, removed=2))
+        self.assertEqual(msg, "[FIX]: fix issues in auth.py")
+
+    def test_mixed_change_types_produce_one_line_each_in_order(self):
+        diff = (
+            file_diff(".github/workflows/ci.yml", added=3, removed=1)
+            + file_diff("README.md", added=10)
+            + file_diff("src/tests/test_api.py", added=20, new=True)
+            + file_diff("src/api.py", added=40)
+            + file_diff("pyproject.toml", added=1, removed=1)
+        )
+        lines = heuristics.generate_heuristic_message(diff).splitlines()
+
+        self.assertEqual(lines, [
+            "[FEAT]: update api.py",
+            "[DOCS]: update README.md",
+            "[TEST]: add tests in test_api.py",
+            "[CI]: update CI config in ci.yml",
+            "[CHORE]: update pyproject.toml",
+        ])
+
+    def test_deletes_and_renames_are_chores(self):
+        diff = file_diff("src/old.py", removed=10, deleted=True) + (
+            "diff --git a/a.py b/b.py\nsimilarity index 100%\nrename from a.py\nrename to b.py\n"
+        )
+        msg = heuristics.generate_heuristic_message(diff)
+        self.assertEqual(msg, "[CHORE]: update old.py, a.py to b.py")
+
+    def test_compacted_summaries_are_classified(self):
+        diff = "[summarized] poetry.lock (lockfile): +120 -80 lines\n[summarized] docs/logo.png: binary file changed\n"
+        msg = heuristics.generate_heuristic_message(diff)
+        self.assertEqual(msg, "[DOCS]: update logo.png\n[CHORE]: update poetry.lock")
+
+    def test_long_lines_are_capped(self):
+        diff = "".join(file_diff(f"src/a_very_long_module_name_number_{i}.py", added=50) for i in range(3))
+        line = heuristics.generate_heuristic_message(diff)
+        self.assertLessEqual(len(line), heuristics.MAX_LINE_LENGTH)
+
+    def test_many_files_are_summarized(self):
+        diff = "".join(file_diff(f"src/m{i}.py", added=50) for i in range(5))
+        msg = heuristics.generate_heuristic_message(diff)
+        self.assertEqual(msg, "[FEAT]: update m0.py, m1.py, m2.py and 2 more files")
+
+    def test_unrecognised_diff_uses_default_and_context(self):
+        msg = heuristics.generate_heuristic_message("some diff", "extra")
+        self.assertEqual(msg, "[FEAT]: update to codebase\n\nContext: extra")
+
+
+class BenchmarkHeuristics(unittest.TestCase):
+    """
+    Guards that the local engine stays fast and scales linearly with the
+    size of the diff. Timings are the best of a few runs and are only
+    compared with each other by default; set COMMITGEN_BENCHMARKS=1 to also
+    check them against fixed budgets and print them.
+    """
+
+    SIZES = (10, 100, 1_000, 10_000)
+    RUNS = 3
+
+    def measure(self) -> dict:
+        timings = {}
+
+        for files in self.SIZES:
+            diff = synthetic_diff(files)
+            best = None
+            for _ in range(self.RUNS):
+                started = time.perf_counter()
+                msg = heuristics.generate_heuristic_message(diff)
+                elapsed = time.perf_counter() - started
+                best = elapsed if best is None else min(best, elapsed)
+            timings[files] = best
+
+            self.assertTrue(msg.startswith("[FEAT]:"))
+            self.assertTrue(all(len(line) <= heuristics.MAX_LINE_LENGTH for line in msg.splitlines()))
+
+        return timings
+
+    def test_benchmark_scales_linearly(self):
+        timings = self.measure()
+
+        # 100x more files should not cost much more than 100x the time.
+        self.assertLess(timings[10_000], max(timings[100], 0.001) * 300)
+
+    @unittest.skipUnless(os.environ.get("COMMITGEN_BENCHMARKS"), "set COMMITGEN_BENCHMARKS=1 to check fixed budgets")
+    def test_benchmark_budgets(self):
+        timings = self.measure()
+        print("\nheuristic engine: " + ", ".join(f"{n} files {t * 1000:.1f}ms" for n, t in timings.items()))
+
+        self.assertLess(timings[10], 0.05)
+        self.assertLess(timings[100], 0.1)
@@ -0,0 +1,145 @@
+import os
+import subprocess
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+from typer.testing import CliRunner
+from commitgen import ai, hooks, providers
+from commitgen.cli import app
+
+runner = CliRunner()
+
+IDENTITY = {"GIT_AUTHOR_NAME": "Dev", "GIT_AUTHOR_EMAIL": "dev@example.com",
+            "GIT_COMMITTER_NAME": "Dev", "GIT_COMMITTER_EMAIL": "dev@example.com"}
+
+
+def git(root, *args, env=None) -> str:
+    return subprocess.run(
+        ["git", "-C", str(root), *args], check=True, stdout=subprocess.PIPE, text=True,
+        env={**os.environ, **IDENTITY, **(env or {})},
+    ).stdout
+
+
+class HookTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.root = Path(self.tmp.name) / "repo"
+        git(self.tmp.name, "init", "-q", str(self.root))
+
+        for target, value in (
+            ("commitgen.cache.CACHE_DIR", Path(self.tmp.name) / "cache"),
+            ("commitgen.routing.LOG_FILE", Path(self.tmp.name) / "routing.jsonl"),
+            ("commitgen.daemon.connect", lambda: None),
+        ):
+            patcher = patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.stub = providers.StubProvider(response="[DOCS]: describe the project")
+        ai.set_provider(self.stub)
+        self.addCleanup(ai.reset_client)
+
+    def stage(self, name: str, text: str):
+        (self.root / name).write_text(text)
+        git(self.root, "add", name)
+
+
+class TestInstall(HookTestCase):
+
+    def test_install_writes_executable_hooks(self):
+        installed = hooks.install(cwd=self.root)
+
+        self.assertEqual([path.name for path in installed], list(hooks.HOOK_NAMES))
+        for path in installed:
+            self.assertTrue(os.access(path, os.X_OK))
+            self.assertIn("-m commitgen hook run", path.read_text())
+
+    def test_existing_hook_is_kept_only_with_force(self):
+        existing = self.root / ".git" / "hooks" / "prepare-commit-msg"
+        existing.write_text("#!/bin/sh\necho mine\n")
+
+        with self.assertRaises(hooks.HookError):
+            hooks.install(cwd=self.root)
+
+        hooks.install(cwd=self.root, force=True)
+        self.assertIn("echo mine", existing.with_name("prepare-commit-msg.pre-commitgen").read_text())
+
+        hooks.uninstall(cwd=self.root)
+        self.assertEqual(existing.read_text(), "#!/bin/sh\necho mine\n")
+        self.assertFalse((self.root / ".git" / "hooks" / "post-index-change").exists())
+
+
+class TestPrepare(HookTestCase):
+
+    def test_prepared_message_is_keyed_by_index_tree(self):
+        self.stage("README.md", "hello\n")
+
+        prepared = hooks.prepare(cwd=self.root, settle=0)
+
+        self.assertEqual(prepared.tree, git(self.root, "write-tree").strip())
+        self.assertEqual(prepared.message, "[DOCS]: describe the project")
+        self.assertIsNone(hooks.prepare(cwd=self.root, settle=0))
+        self.assertEqual(len(self.stub.prompts), 1)
+
+    def test_fill_reads_the_prepared_message(self):
+        self.stage("README.md", "hello\n")
+        hooks.prepare(cwd=self.root, settle=0)
+        message_file = Path(self.tmp.name) / "COMMIT_EDITMSG"
+        message_file.write_text("# Please enter the commit message\n")
+
+        hooks.fill(message_file, "", cwd=self.root)
+
+        self.assertEqual(message_file.read_text(), "[DOCS]: describe the project\n# Please enter the commit message\n")
+
+    def test_fill_without_prepared_message_uses_heuristics(self):
+        self.stage("app.py", "x = 1\n")
+        message_file = Path(self.tmp.name) / "COMMIT_EDITMSG"
+
+        message = hooks.fill(message_file, "", cwd=self.root)
+
+        self.assertEqual(message, "[FEAT]: add app.py")
+        self.assertEqual(self.stub.prompts, [])
+
+    def test_fill_leaves_explicit_messages_alone(self):
+        self.stage("README.md", "hello\n")
+        hooks.prepare(cwd=self.root, settle=0)
+        message_file = Path(self.tmp.name) / "COMMIT_EDITMSG"
+        message_file.write_text("mine\n")
+
+        self.assertEqual(hooks.fill(message_file, "message", cwd=self.root), "")
+        self.assertEqual(message_file.read_text(), "mine\n")
+
+
+class TestHooksEndToEnd(HookTestCase):
+
+    def test_git_add_prepares_and_git_commit_uses_the_message(self):
+        env = {"HOME": self.tmp.name, "COMMITGEN_PROVIDER": "stub",
+               "COMMITGEN_STUB_RESPONSE": "[DOCS]: prepared in the background"}
+
+        cwd = os.getcwd()
+        os.chdir(self.root)
+        try:
+            result = runner.invoke(app, ["hook", "install"])
+        finally:
+            os.chdir(cwd)
+        self.assertEqual(result.exit_code, 0, result.output)
+
+        (self.root / "README.md").write_text("hello\n")
+        git(self.root, "add", "README.md", env=env)
+
+        prepared = self.root / ".git" / "commitgen"
+        deadline = time.monotonic() + 20
+        while not list(prepared.glob("*.json")) and time.monotonic() < deadline:
+            time.sleep(0.1)
+
+        git(self.root, "commit", "-q", env={**env, "GIT_EDITOR": "true"})
+
+        self.assertEqual(git(self.root, "log", "-1", "--format=%s"), "[DOCS]: prepared in the background\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
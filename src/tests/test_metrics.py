@@ -0,0 +1,66 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from commitgen import metrics
+
+
+class TestMetrics(unittest.TestCase):
+
+    def tearDown(self):
+        metrics.stop()
+
+    def test_spans_are_noops_when_disabled(self):
+        with metrics.span("git.status"):
+            pass
+        metrics.record("diff_bytes", 10)
+
+        self.assertFalse(metrics.enabled())
+        self.assertIsNone(metrics.stop())
+
+    def test_spans_are_aggregated_by_name(self):
+        recorder = metrics.start()
+
+        for _ in range(3):
+            with metrics.span("model.request"):
+                pass
+        metrics.add_span("model.stream", 0.25)
+
+        report = recorder.as_dict()
+        self.assertEqual(report["stages"]["model.request"]["count"], 3)
+        self.assertEqual(report["stages"]["model.stream"], {"count": 1, "total_ms": 250.0})
+
+    def test_record_keeps_first_value_unless_accumulating(self):
+        recorder = metrics.start()
+
+        metrics.record("ttft_ms", 120)
+        metrics.record("ttft_ms", 80)
+        metrics.record("prompt_tokens", 100, accumulate=True)
+        metrics.record("prompt_tokens", 50, accumulate=True)
+
+        report = recorder.as_dict()
+        self.assertEqual(report["ttft_ms"], 120)
+        self.assertEqual(report["prompt_tokens"], 150)
+
+    def test_append_jsonl(self):
+        recorder = metrics.start()
+        with metrics.span("git.diff"):
+            pass
+        metrics.stop()
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "nested" / "metrics.jsonl"
+            metrics.append_jsonl(path, recorder, command="commit")
+            metrics.append_jsonl(path, recorder, command="commit")
+
+            entries = [json.loads(line) for line in path.read_text().splitlines()]
+
+        self.assertEqual(len(entries), 2)
+        self.assertEqual(entries[0]["command"], "commit")
+        self.assertIn("git.diff", entries[0]["stages"])
+        self.assertIn("wall_ms", entries[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
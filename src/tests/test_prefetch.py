@@ -0,0 +1,104 @@
+import threading
+import unittest
+from concurrent.futures import CancelledError
+
+from commitgen.prefetch import Prefetcher
+
+
+class FakeStream:
+    def __init__(self, chunks, gate=None):
+        self.chunks = chunks
+        self.gate = gate
+        self.closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.gate is not None:
+            self.gate.wait(timeout=5)
+        if not self.chunks:
+            raise StopIteration
+        return self.chunks.pop(0)
+
+    def close(self):
+        self.closed = True
+
+
+class TestPrefetcher(unittest.TestCase):
+
+    def test_result_returns_value(self):
+        prefetcher = Prefetcher()
+        prefetcher.start(lambda diff: f"[FEAT]: {diff}", "add login")
+
+        self.assertEqual(prefetcher.result(timeout=5), "[FEAT]: add login")
+        self.assertFalse(prefetcher.pending)
+
+    def test_result_joins_streamed_chunks(self):
+        stream = FakeStream(["[FEAT]: ", "add login"])
+        prefetcher = Prefetcher()
+        prefetcher.start(lambda: stream)
+
+        self.assertEqual(prefetcher.result(timeout=5), "[FEAT]: add login")
+        self.assertTrue(stream.closed)
+
+    def test_result_raises_worker_exception(self):
+        def fail():
+            raise RuntimeError("boom")
+
+        prefetcher = Prefetcher()
+        prefetcher.start(fail)
+
+        with self.assertRaises(RuntimeError):
+            prefetcher.result(timeout=5)
+
+    def test_result_without_request_raises(self):
+        with self.assertRaises(CancelledError):
+            Prefetcher().result()
+
+    def test_new_request_supersedes_stale_stream(self):
+        gate = threading.Event()
+        stale = FakeStream(["stale ", "message"], gate=gate)
+        started = threading.Event()
+
+        def stale_request():
+            started.set()
+            return stale
+
+        prefetcher = Prefetcher()
+        prefetcher.start(stale_request)
+        started.wait(timeout=5)
+
+        prefetcher.start(lambda: "[FIX]: fresh")
+        gate.set()
+
+        self.assertEqual(prefetcher.result(timeout=5), "[FIX]: fresh")
+
+        for _ in range(50):
+            if stale.closed:
+                break
+            threading.Event().wait(0.01)
+        self.assertTrue(stale.closed)
+
+    def test_cancel_discards_blocking_result(self):
+        release = threading.Event()
+        finished = threading.Event()
+
+        def slow():
+            release.wait(timeout=5)
+            finished.set()
+            return "[FEAT]: too late"
+
+        prefetcher = Prefetcher()
+        prefetcher.start(slow)
+        prefetcher.cancel()
+        release.set()
+        finished.wait(timeout=5)
+
+        self.assertFalse(prefetcher.pending)
+        with self.assertRaises(CancelledError):
+            prefetcher.result()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,262 @@
+import os
+import statistics
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from commitgen import ai, cache, providers
+from tests.fake_openai import FakeOpenAIServer
+
+DIFF = "diff --git a/README.md b/README.md\n--- a/README.md\n+++ b/README.md\n@@ -1 +1,2 @@\n x\n+y\n"
+
+
+class ProviderTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        for target, path in (("commitgen.cache.CACHE_DIR", ""), ("commitgen.routing.LOG_FILE", "routing.jsonl")):
+            patcher = patch(target, Path(self.tmp.name) / path)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.addCleanup(self.tmp.cleanup)
+        ai.reset_client()
+        self.addCleanup(ai.reset_client)
+
+
+class TestStubProvider(ProviderTestCase):
+
+    def test_stub_is_deterministic(self):
+        stub = providers.StubProvider()
+        prompt = ai._build_prompt(DIFF, "")
+
+        self.assertEqual(stub.complete(prompt), "[DOCS]: update README.md")
+        self.assertEqual(stub.complete(prompt), stub.complete(prompt))
+        self.assertEqual("".join(stub.stream(prompt)), "[DOCS]: update README.md")
+
+    def test_stub_ignores_the_rules_after_the_diff(self):
+        stub = providers.StubProvider()
+        diff = "diff --git a/a.py b/a.py\n--- a/a.py\n+++ b/a.py\n@@ -1 +1,3 @@\n x\n+y\n+z\n"
+
+        self.assertEqual(stub.complete(ai._build_prompt(diff, "")), "[FEAT]: update a.py")
+        self.assertEqual(stub.complete(ai._build_prompt(diff, "mention the parser")), "[FEAT]: update a.py")
+
+    def test_stub_returns_configured_response(self):
+        stub = providers.StubProvider(response="[FIX]: handle empty token")
+        ai.set_provider(stub)
+
+        self.assertEqual(ai.generate_commit_message(DIFF, ""), "[FIX]: handle empty token")
+        self.assertEqual(ai.refine_commit_message("[FIX]: x", "more"), "[FIX]: handle empty token")
+        self.assertEqual(len(stub.prompts), 2)
+
+    def test_cache_keys_are_separate_per_provider(self):
+        ai.set_provider(providers.StubProvider(response="[FEAT]: from stub"))
+        ai.generate_commit_message(DIFF, "")
+
+        self.assertIsNotNone(cache.get(cache.make_key(DIFF, "", "stub:stub")))
+        self.assertIsNone(cache.get(cache.make_key(DIFF, "", ai.DEFAULT_MODEL)))
+
+
+class TestCreateProvider(ProviderTestCase):
+
+    @patch.dict(os.environ, {"COMMITGEN_PROVIDER": "stub", "COMMITGEN_STUB_RESPONSE": "[CHORE]: stub"})
+    def test_provider_is_chosen_from_settings(self):
+        provider = ai.get_provider()
+
+        self.assertIsInstance(provider, providers.StubProvider)
+        self.assertEqual(ai.generate_commit_message(DIFF, ""), "[CHORE]: stub")
+
+    @patch.dict(os.environ, {"COMMITGEN_PROVIDER": "compatible", "COMMITGEN_BASE_URL": "http://localhost:8080/v1",
+                             "COMMITGEN_MODEL": "qwen2.5-coder"})
+    def test_compatible_provider_settings(self):
+        provider = ai.create_provider()
+
+        self.assertIsInstance(provider, providers.CompatibleProvider)
+        self.assertEqual(provider.model, "qwen2.5-coder")
+        self.assertEqual(provider.base_url, "http://localhost:8080/v1")
+
+    @patch.dict(os.environ, {"COMMITGEN_BASE_URL": "", "OPENAI_BASE_URL": ""})
+    def test_compatible_provider_requires_base_url(self):
+        with self.assertRaises(ValueError):
+            ai.create_provider("compatible")
+
+    def test_unknown_provider(self):
+        with self.assertRaises(ValueError):
+            ai.create_provider("carrier-pigeon")
+
+
+class TestHTTPProviders(ProviderTestCase):
+
+    def test_compatible_provider_against_local_server(self):
+        with FakeOpenAIServer(reply="[FEAT]: add login") as server:
+            ai.set_provider(providers.CompatibleProvider("local-model", server.base_url))
+
+            message = ai.generate_commit_message(DIFF, "", use_cache=False)
+            streamed = "".join(ai.stream_refine_commit_message(message, "mention OAuth"))
+
+        self.assertEqual(message, "[FEAT]: add login")
+        self.assertEqual(streamed, "[FEAT]: add login")
+        path, body = server.requests[0]
+        self.assertTrue(path.endswith("/chat/completions"))
+        self.assertEqual(body["model"], "local-model")
+
+    @patch("commitgen.ai.ensure_api_key", return_value="fake-key")
+    def test_openai_provider_against_local_server(self, _):
+        with FakeOpenAIServer(reply="[DOCS]: update README") as server:
+            with patch.dict(os.environ, {"OPENAI_BASE_URL": server.base_url}):
+                message = ai.generate_commit_message(DIFF, "", use_cache=False)
+
+        self.assertEqual(message, "[DOCS]: update README")
+        self.assertTrue(server.requests[0][0].endswith("/responses"))
+
+
+class TestSessions(ProviderTestCase):
+
+    @patch("commitgen.ai.ensure_api_key", return_value="fake-key")
+    def test_openai_refinement_references_previous_response(self, _):
+        session = ai.Session()
+
+        with FakeOpenAIServer() as server:
+            with patch.dict(os.environ, {"OPENAI_BASE_URL": server.base_url}):
+                ai.generate_commit_message(DIFF, "", use_cache=False, session=session)
+                self.assertEqual(session.state, "resp_fake")
+
+                "".join(ai.stream_refine_commit_message("[FEAT]: add login", "mention OAuth", session=session))
+
+        first, followup = server.requests[0][1], server.requests[1][1]
+        self.assertNotIn("previous_response_id", first)
+        self.assertEqual(followup["previous_response_id"], "resp_fake")
+        self.assertIn("mention OAuth", followup["input"])
+        self.assertNotIn(DIFF, followup["input"])
+        self.assertLess(len(followup["input"]), len(first["input"]) // 3)
+
+    def test_compatible_provider_keeps_local_conversation_log(self):
+        session = ai.Session()
+
+        with FakeOpenAIServer(reply="[FEAT]: add login") as server:
+            ai.set_provider(providers.CompatibleProvider("local", server.base_url))
+            ai.generate_commit_message(DIFF, "", use_cache=False, session=session)
+            ai.refine_commit_message("[FEAT]: add login", "mention OAuth", session=session)
+
+        messages = server.requests[1][1]["messages"]
+        self.assertEqual([m["role"] for m in messages], ["user", "assistant", "user"])
+        self.assertIn(DIFF, messages[0]["content"])
+        self.assertIn("mention OAuth", messages[2]["content"])
+        self.assertEqual(len(session.state), 4)
+
+    def test_refine_without_session_sends_existing_message(self):
+        stub = providers.StubProvider(response="[FEAT]: refined")
+        ai.set_provider(stub)
+
+        ai.refine_commit_message("[FEAT]: add login", "mention OAuth")
+
+        self.assertIn("EXISTING MESSAGE:\n[FEAT]: add login", stub.prompts[0])
+
+    def test_cached_generation_leaves_session_inactive(self):
+        ai.set_provider(providers.StubProvider(response="[FEAT]: add login"))
+        ai.generate_commit_message(DIFF, "")
+
+        session = ai.Session()
+        ai.generate_commit_message(DIFF, "", session=session)
+
+        self.assertFalse(session.active)
+
+    def test_stub_followup_uses_diff_from_log(self):
+        ai.set_provider(providers.StubProvider())
+        session = ai.Session()
+
+        ai.generate_commit_message(DIFF, "", use_cache=False, session=session)
+        refined = ai.refine_commit_message("[DOCS]: update README.md", "typo", session=session)
+
+        self.assertEqual(refined, "[DOCS]: update README.md")
+
+
+class CyclingStub(providers.StubProvider):
+
+    def __init__(self, replies):
+        super().__init__()
+        self.replies = list(replies)
+
+    def complete(self, prompt, session=None):
+        self.response = self.replies[len(self.prompts) % len(self.replies)]
+        return super().complete(prompt, session)
+
+
+class TestCandidates(ProviderTestCase):
+
+    def test_candidates_are_ranked_and_deduplicated(self):
+        stub = CyclingStub(["updated readme", "[DOCS]: update README.md", "updated readme"])
+        ai.set_provider(stub)
+
+        candidates = ai.generate_candidates(DIFF, "", 3, use_cache=False)
+
+        self.assertEqual([c.message for c in candidates], ["[DOCS]: update README.md", "updated readme"])
+        self.assertEqual(len(stub.prompts), 3)
+        self.assertTrue(all(c.session.active for c in candidates))
+
+    def test_cached_message_counts_as_a_candidate(self):
+        stub = CyclingStub(["[DOCS]: update README.md", "[DOCS]: touch up README"])
+        ai.set_provider(stub)
+        ai.generate_commit_message(DIFF, "")
+
+        candidates = ai.generate_candidates(DIFF, "", 2)
+
+        self.assertEqual(len(stub.prompts), 2)
+        self.assertEqual({c.message for c in candidates}, {"[DOCS]: update README.md", "[DOCS]: touch up README"})
+
+    def test_compatible_provider_samples_in_one_request(self):
+        with FakeOpenAIServer(reply="[DOCS]: update README.md") as server:
+            ai.set_provider(providers.CompatibleProvider("local", server.base_url))
+            candidates = ai.generate_candidates(DIFF, "", 3, use_cache=False)
+
+        self.assertEqual(len(server.requests), 1)
+        self.assertEqual(server.requests[0][1]["n"], 3)
+        self.assertEqual([c.message for c in candidates], ["[DOCS]: update README.md"])
+        self.assertEqual([m["role"] for m in candidates[0].session.state], ["user", "assistant"])
+
+
+class BenchmarkProviders(ProviderTestCase):
+    """
+    Compares per-request latency of each provider against the same local
+    stand-in server, so transport overhead is measured rather than model time.
+    Only the relative order is asserted; set COMMITGEN_BENCHMARKS=1 to print
+    the medians.
+    """
+
+    REQUESTS = 20
+
+    def _measure(self, provider) -> list:
+        ai.set_provider(provider)
+        timings = []
+
+        for i in range(self.REQUESTS):
+            started = time.perf_counter()
+            message = ai.generate_commit_message(f"{DIFF}+line {i}\n", "", use_cache=False)
+            timings.append(time.perf_counter() - started)
+            self.assertTrue(message.startswith("["))
+
+        return timings
+
+    @patch("commitgen.ai.ensure_api_key", return_value="fake-key")
+    def test_benchmark_provider_latency(self, _):
+        with FakeOpenAIServer() as server:
+            with patch.dict(os.environ, {"OPENAI_BASE_URL": server.base_url}):
+                results = {
+                    "openai": self._measure(ai.create_provider("openai")),
+                    "compatible": self._measure(providers.CompatibleProvider("local", server.base_url)),
+                    "stub": self._measure(providers.StubProvider()),
+                }
+
+        p50 = {name: statistics.median(timings) for name, timings in results.items()}
+        if os.environ.get("COMMITGEN_BENCHMARKS"):
+            print("\nprovider p50 latency: " + ", ".join(f"{name} {t * 1000:.2f}ms" for name, t in p50.items()))
+
+        self.assertEqual(len(server.requests), 2 * self.REQUESTS)
+        # The in-process stub never touches the network.
+        self.assertLess(p50["stub"], p50["openai"])
+        self.assertLess(p50["stub"], p50["compatible"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,203 @@
+import os
+import subprocess
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+from typer.testing import CliRunner
+from commitgen import pushqueue
+from commitgen.cli import app
+
+runner = CliRunner()
+
+IDENTITY = {"GIT_AUTHOR_NAME": "Dev", "GIT_AUTHOR_EMAIL": "dev@example.com",
+            "GIT_COMMITTER_NAME": "Dev", "GIT_COMMITTER_EMAIL": "dev@example.com"}
+
+
+def git(root, *args) -> str:
+    return subprocess.run(
+        ["git", "-C", str(root), *args], check=True, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True,
+        env={**os.environ, **IDENTITY},
+    ).stdout.strip()
+
+
+class PushQueueTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.home = Path(self.tmp.name)
+        config = self.home / ".config" / "commitgen"
+
+        for name, path in (
+            ("QUEUE_DIR", config / "push-queue"),
+            ("LOG_FILE", config / "push.log"),
+            ("SEEN_FILE", config / "push.seen"),
+        ):
+            patcher = patch.object(pushqueue, name, path)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.remote = self.home / "remote.git"
+        self.root = self.home / "repo"
+        git(self.home, "init", "-q", "--bare", str(self.remote))
+        git(self.home, "init", "-q", "-b", "main", str(self.root))
+        git(self.root, "remote", "add", "origin", str(self.remote))
+        self.commit("first")
+        git(self.root, "push", "-q", "-u", "origin", "main")
+
+    def commit(self, message: str) -> str:
+        git(self.root, "commit", "-q", "--allow-empty", "-m", message)
+        return git(self.root, "rev-parse", "HEAD")
+
+
+class TestQueue(PushQueueTestCase):
+
+    @patch("commitgen.pushqueue.start_worker")
+    def test_pending_pushes_of_a_branch_are_coalesced(self, start_worker):
+        self.commit("second")
+        pushqueue.enqueue(cwd=self.root)
+        head = self.commit("third")
+        pushqueue.enqueue(cwd=self.root)
+
+        jobs = pushqueue.pending()
+
+        self.assertEqual([(job.branch, job.commit) for job in jobs], [("main", head)])
+        self.assertEqual(start_worker.call_count, 2)
+
+    @patch("commitgen.pushqueue.start_worker")
+    def test_worker_pushes_and_logs_the_result(self, _):
+        head = self.commit("second")
+        pushqueue.enqueue(cwd=self.root)
+
+        self.assertEqual(pushqueue.run_worker(), 1)
+
+        self.assertEqual(git(self.remote, "rev-parse", "main"), head)
+        self.assertEqual(pushqueue.pending(), [])
+        [entry] = pushqueue.unseen()
+        self.assertEqual((entry["status"], entry["commit"], entry["attempts"]), ("pushed", head, 1))
+        self.assertEqual(pushqueue.unseen(), [])
+
+    @patch("commitgen.pushqueue.start_worker")
+    def test_detached_head_is_not_queued(self, _):
+        git(self.root, "checkout", "-q", "--detach")
+        self.assertIsNone(pushqueue.enqueue(cwd=self.root))
+
+    def test_worker_exits_while_another_holds_the_lock(self):
+        self.assertTrue(pushqueue._acquire())
+        self.addCleanup(pushqueue._release)
+
+        self.assertEqual(pushqueue.run_worker(), 0)
+
+    def test_empty_lock_is_only_trusted_briefly(self):
+        lock = pushqueue._lock_path()
+        lock.parent.mkdir(parents=True)
+        lock.touch()
+        self.assertTrue(pushqueue._worker_alive())
+
+        os.utime(lock, (time.time() - 60, time.time() - 60))
+
+        self.assertFalse(pushqueue._worker_alive())
+        self.assertTrue(pushqueue._acquire())
+        self.addCleanup(pushqueue._release)
+
+
+class TestPush(PushQueueTestCase):
+
+    def job(self) -> pushqueue.PushJob:
+        return pushqueue.PushJob(str(self.root), "main", self.commit("second"), time.time())
+
+    @patch("commitgen.resilience.backoff", return_value=0)
+    def test_transient_failures_are_retried(self, _):
+        original = subprocess.run
+        failures = [MagicMock(returncode=128, stdout="", stderr="fatal: unable to access: Could not resolve host\n")]
+
+        def run(args, **kwargs):
+            if "push" in args and failures:
+                return failures.pop()
+            return original(args, **kwargs)
+
+        with patch("commitgen.pushqueue.subprocess.run", side_effect=run):
+            entry = pushqueue.push(self.job(), retries=2)
+
+        self.assertEqual((entry["status"], entry["attempts"]), ("pushed", 2))
+
+    def test_rejected_push_is_not_retried(self):
+        other = self.home / "other"
+        git(self.home, "clone", "-q", "--branch", "main", str(self.remote), str(other))
+        git(other, "commit", "-q", "--allow-empty", "-m", "theirs")
+        git(other, "push", "-q")
+
+        entry = pushqueue.push(self.job(), retries=3)
+
+        self.assertEqual((entry["status"], entry["attempts"]), ("failed", 1))
+        self.assertIn("[rejected]", entry["error"])
+
+    def test_branch_without_upstream_fails_without_pushing(self):
+        git(self.root, "checkout", "-q", "-b", "feature")
+        job = pushqueue.PushJob(str(self.root), "feature", self.commit("wip"), time.time())
+
+        entry = pushqueue.push(job)
+
+        self.assertEqual((entry["status"], entry["attempts"]), ("failed", 0))
+        self.assertIn("no upstream", entry["error"])
+
+
+class TestCommandLine(PushQueueTestCase):
+
+    def invoke(self, args: list):
+        cwd = os.getcwd()
+        os.chdir(self.root)
+        try:
+            return runner.invoke(app, args)
+        finally:
+            os.chdir(cwd)
+
+    def test_failed_background_push_is_reported_on_the_next_run(self):
+        pushqueue._log({"repo": str(self.root), "branch": "main", "commit": "abcdef123", "status": "failed",
+                        "attempts": 4, "error": "fatal: unable to access"})
+
+        version = self.invoke(["version"])
+        first = self.invoke(["commit", "--offline", "--no-daemon"])
+        second = self.invoke(["commit", "--offline", "--no-daemon"])
+
+        self.assertNotIn("Background push", version.output)
+        self.assertIn("Background push of main (abcdef1)", first.output)
+        self.assertIn("fatal: unable to access", first.output)
+        self.assertNotIn("Background push", second.output)
+
+    @patch("commitgen.pushqueue.start_worker")
+    @patch("commitgen.cli.git_utils.push_changes")
+    def test_background_push_returns_without_pushing(self, push_changes, start_worker):
+        (self.root / "README.md").write_text("hello\n")
+        git(self.root, "add", "README.md")
+
+        with patch.dict(os.environ, IDENTITY):
+            result = self.invoke(["commit", "--auto", "--offline", "--no-daemon", "--background-push"])
+
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn("Pushing main in the background", result.output)
+        push_changes.assert_not_called()
+        start_worker.assert_called_once()
+        self.assertEqual([job.commit for job in pushqueue.pending()], [git(self.root, "rev-parse", "HEAD")])
+
+
+class TestDetachedWorker(PushQueueTestCase):
+
+    def test_enqueue_starts_a_worker_that_drains_the_queue(self):
+        head = self.commit("second")
+
+        with patch.dict(os.environ, {"HOME": str(self.home)}):
+            pushqueue.enqueue(cwd=self.root)
+
+        deadline = time.monotonic() + 20
+        while not pushqueue.read_log() and time.monotonic() < deadline:
+            time.sleep(0.1)
+
+        self.assertEqual(git(self.remote, "rev-parse", "main"), head)
+        self.assertEqual(pushqueue.read_log()[-1]["status"], "pushed")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+import unittest
+from commitgen import ranking
+
+DIFF = (
+    "diff --git a/app.py b/app.py\n--- a/app.py\n+++ b/app.py\n@@ -1 +1,3 @@\n x\n+y\n+z\n"
+    "diff --git a/README.md b/README.md\n--- a/README.md\n+++ b/README.md\n@@ -1 +1,2 @@\n x\n+y\n"
+)
+
+
+class TestRanking(unittest.TestCase):
+
+    def test_expected_types_group_code_changes(self):
+        self.assertEqual(ranking.expected_types(DIFF), {"CODE", "DOCS"})
+
+    def test_complete_valid_message_scores_full_marks(self):
+        score, issues = ranking.score("[FEAT]: add y\n[DOCS]: document y", {"CODE", "DOCS"})
+
+        self.assertEqual(score, 1.0)
+        self.assertEqual(issues, [])
+
+    def test_plain_conventional_prefixes_are_valid(self):
+        score, _ = ranking.score("feat(app): add y\ndocs: document y", {"CODE", "DOCS"})
+        self.assertEqual(score, 1.0)
+
+    def test_problems_lower_the_score_and_are_reported(self):
+        score, issues = ranking.score("Added y to the app\n[FEAT]: " + "x" * 120, {"CODE", "DOCS"})
+
+        self.assertEqual(score, 0.5)
+        self.assertEqual(issues, [
+            "1 line(s) without a commit type prefix",
+            "1 line(s) over 100 characters",
+            "no DOCS change",
+        ])
+
+    def test_rank_orders_best_first_and_drops_duplicates(self):
+        candidates = [
+            ranking.Candidate("[FEAT]: add y"),
+            ranking.Candidate("[FEAT]: add y\n[DOCS]: document y"),
+            ranking.Candidate("[FEAT]: add y  "),
+            ranking.Candidate("updated stuff"),
+        ]
+
+        ranked = ranking.rank(candidates, DIFF)
+
+        self.assertEqual([c.message.strip() for c in ranked],
+                         ["[FEAT]: add y\n[DOCS]: document y", "[FEAT]: add y", "updated stuff"])
+        self.assertGreater(ranked[0].score, ranked[1].score)
+
+    def test_empty_message_scores_zero(self):
+        self.assertEqual(ranking.score("  ", {"CODE"}), (0.0, ["empty message"]))
+
+    def test_candidate_round_trips_through_dict(self):
+        from dataclasses import asdict
+
+        candidate = ranking.Candidate("[FEAT]: add y", 0.9, ["note"], ranking.Session(state="resp_1"))
+
+        self.assertEqual(ranking.Candidate.from_dict(asdict(candidate)), candidate)
+
+
+if __name__ == "__main__":
+    unittest.main()
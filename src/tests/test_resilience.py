@@ -0,0 +1,317 @@
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+from commitgen import ai, providers, resilience
+from tests.fake_openai import FakeOpenAIServer
+
+DIFF = "diff --git a/README.md b/README.md\n--- a/README.md\n+++ b/README.md\n@@ -1 +1,2 @@\n x\n+y\n"
+
+
+class ResilienceTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+        for target, path in (
+            ("commitgen.cache.CACHE_DIR", "cache"),
+            ("commitgen.routing.LOG_FILE", "routing.jsonl"),
+            ("commitgen.resilience.BREAKER_FILE", "breaker.json"),
+        ):
+            patcher = patch(target, Path(self.tmp.name) / path)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        env = patch.dict(os.environ, {"COMMITGEN_TIMEOUT": "0.5", "COMMITGEN_RETRY_BASE": "0.01",
+                                      "COMMITGEN_HEDGE": "off"})
+        env.start()
+        self.addCleanup(env.stop)
+
+        ai.reset_client()
+        self.addCleanup(ai.reset_client)
+
+    def serve(self, **kwargs) -> FakeOpenAIServer:
+        server = FakeOpenAIServer(reply="[FEAT]: add login", **kwargs)
+        server.__enter__()
+        self.addCleanup(server.__exit__)
+        self.provider = providers.CompatibleProvider("local-model", server.base_url)
+        # Import openai now rather than inside the first attempt's deadline.
+        self.provider.warm()
+        ai.set_provider(self.provider)
+        return server
+
+
+class TestRetries(ResilienceTestCase):
+
+    def test_hung_attempt_is_abandoned_at_the_deadline(self):
+        # Far past the deadline: the answer can only come from the retry.
+        server = self.serve(delays=[600.0])
+
+        message = ai.generate_commit_message(DIFF, "", use_cache=False)
+
+        self.assertEqual(message, "[FEAT]: add login")
+        self.assertEqual(len(server.requests), 2)
+
+    def test_server_errors_are_retried(self):
+        server = self.serve(errors=[500, 503])
+
+        self.assertEqual(ai.generate_commit_message(DIFF, "", use_cache=False), "[FEAT]: add login")
+        self.assertEqual(len(server.requests), 3)
+        self.assertEqual(resilience.breaker_state(self.provider.cache_id), "closed")
+
+    def test_client_errors_are_not_retried(self):
+        calls = []
+
+        def fail():
+            calls.append(1)
+            raise ValueError("bad request")
+
+        with self.assertRaises(ValueError):
+            resilience.call(fail, providers.StubProvider())
+
+        self.assertEqual(len(calls), 1)
+
+    def test_rejected_requests_are_not_retried(self):
+        calls = []
+
+        def reject():
+            calls.append(1)
+            raise Unauthorized("invalid api key")
+
+        with self.assertRaises(resilience.RequestRejected) as raised:
+            resilience.call(reject, providers.StubProvider())
+
+        self.assertIsInstance(raised.exception.__cause__, Unauthorized)
+        self.assertEqual(len(calls), 1)
+
+    def test_abandoned_stream_attempt_is_closed(self):
+        hung = HungStream()
+        attempts = [hung, iter(["[FEAT]: add login"])]
+
+        chunks = resilience.stream(lambda: attempts.pop(0), providers.StubProvider())
+
+        self.assertEqual("".join(chunks), "[FEAT]: add login")
+        self.assertTrue(hung.closed.wait(5))
+
+    def test_retry_after_header_sets_the_delay(self):
+        error = ServerError()
+        error.response = MagicMock(headers={"retry-after": "3"})
+
+        self.assertEqual(resilience.retry_delay(error, 0), 3.0)
+        self.assertLessEqual(resilience.retry_delay(ServerError(), 0), 0.01)
+
+    def test_stream_is_retried_before_its_first_chunk(self):
+        server = self.serve(errors=[502])
+
+        streamed = "".join(ai.stream_commit_message(DIFF, "", use_cache=False))
+
+        self.assertEqual(streamed, "[FEAT]: add login")
+        self.assertEqual(len(server.requests), 2)
+
+    def test_failed_attempt_leaves_the_session_alone(self):
+        self.serve(errors=[500])
+        session = ai.Session()
+
+        ai.generate_commit_message(DIFF, "", use_cache=False, session=session)
+
+        self.assertEqual([m["role"] for m in session.state], ["user", "assistant"])
+
+
+class TestHedging(ResilienceTestCase):
+
+    @patch.dict(os.environ, {"COMMITGEN_HEDGE": "100", "COMMITGEN_TIMEOUT": "600"})
+    def test_slow_request_is_hedged(self):
+        # Within the deadline but far slower than the duplicate.
+        server = self.serve(delays=[300.0])
+
+        message = ai.generate_commit_message(DIFF, "", use_cache=False)
+
+        self.assertEqual(message, "[FEAT]: add login")
+        self.assertEqual(len(server.requests), 2)
+
+    @patch.dict(os.environ, {"COMMITGEN_HEDGE": "p95"})
+    def test_p95_threshold_comes_from_logged_latencies(self):
+        provider = providers.StubProvider(model="m")
+        self.assertIsNone(resilience.hedge_threshold(provider))
+
+        entries = [{"tier": "fast", "model": "m", "latency_ms": float(ms)} for ms in range(1, 101)]
+        Path(self.tmp.name, "routing.jsonl").write_text("".join(json.dumps(e) + "\n" for e in entries))
+
+        self.assertAlmostEqual(resilience.hedge_threshold(provider), 0.095, places=3)
+
+
+class TestCircuitBreaker(ResilienceTestCase):
+
+    @patch.dict(os.environ, {"COMMITGEN_MAX_RETRIES": "2", "COMMITGEN_BREAKER_THRESHOLD": "3"})
+    def test_open_circuit_falls_back_without_calling_the_backend(self):
+        server = self.serve(errors=[500] * 9)
+
+        first = ai.generate_commit_message(DIFF, "", use_cache=False)
+        self.assertEqual(resilience.breaker_state(self.provider.cache_id), "closed")
+        ai.generate_commit_message(DIFF, "", use_cache=False)
+        ai.generate_commit_message(DIFF, "", use_cache=False)
+        self.assertEqual(resilience.breaker_state(self.provider.cache_id), "open")
+
+        second = ai.generate_commit_message(DIFF, "", use_cache=False)
+
+        self.assertEqual(first, ai._fallback_commit_message(DIFF, ""))
+        self.assertEqual(second, first)
+        self.assertEqual(len(server.requests), 9)
+
+    @patch.dict(os.environ, {"COMMITGEN_BREAKER_THRESHOLD": "1", "COMMITGEN_BREAKER_COOLDOWN": "0"})
+    def test_trial_request_closes_the_circuit(self):
+        server = self.serve()
+        resilience.record_failure(self.provider.cache_id)
+        self.assertEqual(resilience.breaker_state(self.provider.cache_id), "half-open")
+
+        self.assertEqual(ai.generate_commit_message(DIFF, "", use_cache=False), "[FEAT]: add login")
+
+        self.assertEqual(resilience.breaker_state(self.provider.cache_id), "closed")
+        self.assertEqual(len(server.requests), 1)
+
+    @patch.dict(os.environ, {"COMMITGEN_BREAKER_THRESHOLD": "1", "COMMITGEN_BREAKER_COOLDOWN": "60"})
+    def test_half_open_circuit_lets_one_trial_through(self):
+        provider = providers.StubProvider(model="m")
+        Path(self.tmp.name, "breaker.json").write_text(json.dumps({provider.cache_id: {"failures": 1, "opened_at": 0}}))
+        admitted = []
+        start = threading.Barrier(8)
+
+        def admit():
+            start.wait()
+            try:
+                admitted.append(resilience._admit(provider))
+            except resilience.BackendUnavailable:
+                pass
+
+        threads = [threading.Thread(target=admit) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(admitted, [0])
+        resilience.record_failure(provider.cache_id)
+        self.assertEqual(resilience.breaker_state(provider.cache_id), "open")
+
+    def test_fallback_is_not_cached(self):
+        server = self.serve()
+        for _ in range(3):
+            resilience.record_failure(self.provider.cache_id)
+
+        ai.generate_commit_message(DIFF, "")
+        resilience.reset_breakers()
+
+        self.assertEqual(ai.generate_commit_message(DIFF, ""), "[FEAT]: add login")
+        self.assertEqual(len(server.requests), 1)
+
+    def test_refine_keeps_the_message_while_open(self):
+        self.serve()
+        for _ in range(3):
+            resilience.record_failure(self.provider.cache_id)
+
+        self.assertEqual(ai.refine_commit_message("[FEAT]: add login", "mention OAuth"), "[FEAT]: add login")
+
+
+class ServerError(Exception):
+    status_code = 500
+
+
+class Unauthorized(Exception):
+    status_code = 401
+
+
+class HungStream:
+    """
+    A provider stream whose first chunk never arrives until it is closed.
+    """
+
+    def __init__(self):
+        self.closed = threading.Event()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        self.closed.wait(5)
+        raise StopIteration
+
+    def close(self):
+        self.closed.set()
+
+
+class FakeAsyncClient:
+
+    def __init__(self, delays=(), errors=()):
+        self.delays = list(delays)
+        self.errors = list(errors)
+        self.calls = 0
+        self.cancelled = 0
+        self.responses = MagicMock()
+        self.responses.create = self._create
+
+    async def _create(self, **kwargs):
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delays.pop(0) if self.delays else 0)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if self.errors:
+            raise self.errors.pop(0)
+        return MagicMock(output_text="[FEAT]: add login")
+
+
+@patch.dict(os.environ, {"COMMITGEN_ROUTING": "off"})
+class TestAsync(ResilienceTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.provider = providers.StubProvider(model="m")
+        ai.set_provider(self.provider)
+
+    def generate(self, client) -> str:
+        return asyncio.run(ai.agenerate_commit_message(client, DIFF, "", use_cache=False))
+
+    def test_server_errors_are_retried(self):
+        client = FakeAsyncClient(errors=[ServerError(), ServerError()])
+
+        self.assertEqual(self.generate(client), "[FEAT]: add login")
+        self.assertEqual(client.calls, 3)
+
+    def test_hung_attempt_is_cancelled_at_the_deadline(self):
+        client = FakeAsyncClient(delays=[600.0])
+
+        self.assertEqual(self.generate(client), "[FEAT]: add login")
+        self.assertEqual((client.calls, client.cancelled), (2, 1))
+
+    @patch.dict(os.environ, {"COMMITGEN_HEDGE": "50", "COMMITGEN_TIMEOUT": "600"})
+    def test_slow_request_is_hedged(self):
+        client = FakeAsyncClient(delays=[300.0])
+
+        self.assertEqual(self.generate(client), "[FEAT]: add login")
+        self.assertEqual((client.calls, client.cancelled), (2, 1))
+
+    def test_open_circuit_raises_without_calling_the_backend(self):
+        client = FakeAsyncClient()
+        for _ in range(3):
+            resilience.record_failure(self.provider.cache_id)
+
+        with self.assertRaises(resilience.BackendUnavailable):
+            self.generate(client)
+        self.assertEqual(client.calls, 0)
+
+    def test_retries_can_be_overridden_per_call(self):
+        client = FakeAsyncClient(errors=[ServerError()] * 5)
+
+        with self.assertRaises(resilience.BackendUnavailable):
+            asyncio.run(ai.agenerate_commit_message(client, DIFF, "", use_cache=False, retries=4))
+        self.assertEqual(client.calls, 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
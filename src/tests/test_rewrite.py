@@ -0,0 +1,167 @@
+import json
+import os
+import subprocess
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+from typer.testing import CliRunner
+from commitgen import ai, git_utils, providers, resilience, rewrite
+from commitgen.cli import app
+
+runner = CliRunner()
+
+
+def git(root, *args) -> str:
+    return subprocess.run(
+        ["git", "-C", root, "-c", "user.name=Dev", "-c", "user.email=dev@example.com", *args],
+        check=True, stdout=subprocess.PIPE, text=True,
+    ).stdout
+
+
+def make_repo(root: str, commits: int) -> list:
+    git(root, "init", "-q", "-b", "main")
+    Path(root, "base.txt").write_text("base\n")
+    git(root, "add", ".")
+    git(root, "commit", "-qm", "initial")
+    git(root, "checkout", "-qb", "feature")
+
+    for i in range(commits):
+        Path(root, f"docs{i}.md").write_text(f"page {i}\n")
+        git(root, "add", ".")
+        git(root, "commit", "-qm", "fix stuff")
+
+    return git(root, "rev-list", "--reverse", "main..feature").split()
+
+
+class RewriteTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.root = str(Path(self.tmp.name) / "repo")
+        Path(self.root).mkdir()
+
+        for target, name in (
+            ("commitgen.rewrite.PROGRESS_DIR", "progress"),
+            ("commitgen.cache.CACHE_DIR", "cache"),
+            ("commitgen.routing.LOG_FILE", "routing.jsonl"),
+            ("commitgen.resilience.BREAKER_FILE", "breaker.json"),
+        ):
+            patcher = patch(target, Path(self.tmp.name) / name)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.stub = providers.StubProvider()
+        ai.set_provider(self.stub)
+        self.addCleanup(ai.reset_client)
+
+
+class TestLogDiffs(RewriteTestCase):
+
+    def test_one_git_log_pass_yields_every_commit_with_its_patch(self):
+        shas = make_repo(self.root, 3)
+        stats = {}
+
+        commits = list(git_utils.iter_log_diffs("main..feature", cwd=self.root, stats=stats))
+
+        self.assertEqual([c.sha for c in commits], shas)
+        self.assertEqual([c.subject for c in commits], ["fix stuff"] * 3)
+        self.assertIn("+page 2", commits[2].diff)
+        self.assertNotIn("docs0.md", commits[2].diff)
+        self.assertEqual(stats["error"], "")
+
+    def test_bad_range_reports_git_error(self):
+        make_repo(self.root, 1)
+
+        with self.assertRaises(rewrite.RewriteError):
+            rewrite.generate("main..nope", cwd=self.root)
+
+
+class TestRewrite(RewriteTestCase):
+
+    def test_generate_then_apply_rewrites_messages_only(self):
+        shas = make_repo(self.root, 3)
+        tree = git(self.root, "rev-parse", "feature^{tree}")
+
+        result = rewrite.generate("main..feature", cwd=self.root)
+        rewritten = rewrite.apply("main..feature", result, cwd=self.root)
+
+        self.assertEqual(rewritten, 3)
+        self.assertEqual(result.count("generated"), 3)
+        self.assertEqual(len(self.stub.prompts), 3)
+        log = git(self.root, "log", "--format=%s", "main..feature").splitlines()
+        self.assertEqual(log, ["[DOCS]: add docs2.md", "[DOCS]: add docs1.md", "[DOCS]: add docs0.md"])
+        self.assertEqual(git(self.root, "rev-parse", "feature^{tree}"), tree)
+        self.assertEqual(git(self.root, "log", "-1", "--format=%s", "main"), "initial\n")
+        self.assertNotIn(shas[0], git(self.root, "rev-list", "feature"))
+        self.assertFalse(rewrite.progress_path("main..feature", self.root).exists())
+
+    def test_interrupted_run_resumes_from_progress(self):
+        make_repo(self.root, 3)
+        rewrite.generate("main..feature", cwd=self.root, use_cache=False)
+        self.stub.prompts.clear()
+
+        result = rewrite.generate("main..feature", cwd=self.root, use_cache=False)
+
+        self.assertEqual(result.count("resumed"), 3)
+        self.assertEqual(self.stub.prompts, [])
+
+    def test_unavailable_backend_marks_commits_failed(self):
+        make_repo(self.root, 2)
+        for _ in range(3):
+            resilience.record_failure(self.stub.cache_id)
+
+        result = rewrite.generate("main..feature", cwd=self.root, use_cache=False)
+
+        self.assertEqual(result.count("failed"), 2)
+        self.assertEqual(result.messages, {})
+        self.assertFalse(rewrite.progress_path("main..feature", self.root).read_text().strip())
+
+    def test_merge_commits_keep_their_message(self):
+        make_repo(self.root, 1)
+        git(self.root, "checkout", "-qb", "side", "main")
+        Path(self.root, "side.py").write_text("x = 1\n")
+        git(self.root, "add", ".")
+        git(self.root, "commit", "-qm", "side work")
+        git(self.root, "checkout", "-q", "feature")
+        git(self.root, "merge", "-q", "--no-edit", "side")
+
+        result = rewrite.generate("main..feature", cwd=self.root)
+        rewrite.apply("main..feature", result, cwd=self.root)
+
+        self.assertEqual(result.count("skipped"), 1)
+        self.assertIn("Merge branch 'side'", git(self.root, "log", "--merges", "--format=%s", "feature"))
+
+    def test_apply_requires_a_branch(self):
+        shas = make_repo(self.root, 1)
+        result = rewrite.RewriteResult()
+
+        with self.assertRaises(rewrite.RewriteError):
+            rewrite.apply(f"main..{shas[0]}", result, cwd=self.root)
+
+
+class TestRewriteCommand(RewriteTestCase):
+
+    def test_dry_run_writes_mapping_and_leaves_history(self):
+        shas = make_repo(self.root, 2)
+        mapping = Path(self.tmp.name) / "map.jsonl"
+
+        cwd = os.getcwd()
+        os.chdir(self.root)
+        try:
+            result = runner.invoke(app, ["rewrite", "main..feature", "--dry-run", "--mapping", str(mapping)])
+        finally:
+            os.chdir(cwd)
+
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn("commits/min", result.output)
+        entries = [json.loads(line) for line in mapping.read_text().splitlines()]
+        self.assertEqual([e["commit"] for e in entries], shas)
+        self.assertEqual(entries[0]["original"], "fix stuff")
+        self.assertEqual(entries[0]["message"], "[DOCS]: add docs0.md")
+        self.assertEqual(git(self.root, "rev-list", "main..feature").split(), shas[::-1])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,178 @@
+import json
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+from typer.testing import CliRunner
+from commitgen import ai, metrics, providers, routing
+from commitgen.cli import app
+
+runner = CliRunner()
+
+SMALL = "diff --git a/README.md b/README.md\n--- a/README.md\n+++ b/README.md\n@@ -1 +1,2 @@\n x\n+y\n"
+
+
+def code_diff(lines: int) -> str:
+    body = "".join(f"+value_{i} = {i}\n" for i in range(lines))
+    return f"diff --git a/app.py b/app.py\n--- a/app.py\n+++ b/app.py\n@@ -0,0 +1,{lines} @@\n{body}"
+
+
+class RoutingTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.policy = Path(self.tmp.name) / "routing.json"
+
+        for target, path in (
+            ("commitgen.cache.CACHE_DIR", Path(self.tmp.name) / "cache"),
+            ("commitgen.routing.LOG_FILE", Path(self.tmp.name) / "routing.jsonl"),
+            ("commitgen.routing.POLICY_FILE", self.policy),
+        ):
+            patcher = patch(target, path)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        env = patch.dict(os.environ, {"COMMITGEN_CHUNK_THRESHOLD": "1000000"})
+        env.start()
+        self.addCleanup(env.stop)
+
+        self.stub = providers.StubProvider()
+        ai.set_provider(self.stub)
+        self.addCleanup(ai.reset_client)
+
+    def write_policy(self, policy: dict):
+        self.policy.write_text(json.dumps(policy))
+
+
+class TestChoose(RoutingTestCase):
+
+    def test_default_policy_keeps_small_diffs_on_the_configured_model(self):
+        decision = routing.choose(SMALL, self.stub)
+
+        self.assertEqual(decision.tier, "fast")
+        self.assertEqual(decision.model, self.stub.model)
+        self.assertEqual(decision.files, 1)
+        self.assertEqual(decision.types, ["DOCS"])
+
+    def test_large_diffs_go_to_the_large_tier(self):
+        self.write_policy({"rules": [{"tier": "fast", "max_tokens": 100}, {"tier": "large"}],
+                           "models": {"large": "big-model"}})
+
+        decision = routing.choose(code_diff(200), self.stub)
+
+        self.assertEqual((decision.tier, decision.model, decision.rule), ("large", "big-model", 1))
+
+    def test_large_tier_keeps_the_configured_model_by_default(self):
+        provider = providers.OpenAIProvider("gpt-4.1-nano", get_client=None)
+        policy = {"rules": [{"tier": "large"}], "models": {}, "targets": {}}
+
+        self.assertEqual(routing.choose(SMALL, provider, policy).model, "gpt-4.1-nano")
+
+    @patch.dict(os.environ, {"COMMITGEN_MODEL_LARGE": "gpt-5-mini"})
+    def test_large_tier_model_can_be_set_in_the_environment(self):
+        provider = providers.OpenAIProvider("gpt-4.1-nano", get_client=None)
+        policy = {"rules": [{"tier": "large"}], "models": {}, "targets": {}}
+
+        self.assertEqual(routing.choose(SMALL, provider, policy).model, "gpt-5-mini")
+
+    def test_rules_match_on_change_types(self):
+        self.write_policy({"rules": [{"tier": "local", "types": ["DOCS", "CHORE"]}, {"tier": "fast"}]})
+
+        self.assertEqual(routing.choose(SMALL, self.stub).tier, "local")
+        self.assertEqual(routing.choose(code_diff(2), self.stub).tier, "fast")
+
+    def test_unreadable_policy_falls_back_to_defaults(self):
+        self.policy.write_text("{not json")
+
+        self.assertEqual(routing.load_policy()["rules"][-1], {"tier": "large"})
+
+
+class TestRoutedGeneration(RoutingTestCase):
+
+    def test_large_tier_generates_with_the_routed_model_and_logs_latency(self):
+        self.write_policy({"rules": [{"tier": "fast", "max_tokens": 100}, {"tier": "large"}],
+                           "models": {"large": "big-model"}})
+        seen = []
+        original = providers.StubProvider.complete
+
+        def complete(provider, prompt, session=None):
+            seen.append(provider.model)
+            return original(provider, prompt, session)
+
+        with patch.object(providers.StubProvider, "complete", complete):
+            ai.generate_commit_message(code_diff(200), "", use_cache=False)
+            ai.generate_commit_message(SMALL, "", use_cache=False)
+
+        self.assertEqual(seen, ["big-model", "stub"])
+        entries = routing.read_log()
+        self.assertEqual([entry["tier"] for entry in entries], ["large", "fast"])
+        self.assertTrue(all(entry["latency_ms"] >= 0 for entry in entries))
+
+    def test_routed_model_keys_the_cache(self):
+        self.write_policy({"rules": [{"tier": "large"}], "models": {"large": "big-model"}})
+        ai.generate_commit_message(SMALL, "")
+
+        self.write_policy({"rules": [{"tier": "fast"}]})
+        ai.generate_commit_message(SMALL, "")
+
+        self.assertEqual(len(self.stub.prompts), 2)
+
+    def test_local_tier_answers_without_the_model(self):
+        self.write_policy({"rules": [{"tier": "local", "types": ["DOCS"]}]})
+        recorder = metrics.start()
+        self.addCleanup(metrics.stop)
+
+        message = ai.generate_commit_message(SMALL, "", use_cache=False)
+
+        self.assertTrue(message.startswith("[DOCS]"))
+        self.assertEqual(self.stub.prompts, [])
+        self.assertEqual(recorder.values["route_tier"], "local")
+
+    def test_routing_off_uses_the_configured_provider(self):
+        self.write_policy({"rules": [{"tier": "local"}]})
+
+        with patch.dict(os.environ, {"COMMITGEN_ROUTING": "off"}):
+            ai.generate_commit_message(SMALL, "", use_cache=False)
+
+        self.assertEqual(len(self.stub.prompts), 1)
+        self.assertEqual(routing.read_log(), [])
+
+
+class TestSummary(RoutingTestCase):
+
+    def test_percentiles_and_targets(self):
+        entries = [{"tier": "fast", "model": "m", "latency_ms": float(ms)} for ms in range(1, 101)]
+
+        [row] = routing.summarize(entries, {"fast": {"p50_ms": 60, "p95_ms": 90}})
+
+        self.assertEqual(row["count"], 100)
+        self.assertAlmostEqual(row["p50_ms"], 50.5)
+        self.assertAlmostEqual(row["p95_ms"], 95.0, places=0)
+        self.assertTrue(row["p50_ok"])
+        self.assertFalse(row["p95_ok"])
+
+    def test_log_is_trimmed_to_the_newest_entries(self):
+        decision = routing.Decision("fast", "m")
+
+        with patch.dict(os.environ, {"COMMITGEN_ROUTING_LOG_MAX_ENTRIES": "2"}):
+            for ms in range(8):
+                routing.record(decision, ms)
+
+        self.assertLessEqual(len(routing.read_log()), 4)
+        self.assertEqual(routing.read_log()[-1]["latency_ms"], 7)
+
+    def test_routing_command_prints_tiers(self):
+        routing.record(routing.Decision("large", "big-model"), 1200)
+        self.write_policy({"targets": {"large": {"p95_ms": 1000}}})
+
+        result = runner.invoke(app, ["routing"])
+
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn("big-model", result.output)
+        self.assertIn("✗", result.output)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,152 @@
+import os
+import subprocess
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+from typer.testing import CliRunner
+from commitgen import ai, providers, split
+from commitgen.cli import app
+
+runner = CliRunner()
+
+IDENTITY = {"GIT_AUTHOR_NAME": "Dev", "GIT_AUTHOR_EMAIL": "dev@example.com",
+            "GIT_COMMITTER_NAME": "Dev", "GIT_COMMITTER_EMAIL": "dev@example.com"}
+
+# A feature (five added lines) and a fix (one replaced line) in one file.
+ORIGINAL = "".join(f"{i}\n" for i in range(1, 61))
+EDITED = ORIGINAL.replace("\n5\n", "\n5\na\nb\nc\nd\ne\n").replace("\n40\n", "\nforty\n")
+
+
+def git(root, *args) -> str:
+    return subprocess.run(
+        ["git", "-C", str(root), *args], check=True, stdout=subprocess.PIPE, text=True,
+        env={**os.environ, **IDENTITY},
+    ).stdout.strip()
+
+
+class SplitTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.root = Path(self.tmp.name) / "repo"
+        git(self.tmp.name, "init", "-q", str(self.root))
+
+        self.write("src/app/core.py", ORIGINAL)
+        self.write("docs/guide.md", "# Guide\n")
+        git(self.root, "add", "-A")
+        git(self.root, "commit", "-q", "-m", "initial")
+
+        self.write("src/app/core.py", EDITED)
+        self.write("docs/guide.md", "# Guide\n\nMore.\n")
+        self.write("tests/test_core.py", "def test_core():\n    pass\n")
+        git(self.root, "add", "-A")
+
+        env = patch.dict(os.environ, IDENTITY)
+        env.start()
+        self.addCleanup(env.stop)
+
+    def write(self, name: str, text: str):
+        path = self.root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text)
+
+    def plan(self, **kwargs) -> list:
+        return split.plan(split.read_staged_diff(cwd=self.root), **kwargs)
+
+
+class TestPlan(SplitTestCase):
+
+    def test_hunks_are_clustered_by_type_and_scope(self):
+        groups = self.plan()
+
+        self.assertEqual(
+            [(group.change_type, group.scope, group.paths) for group in groups],
+            [("FEAT", "src/app", ["src/app/core.py"]), ("FIX", "src/app", ["src/app/core.py"]),
+             ("DOCS", "docs", ["docs/guide.md"]), ("TEST", "tests", ["tests/test_core.py"])],
+        )
+        self.assertEqual((groups[0].added, groups[0].removed), (5, 0))
+        self.assertEqual((groups[1].added, groups[1].removed), (1, 1))
+
+    def test_groups_over_the_limit_are_folded(self):
+        groups = self.plan(max_commits=2)
+
+        self.assertEqual(len(groups), 2)
+        self.assertEqual(sum(group.added for group in groups), 10)
+
+
+class TestCommit(SplitTestCase):
+
+    def test_each_group_becomes_a_commit_and_the_tree_matches(self):
+        staged_tree = git(self.root, "write-tree")
+        groups = split.generate_messages(self.plan(), offline=True)
+
+        created = split.commit(groups, cwd=self.root)
+
+        self.assertEqual(len(created), 4)
+        self.assertEqual(git(self.root, "rev-parse", "HEAD^{tree}"), staged_tree)
+        self.assertEqual(git(self.root, "diff", "--staged", "--name-only"), "")
+        self.assertEqual(git(self.root, "show", "--format=", "--name-only", created[1]), "src/app/core.py")
+        self.assertTrue(git(self.root, "log", "-1", "--format=%s", created[1]).startswith("[FIX]"))
+
+    def test_failed_commit_leaves_the_rest_staged(self):
+        hook = self.root / ".git" / "hooks" / "pre-commit"
+        hook.write_text("#!/bin/sh\n[ -f .git/allow-one ] || exit 1\nrm .git/allow-one\n")
+        hook.chmod(0o755)
+        (self.root / ".git" / "allow-one").touch()
+        staged_tree = git(self.root, "write-tree")
+        groups = split.generate_messages(self.plan(), offline=True)
+
+        cwd = os.getcwd()
+        os.chdir(self.root)
+        try:
+            with self.assertRaisesRegex(split.SplitError, "1 of 4 commits created"):
+                split.commit(groups)
+        finally:
+            os.chdir(cwd)
+
+        self.assertEqual(git(self.root, "write-tree"), staged_tree)
+        self.assertEqual(git(self.root, "rev-list", "--count", "HEAD"), "2")
+
+
+class TestSplitCommand(SplitTestCase):
+
+    def setUp(self):
+        super().setUp()
+        for target, path in (("commitgen.cache.CACHE_DIR", "cache"), ("commitgen.routing.LOG_FILE", "routing.jsonl")):
+            patcher = patch(target, Path(self.tmp.name) / path)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.stub = providers.StubProvider(response="[FEAT]: add the core steps")
+        ai.set_provider(self.stub)
+        self.addCleanup(ai.reset_client)
+
+    def invoke(self, args: list):
+        cwd = os.getcwd()
+        os.chdir(self.root)
+        try:
+            return runner.invoke(app, args)
+        finally:
+            os.chdir(cwd)
+
+    def test_dry_run_shows_the_plan_without_committing(self):
+        result = self.invoke(["split", "--dry-run"])
+
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn("4 commit(s)", result.output)
+        self.assertEqual(self.stub.prompts, [])
+        self.assertEqual(git(self.root, "rev-list", "--count", "HEAD"), "1")
+
+    def test_messages_are_generated_once_per_group(self):
+        result = self.invoke(["split", "--yes", "--no-cache"])
+
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertEqual(len(self.stub.prompts), 4)
+        self.assertTrue(any("[FIX] part of a larger change" in prompt for prompt in self.stub.prompts))
+        self.assertEqual(git(self.root, "rev-list", "--count", "HEAD"), "5")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+import os
+import subprocess
+import sys
+import unittest
+
+# Modules that only the generation paths should ever import.
+HEAVY_MODULES = ("openai", "httpx", "asyncio")
+
+# Cold start budget for commands that never call the API, as the import time
+# `python -X importtime` reports. They measured 150-250 ms when the budget
+# was set; importing openai alone adds over 500 ms, so pulling it (or another
+# heavy dependency) back onto these paths blows well past it.
+STARTUP_BUDGET_MS = float(os.getenv("COMMITGEN_STARTUP_BUDGET_MS", "600"))
+
+RUNS = 3
+
+
+def import_profile(*args) -> dict:
+    """
+    Run `python -X importtime -m commitgen <args>` and return, for every
+    module it imported, the cumulative import time in microseconds and
+    whether it was imported at the top level.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-m", "commitgen", *args],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        stdin=subprocess.DEVNULL,
+        text=True,
+        check=True,
+    )
+
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Only top-level entries: nested ones are already in their parent's total.
+        modules[name.strip()] = (int(cumulative), not name.startswith("  "))
+
+    return modules
+
+
+def total_ms(modules: dict) -> float:
+    return sum(cumulative for cumulative, top_level in modules.values() if top_level) / 1000
+
+
+class TestStartup(unittest.TestCase):
+    """
+    Guards the cold start of the non-AI commands, which git hooks may run
+    on every commit.
+    """
+
+    COMMANDS = (("version",), ("config", "--help"), ("cache", "--help"))
+
+    def test_non_ai_commands_skip_heavy_imports(self):
+        for command in self.COMMANDS:
+            modules = import_profile(*command)
+            loaded = [name for name in modules if name.split(".")[0] in HEAVY_MODULES]
+
+            self.assertEqual(loaded, [], f"`commitgen {' '.join(command)}` imported {loaded}")
+
+    def test_cold_start_stays_within_budget(self):
+        timings = {}
+
+        for command in self.COMMANDS:
+            # Best of a few runs, to keep scheduler noise out of the result.
+            timings[" ".join(command)] = min(total_ms(import_profile(*command)) for _ in range(RUNS))
+
+        if os.environ.get("COMMITGEN_BENCHMARKS"):
+            print("\nstartup imports: " + ", ".join(f"{name} {ms:.0f}ms" for name, ms in timings.items()))
+
+        for name, ms in timings.items():
+            self.assertLess(ms, STARTUP_BUDGET_MS, f"`commitgen {name}` import time over budget")
+
+
+if __name__ == "__main__":
+    unittest.main()